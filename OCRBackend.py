@@ -11,20 +11,44 @@ import base64
 from paddleocr import PaddleOCR
 import threading
 import queue
+import os
+import glob
+import mmap
+import shutil
+import argparse
+import multiprocessing as mp
+from multiprocessing import shared_memory
 from typing import Dict, Any, List, Tuple, Optional
 
-# OCR worker 线程函数
-def ocr_worker(frame_queue, result_queue, settings):
+class LoopResultQueue:
     """
-    OCR工作线程函数
-    
-    Args:
-        frame_queue: 帧队列，从主线程获取待处理的帧
-        result_queue: 结果队列，将OCR结果返回给主线程
-        settings: OCR设置参数
+    OCR结果通道：工作线程调用 put，结果经 call_soon_threadsafe 投递到事件循环中的 asyncio.Queue，
+    发送协程 await get 即可，无需轮询
     """
-    # 创建一个专用的OCR实例
-    ocr = PaddleOCR(
+
+    def __init__(self):
+        self.queue: Optional[asyncio.Queue] = None
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def bind(self, loop: asyncio.AbstractEventLoop):
+        """绑定到服务运行的事件循环"""
+        self.loop = loop
+        self.queue = asyncio.Queue()
+
+    def put(self, item: Dict[str, Any]):
+        """线程安全地投递一条结果，事件循环已关闭时丢弃"""
+        try:
+            self.loop.call_soon_threadsafe(self.queue.put_nowait, item)
+        except RuntimeError:
+            pass
+
+    async def get(self) -> Dict[str, Any]:
+        return await self.queue.get()
+
+
+def create_ocr_engine(settings):
+    """按设置创建一个PaddleOCR实例，每个工作线程/进程各自持有"""
+    return PaddleOCR(
         det_model_dir=settings.get("det_model_dir", None),
         rec_model_dir=settings.get("rec_model_dir", None),
         use_angle_cls=False,
@@ -33,92 +57,653 @@ def ocr_worker(frame_queue, result_queue, settings):
         det_db_thresh=0.3,
         det_db_box_thresh=0.5,
         det_limit_side_len=640,
-        rec_batch_num=1,
+        rec_batch_num=settings.get("rec_batch_num", 8),  # 一次识别调用最多处理的文本行数
+        cpu_threads=settings.get("cpu_threads", 10),
         use_mp=False,  # 在线程中不使用多进程
     )
+
+
+def to_original_coords(box_points, meta_data):
+    """如果是ROI区域且提供了原始坐标，转换坐标到原始图像坐标系"""
+    roi_x, roi_y = 0, 0
+    if meta_data.get("is_roi") and meta_data.get("roi_coords"):
+        roi_x, roi_y = meta_data["roi_coords"][0], meta_data["roi_coords"][1]
+    # 调整坐标点到原始图像中的位置
+    return [[float(point[0]) + roi_x, float(point[1]) + roi_y] for point in box_points]
+
+
+def process_frame(ocr, frame, frame_id, meta_data):
+    """对一帧执行OCR，返回可直接发送给客户端的结果"""
+    try:
+        # 验证图像数据
+        if frame is None or frame.size == 0:
+            raise ValueError("Invalid frame data")
+        
+        start_time = time.time()  # 记录开始时间
+        ocr_result = ocr.ocr(frame, cls=False)
+        end_time = time.time()  # 记录结束时间
+        inference_time = end_time - start_time
+        
+        # 处理OCR结果
+        result_list = []
+        if ocr_result and ocr_result[0]:
+            for line in ocr_result[0]:
+                box_points = line[0]
+                text = line[1][0]
+                confidence = float(line[1][1])
+
+                print(f"OCR结果: {text}, 置信度: {confidence}")
+                
+                result_list.append({
+                    "box": to_original_coords(box_points, meta_data),
+                    "text": text,
+                    "confidence": confidence
+                })
+        
+        return {
+            "frame_id": frame_id,
+            "results": result_list,
+            "inference_time": inference_time,
+            "meta_data": meta_data
+        }
+        
+    except Exception as e:
+        error_msg = f"OCR线程处理出错: {str(e)}. Frame shape: {frame.shape if frame is not None else 'None'}"
+        print(error_msg)
+        return {
+            "frame_id": frame_id,
+            "results": [],
+            "error": error_msg,
+            "meta_data": meta_data
+        }
+
+
+def collect_batch(get, max_batch, max_wait):
+    """
+    微批收集：阻塞等待第一帧，之后在截止时间内继续收集，直到达到批大小
+    
+    Returns:
+        (批内任务列表, 是否收到退出信号)
+    """
+    first = get()
+    if first is None:
+        return [], True
+    batch = [first]
+    deadline = time.monotonic() + max_wait
+    while len(batch) < max_batch:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        try:
+            item = get(timeout=remaining)
+        except queue.Empty:
+            break
+        if item is None:
+            return batch, True
+        batch.append(item)
+    return batch, False
+
+
+def paddle_helpers():
+    """PaddleOCR 内部的检测框排序与文本行裁剪函数"""
+    try:
+        from paddleocr.tools.infer.predict_system import sorted_boxes
+        from paddleocr.tools.infer.utility import get_rotate_crop_image
+    except ImportError:
+        # 旧版本 paddleocr 以顶层 tools 包提供
+        from tools.infer.predict_system import sorted_boxes
+        from tools.infer.utility import get_rotate_crop_image
+    return sorted_boxes, get_rotate_crop_image
+
+
+def process_batch(ocr, frames):
+    """
+    对一批帧执行OCR：逐帧文本检测，所有帧的文本行裁剪合并后批量识别，再按帧分发结果
+    
+    Args:
+        ocr: PaddleOCR实例
+        frames: [(帧, 帧ID, 元数据), ...]
+    """
+    sorted_boxes, get_rotate_crop_image = paddle_helpers()
+
+    start_time = time.time()
+    results = []
+    crops = []
+    owners = []  # 每个裁剪所属的 (结果序号, 检测框)
+    for frame, frame_id, meta_data in frames:
+        result = {"frame_id": frame_id, "results": [], "meta_data": meta_data}
+        results.append(result)
+        try:
+            if frame is None or frame.size == 0:
+                raise ValueError("Invalid frame data")
+            dt_boxes, _ = ocr.text_detector(frame)
+            if dt_boxes is None:
+                continue
+            for box in sorted_boxes(dt_boxes):
+                crops.append(get_rotate_crop_image(frame, np.array(box, dtype=np.float32)))
+                owners.append((len(results) - 1, box))
+        except Exception as e:
+            result["error"] = f"OCR线程处理出错: {str(e)}. Frame shape: {frame.shape if frame is not None else 'None'}"
+            print(result["error"])
+
+    if crops:
+        try:
+            rec_res, _ = ocr.text_recognizer(crops)
+        except Exception as e:
+            error_msg = f"OCR批量识别出错: {str(e)}"
+            print(error_msg)
+            rec_res = []
+            for index in {owner for owner, _ in owners}:
+                results[index]["error"] = error_msg
+        drop_score = getattr(ocr, "drop_score", 0.5)
+        for (index, box), (text, confidence) in zip(owners, rec_res):
+            if confidence < drop_score:
+                continue
+            result = results[index]
+            result["results"].append({
+                "box": to_original_coords(box, result["meta_data"]),
+                "text": text,
+                "confidence": float(confidence)
+            })
+
+    inference_time = time.time() - start_time
+    for result in results:
+        result["inference_time"] = inference_time
+        result["batch_size"] = len(frames)
+    return results
+
+
+# 跟踪模式下比较文本行像素变化的缩略图尺寸（宽, 高）
+CROP_SIGNATURE_SIZE = (32, 16)
+
+
+def crop_signature(crop):
+    """文本行裁剪图缩小后的灰度图"""
+    gray = cv2.cvtColor(crop, cv2.COLOR_BGR2GRAY)
+    return cv2.resize(gray, CROP_SIGNATURE_SIZE, interpolation=cv2.INTER_AREA).astype(np.int16)
+
+
+def box_iou(a, b):
+    """两个文本框外接矩形的交并比"""
+    ax0, ay0 = a.min(axis=0)
+    ax1, ay1 = a.max(axis=0)
+    bx0, by0 = b.min(axis=0)
+    bx1, by1 = b.max(axis=0)
+    inter = max(0.0, min(ax1, bx1) - max(ax0, bx0)) * max(0.0, min(ay1, by1) - max(ay0, by0))
+    union = (ax1 - ax0) * (ay1 - ay0) + (bx1 - bx0) * (by1 - by0) - inter
+    return inter / union if union > 0 else 0.0
+
+
+def process_tracked(ocr, frame, frame_id, meta_data, settings):
+    """
+    跟踪模式下处理一帧
+    
+    每隔 track_detect_interval 帧或画面整体变化时重新检测文本框，按位置重叠沿用已有文本框的 id；
+    其余帧沿用已知文本框，只对像素有变化的文本框重新识别。跟踪状态随任务传入（meta_data["track"]），
+    处理后以结果的 track 字段返回。
+    """
+    sorted_boxes, get_rotate_crop_image = paddle_helpers()
+    state = meta_data.get("track") or {}
+    meta_data = {key: value for key, value in meta_data.items() if key != "track"}
+    threshold = settings.get("track_change_threshold", 12)
+    start_time = time.time()
+    try:
+        if frame is None or frame.size == 0:
+            raise ValueError("Invalid frame data")
+
+        # 画面整体变化（如切换页面）时立即重新检测
+        signature = frame_signature(frame)
+        previous = state.get("signature")
+        global_change = (
+            previous is None
+            or state.get("shape") != frame.shape
+            or float(np.mean(np.abs(previous - signature) > threshold)) > settings.get("track_global_ratio", 0.3)
+        )
+        since_detect = state.get("since_detect", 0) + 1
+        next_id = state.get("next_id", 0)
+        boxes = state.get("boxes", [])
+        detected = global_change or since_detect >= settings.get("track_detect_interval", 10)
+
+        if detected:
+            dt_boxes, _ = ocr.text_detector(frame)
+            unmatched = list(boxes)
+            tracked = []
+            for box in sorted_boxes(dt_boxes) if dt_boxes is not None else []:
+                box = np.array(box, dtype=np.float32)
+                best = max(unmatched, key=lambda entry: box_iou(entry["box"], box), default=None)
+                if best is not None and box_iou(best["box"], box) >= 0.5:
+                    unmatched.remove(best)
+                    tracked.append({**best, "box": box})
+                else:
+                    tracked.append({"id": next_id, "box": box, "text": "", "confidence": 0.0, "signature": None})
+                    next_id += 1
+            boxes = tracked
+            since_detect = 0
+
+        # 只重新识别像素有变化的文本框
+        crops = []
+        changed = []
+        crop_sigs = []
+        for entry in boxes:
+            crop = get_rotate_crop_image(frame, entry["box"].copy())
+            crop_sig = crop_signature(crop)
+            reference = entry["signature"]
+            if reference is None or int(np.abs(reference - crop_sig).max()) > threshold:
+                crops.append(crop)
+                changed.append(entry)
+                crop_sigs.append(crop_sig)
+        if crops:
+            rec_res, _ = ocr.text_recognizer(crops)
+            # 识别成功后才更新签名，识别失败时这些文本框下一帧仍会重新识别
+            for entry, crop_sig, (text, confidence) in zip(changed, crop_sigs, rec_res):
+                entry["signature"] = crop_sig
+                entry["text"] = text
+                entry["confidence"] = float(confidence)
+
+        drop_score = getattr(ocr, "drop_score", 0.5)
+        changed_ids = {entry["id"] for entry in changed}
+        result_list = [
+            {
+                "id": entry["id"],
+                "box": to_original_coords(entry["box"], meta_data),
+                "text": entry["text"],
+                "confidence": entry["confidence"],
+                "changed": entry["id"] in changed_ids
+            }
+            for entry in boxes
+            if entry["confidence"] >= drop_score
+        ]
+        return {
+            "frame_id": frame_id,
+            "results": result_list,
+            "inference_time": time.time() - start_time,
+            "meta_data": meta_data,
+            "detected": detected,
+            "recognized": len(crops),
+            "track": {
+                "boxes": boxes,
+                "signature": signature,
+                "shape": frame.shape,
+                "since_detect": since_detect,
+                "next_id": next_id
+            }
+        }
+
+    except Exception as e:
+        error_msg = f"OCR跟踪处理出错: {str(e)}. Frame shape: {frame.shape if frame is not None else 'None'}"
+        print(error_msg)
+        return {
+            "frame_id": frame_id,
+            "results": [],
+            "error": error_msg,
+            "meta_data": meta_data,
+            "track": state
+        }
+
+
+def process_frames(ocr, frames, settings):
+    """按帧分派：跟踪模式的帧逐帧跟踪识别，其余帧在批大小大于1时微批处理；结果与输入顺序一致"""
+    results = [None] * len(frames)
+    plain = [i for i, (_, _, meta_data) in enumerate(frames) if "track" not in meta_data]
+    if plain:
+        if settings.get("batch_size", 1) > 1:
+            outputs = process_batch(ocr, [frames[i] for i in plain])
+        else:
+            outputs = [process_frame(ocr, *frames[i]) for i in plain]
+        for i, output in zip(plain, outputs):
+            results[i] = output
+    for i, (frame, frame_id, meta_data) in enumerate(frames):
+        if results[i] is None:
+            results[i] = process_tracked(ocr, frame, frame_id, meta_data, settings)
+    return results
+
+
+# OCR worker 线程函数
+def ocr_worker(frame_queue, result_queue, settings):
+    """
+    OCR工作线程函数
+    
+    Args:
+        frame_queue: 帧队列，从主线程获取待处理的帧
+        result_queue: 结果通道（LoopResultQueue），将OCR结果投递回事件循环
+        settings: OCR设置参数
+    """
+    # 创建一个专用的OCR实例
+    ocr = create_ocr_engine(settings)
     
     print(f"OCR worker started with settings: {settings}")
     
+    batch_size = max(1, settings.get("batch_size", 1))
+    max_wait = settings.get("batch_wait_ms", 20) / 1000
     while True:
-        if not frame_queue.empty():
+        if batch_size > 1:
+            # 微批模式：跨请求攒批，批满或到达截止时间即处理
+            batch, stop = collect_batch(frame_queue.get, batch_size, max_wait)
+        else:
+            # 阻塞等待新帧，空闲时不占用CPU
             frame_data = frame_queue.get()
-            if frame_data is None:  # 退出信号
+            batch, stop = ([], True) if frame_data is None else ([frame_data], False)
+
+        for result in process_frames(ocr, batch, settings):
+            result_queue.put(result)
+        if stop:  # 退出信号
+            break
+
+
+# OCR worker 进程函数
+def ocr_process_worker(task_queue, result_queue, settings, cpus):
+    """
+    OCR工作进程函数：从共享内存槽位读取帧，只把识别结果传回主进程
+    
+    Args:
+        task_queue: 任务队列，元素为 (共享内存名称, 槽位字节数, 槽位, 形状, 帧ID, 元数据)
+        result_queue: 结果队列，结果中附带槽位供主进程回收
+        settings: OCR设置参数
+        cpus: 绑定的CPU集合，为空时不绑定
+    """
+    if cpus and hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, cpus)
+    shm = None
+    ocr = create_ocr_engine(settings)
+    
+    print(f"OCR process worker {os.getpid()} started, cpus: {sorted(cpus) if cpus else 'all'}")
+    
+    batch_size = max(1, settings.get("batch_size", 1))
+    max_wait = settings.get("batch_wait_ms", 20) / 1000
+    try:
+        while True:
+            if batch_size > 1:
+                tasks, stop = collect_batch(task_queue.get, batch_size, max_wait)
+            else:
+                task = task_queue.get()
+                tasks, stop = ([], True) if task is None else ([task], False)
+
+            if tasks:
+                shm_name = tasks[0][0]
+                if shm is None or shm.name != shm_name:
+                    # 主进程按更大的帧重新分配了共享内存（此时旧槽位均已空闲）
+                    if shm is not None:
+                        shm.close()
+                    shm = shared_memory.SharedMemory(name=shm_name)
+                # 直接在共享内存上构造图像视图，不复制帧数据
+                frames = [
+                    (np.ndarray(shape, dtype=np.uint8, buffer=shm.buf, offset=slot * slot_bytes), frame_id, meta_data)
+                    for _, slot_bytes, slot, shape, frame_id, meta_data in tasks
+                ]
+                results = process_frames(ocr, frames, settings)
+                del frames  # 释放视图后共享内存才能关闭
+                for (_, _, slot, *_), result in zip(tasks, results):
+                    result["slot"] = slot
+                    result_queue.put(result)
+            if stop:  # 退出信号
                 break
-                
-            frame, frame_id, meta_data = frame_data
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if shm is not None:
+            shm.close()
 
-            try:
-                # 验证图像数据
-                if frame is None or frame.size == 0:
-                    raise ValueError("Invalid frame data")
-                
-                start_time = time.time()  # 记录开始时间
-                ocr_result = ocr.ocr(frame, cls=False)
-                end_time = time.time()  # 记录结束时间
-                inference_time = end_time - start_time
-                
-                # 处理OCR结果
-                result_list = []
-                if ocr_result and ocr_result[0]:
-                    for line in ocr_result[0]:
-                        box_points = line[0]
-                        text = line[1][0]
-                        confidence = float(line[1][1])
-
-                        print(f"OCR结果: {text}, 置信度: {confidence}")
-                        
-                        # 如果是ROI区域且提供了原始坐标，转换坐标到原始图像坐标系
-                        if meta_data.get("is_roi") and meta_data.get("roi_coords"):
-                            roi_x, roi_y = meta_data["roi_coords"][0], meta_data["roi_coords"][1]
-                            # 调整坐标点到原始图像中的位置
-                            adjusted_box = []
-                            for point in box_points:
-                                adjusted_box.append([point[0] + roi_x, point[1] + roi_y])
-                            box_points = adjusted_box
-                        
-                        result_list.append({
-                            "box": box_points,
-                            "text": text,
-                            "confidence": confidence
-                        })
-                
-                result_queue.put({
-                    "frame_id": frame_id,
-                    "results": result_list,
-                    "inference_time": inference_time,
-                    "meta_data": meta_data
-                })
-                
-            except Exception as e:
-                error_msg = f"OCR线程处理出错: {str(e)}. Frame shape: {frame.shape if frame is not None else 'None'}"
-                print(error_msg)
-                result_queue.put({
-                    "frame_id": frame_id,
-                    "results": [],
-                    "error": error_msg,
-                    "meta_data": meta_data
-                })
 
-class OCRServer:
+def numa_cpu_sets() -> List[List[int]]:
+    """按NUMA节点分组的可用CPU，无法读取节点信息时视为单个节点"""
+    available = sorted(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else list(range(os.cpu_count() or 1))
+    nodes = []
+    for path in sorted(glob.glob("/sys/devices/system/node/node[0-9]*/cpulist")):
+        cpus = set()
+        with open(path) as f:
+            for part in f.read().strip().split(","):
+                if "-" in part:
+                    low, high = part.split("-")
+                    cpus.update(range(int(low), int(high) + 1))
+                elif part:
+                    cpus.add(int(part))
+        node = [cpu for cpu in available if cpu in cpus]
+        if node:
+            nodes.append(node)
+    return nodes or [available]
+
+
+def worker_cpus(index: int, pin: Optional[str]) -> List[int]:
+    """
+    第 index 个工作进程绑定的CPU
+    
+    pin 为 "core" 时每个进程绑定一个核心（按NUMA节点交错分配），为 "numa" 时绑定到
+    一个NUMA节点的全部核心，其他值不绑定。
+    """
+    if pin not in ("core", "numa"):
+        return []
+    nodes = numa_cpu_sets()
+    node = nodes[index % len(nodes)]
+    if pin == "numa":
+        return node
+    return [node[(index // len(nodes)) % len(node)]]
+
+
+class OCRProcessPool:
+    """
+    多进程OCR执行：每个进程一个PaddleOCR实例，避免前后处理争用GIL
+    
+    解码后的帧写入共享内存的空闲槽位，任务队列只传递槽位号和形状，
+    工作进程直接读取共享内存；结果由后台线程取回，回收槽位并投递到结果通道。
+    没有空闲槽位时丢弃新帧，与线程模式下帧队列已满的处理一致。
+    
+    槽位大小未指定时按首帧（前端裁剪后的ROI）大小分配，之后出现更大的帧时等所有槽位
+    空闲后重新分配。分配前检查 /dev/shm 剩余空间，不足时直接报错，而不是在写入时触发 SIGBUS。
+    """
+
+    def __init__(self, num_workers, settings, result_queue, slots=None, slot_bytes=None, pin=None):
+        self.num_workers = num_workers
+        self.settings = settings
+        self.result_queue = result_queue
+        # 每个进程一批处理中、一帧排队
+        self.slots = slots or num_workers * (max(1, settings.get("batch_size", 1)) + 1)
+        self.slot_bytes = slot_bytes or int(settings.get("frame_slot_mb", 0) * 2 ** 20) or None
+        self.pin = pin
+        self.processes = []
+        self.shm = None
+        # 后进先出：优先复用刚回收的槽位，空闲时只有少数槽位的内存页常驻
+        self.free_slots = queue.LifoQueue()
+        self.collector = None
+        context = mp.get_context("spawn")  # PaddleOCR 不适合在 fork 出的子进程中使用
+        self.context = context
+        self.task_queue = context.Queue()
+        self.done_queue = context.Queue()
+
+    def start(self):
+        if self.slot_bytes:
+            # 指定了槽位大小时启动前就分配，/dev/shm 空间不足在启动时即报错
+            self._allocate(self.slot_bytes)
+        for slot in reversed(range(self.slots)):
+            self.free_slots.put(slot)
+        for i in range(self.num_workers):
+            process = self.context.Process(
+                target=ocr_process_worker,
+                args=(self.task_queue, self.done_queue, self.settings, worker_cpus(i, self.pin)),
+                daemon=True,
+            )
+            process.start()
+            self.processes.append(process)
+        self.collector = threading.Thread(target=self._collect, daemon=True)
+        self.collector.start()
+
+    def _allocate(self, slot_bytes):
+        """按槽位大小（页对齐）分配共享内存，/dev/shm 剩余空间不足时抛出 RuntimeError"""
+        slot_bytes = -(-slot_bytes // mmap.PAGESIZE) * mmap.PAGESIZE
+        size = self.slots * slot_bytes
+        if os.path.isdir("/dev/shm"):
+            available = shutil.disk_usage("/dev/shm").free + (self.shm.size if self.shm is not None else 0)
+            if size > available:
+                raise RuntimeError(
+                    f"/dev/shm 空间不足: 需要 {size / 2 ** 20:.1f} MB"
+                    f"（{self.slots} 个槽位 × {slot_bytes / 2 ** 20:.1f} MB），可用 {available / 2 ** 20:.1f} MB；"
+                    "请增大 /dev/shm（如 docker run --shm-size），或减少工作进程数/批大小"
+                )
+        if self.shm is not None:
+            self.shm.close()
+            self.shm.unlink()
+        self.shm = shared_memory.SharedMemory(create=True, size=size)
+        self.slot_bytes = slot_bytes
+        print(f"Allocated shared memory: {self.slots} slots x {slot_bytes / 2 ** 20:.1f} MB")
+
+    def submit(self, frame, frame_id, meta_data) -> bool:
+        """将帧写入空闲槽位并派发，没有空闲槽位时返回 False"""
+        frame = np.ascontiguousarray(frame, dtype=np.uint8)
+        if self.slot_bytes is None or frame.nbytes > self.slot_bytes:
+            if self.free_slots.qsize() < self.slots:
+                # 仍有槽位在处理中，等全部空闲后再按新的帧大小重新分配
+                return False
+            self._allocate(frame.nbytes)
+        try:
+            slot = self.free_slots.get_nowait()
+        except queue.Empty:
+            return False
+        view = np.ndarray(frame.shape, dtype=np.uint8, buffer=self.shm.buf, offset=slot * self.slot_bytes)
+        view[...] = frame
+        del view
+        self.task_queue.put((self.shm.name, self.slot_bytes, slot, frame.shape, frame_id, meta_data))
+        return True
+
+    def _collect(self):
+        """取回工作进程的结果，回收槽位后投递到结果通道"""
+        while True:
+            result = self.done_queue.get()
+            if result is None:
+                break
+            self.free_slots.put(result.pop("slot"))
+            self.result_queue.put(result)
+
+    def stop(self):
+        for _ in self.processes:
+            self.task_queue.put(None)
+        for process in self.processes:
+            process.join(timeout=5.0)
+            if process.is_alive():
+                process.terminate()
+        self.processes = []
+        if self.collector is not None:
+            self.done_queue.put(None)
+            self.collector.join(timeout=2.0)
+            self.collector = None
+        if self.shm is not None:
+            self.shm.close()
+            self.shm.unlink()
+            self.shm = None
+
+
+# 变化检测时比较的缩略图尺寸（宽, 高）
+SIGNATURE_SIZE = (96, 48)
+
+
+def frame_signature(frame):
+    """缩小后的灰度图，作为画面变化检测的签名"""
+    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    return cv2.resize(gray, SIGNATURE_SIZE, interpolation=cv2.INTER_AREA).astype(np.int16)
+
+
+class FrameChangeDetector:
+    """
+    单个客户端的画面变化检测
+    
+    与该客户端上一次完成OCR的帧比较缩略图，任一格的灰度差都不超过阈值且ROI未变化时
+    视为画面未变化，直接复用上一次的识别结果。
+    """
+
+    MAX_PENDING = 64  # 最多记录的在途帧数，超出时丢弃最早的（多为被丢弃的帧）
+
     def __init__(self):
+        self.pending = {}  # 帧ID -> (签名, 画面键)，等待OCR结果
+        self.last = None  # 上一次完成OCR的帧的 (签名, 画面键)
+        self.last_result = None
+        self.frames = 0
+        self.skipped = 0
+
+    def check(self, frame, frame_id, meta_data, threshold) -> Optional[Dict[str, Any]]:
+        """画面未变化时返回标记为缓存的上一次结果，否则记录签名等待本帧的OCR结果"""
+        self.frames += 1
+        signature = frame_signature(frame)
+        key = (tuple(meta_data.get("roi_coords") or ()), frame.shape)
+        if (
+            self.last is not None
+            and self.last_result is not None
+            and self.last[1] == key
+            and int(np.abs(self.last[0] - signature).max()) <= threshold
+        ):
+            self.skipped += 1
+            return {
+                **self.last_result,
+                "frame_id": frame_id,
+                "meta_data": meta_data,
+                "inference_time": 0.0,
+                "cached": True
+            }
+        self.pending[frame_id] = (signature, key)
+        if len(self.pending) > self.MAX_PENDING:
+            self.pending.pop(next(iter(self.pending)))
+        return None
+
+    def record(self, result):
+        """收到OCR结果后，将对应帧作为之后比较的基准"""
+        entry = self.pending.pop(result.get("frame_id"), None)
+        if entry is not None and "error" not in result:
+            self.last = entry
+            self.last_result = {key: value for key, value in result.items() if key not in ("frame_id", "meta_data")}
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "frames": self.frames,
+            "skipped": self.skipped,
+            "skip_rate": round(self.skipped / self.frames, 3) if self.frames else 0.0
+        }
+
+
+class OCRServer:
+    def __init__(self, execution_mode="thread", num_workers=16, workers_per_core=None, pin_workers=None, change_threshold=12, track_mode=False):
         self.clients = set()
         self.frame_queue = queue.Queue(maxsize=10)  # 增加队列大小，适应前端控制的发送频率
-        self.result_queue = queue.Queue()
+        self.result_queue = LoopResultQueue()
         self.ocr_workers = []
-        self.num_workers = 16  # 默认工作线程数
+        self.process_pool = None
+        self.execution_mode = execution_mode  # thread: 单进程多线程；process: 多进程 + 共享内存传帧
+        self.num_workers = num_workers  # 默认工作线程数
+        self.workers_per_core = workers_per_core  # 设置后按可用核心数计算工作进程/线程数
+        self.pin_workers = pin_workers  # 进程模式下绑定CPU：core / numa，None 不绑定
+        self.track_mode = track_mode  # 流式跟踪模式：间隔检测文本框，只重新识别有变化的文本框
+        self.change_threshold = change_threshold  # 画面变化检测阈值（缩略图灰度差），0 表示关闭，每帧都做OCR
         self.ocr_settings = {
             "lang": "ch",
             "use_gpu": False,
             "det_model_dir": "/Volumes/应用/autotest-system/ch_PP-OCRv3_det_slim_infer",
-            "rec_model_dir": "/Volumes/应用/autotest-system/ch_PP-OCRv3_rec_slim_infer"
+            "rec_model_dir": "/Volumes/应用/autotest-system/ch_PP-OCRv3_rec_slim_infer",
+            "rec_batch_num": 8,  # 一次识别调用最多处理的文本行数
+            "batch_size": 1,  # 微批：每批最多帧数，1 表示逐帧处理
+            "batch_wait_ms": 20,  # 微批：凑批最长等待时间（毫秒）
+            "track_detect_interval": 10,  # 跟踪模式：每隔多少帧重新检测文本框
+            "track_global_ratio": 0.3,  # 跟踪模式：缩略图中变化格子超过该比例视为画面整体变化，立即重新检测
+            "track_change_threshold": 12,  # 跟踪模式：文本框缩略图灰度差超过该值时重新识别
+            "frame_slot_mb": 0  # 进程模式：共享内存槽位大小（MB），0 表示按首帧大小分配
         }
         self.roi = None
         self.ocr_interval = 0.5  # 默认OCR处理间隔，现在仅作为初始设置返回给前端
         self.active_connections = {}  # 存储活跃的客户端连接
         self.next_frame_id = 0  # 帧ID计数器
 
+    def resolve_num_workers(self):
+        """按每核心工作数计算实际的工作进程/线程数"""
+        if self.workers_per_core:
+            cores = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else (os.cpu_count() or 1)
+            self.num_workers = max(1, round(cores * self.workers_per_core))
+        return self.num_workers
+
     def start_ocr_workers(self):
-        """启动OCR工作线程"""
+        """启动OCR工作线程（进程模式下启动工作进程池）"""
+        self.resolve_num_workers()
+        if self.execution_mode == "process":
+            print(f"启动 {self.num_workers} 个 OCR 工作进程...")
+            # 每个进程一个推理线程，避免多进程下线程数超过核心数
+            settings = {"cpu_threads": 1, **self.ocr_settings}
+            self.process_pool = OCRProcessPool(self.num_workers, settings, self.result_queue, pin=self.pin_workers)
+            self.process_pool.start()
+            return
         print(f"启动 {self.num_workers} 个 OCR 工作线程...")
         for i in range(self.num_workers):
             thread = threading.Thread(
@@ -130,7 +715,13 @@ class OCRServer:
             thread.start()
     
     def stop_ocr_workers(self):
-        """停止OCR工作线程"""
+        """停止OCR工作线程（或工作进程池）"""
+        if self.process_pool is not None:
+            print("发送退出信号并等待 OCR 进程结束...")
+            self.process_pool.stop()
+            self.process_pool = None
+            print("OCR 进程已停止")
+            return
         print("发送退出信号并等待 OCR 线程结束...")
         for _ in range(self.num_workers):
             self.frame_queue.put(None)
@@ -147,7 +738,10 @@ class OCRServer:
         self.clients.add(websocket)
         self.active_connections[client_id] = {
             "websocket": websocket,
-            "last_frame_time": time.time()
+            "last_frame_time": time.time(),
+            "change_detector": FrameChangeDetector(),
+            # 跟踪模式状态：同一客户端同时只有一帧在处理，期间到达的新帧只保留最新一帧
+            "tracker": {"state": None, "in_flight": False, "waiting": None}
         }
         return client_id
 
@@ -217,6 +811,15 @@ class OCRServer:
                 elif message_type == "ping":
                     # 处理心跳消息
                     await websocket.send(json.dumps({"type": "pong"}))
+                elif message_type == "stats":
+                    # 各客户端的画面变化检测跳过率
+                    await websocket.send(json.dumps({
+                        "type": "stats",
+                        "clients": {
+                            str(cid): info["change_detector"].stats()
+                            for cid, info in self.active_connections.items()
+                        }
+                    }))
                 else:
                     await websocket.send(json.dumps({
                         "type": "error",
@@ -254,7 +857,8 @@ class OCRServer:
             "original_height": data.get("original_height"),
             "roi_coords": data.get("roi_coords"),
             "width": data.get("width"),
-            "height": data.get("height")
+            "height": data.get("height"),
+            "client_id": client_id
         }
         
         try:
@@ -270,12 +874,29 @@ class OCRServer:
             
             print(f"Received frame {frame_id}, shape: {frame.shape}, is_roi: {meta_data['is_roi']}")
             
+            # 画面与该客户端上一次识别的帧相比没有变化时，直接复用上次结果，不进入OCR队列
+            connection = self.active_connections.get(client_id)
+            if connection is not None and self.change_threshold > 0:
+                cached = connection["change_detector"].check(frame, frame_id, meta_data, self.change_threshold)
+                if cached is not None:
+                    self.result_queue.put(cached)
+                    await websocket.send(json.dumps({
+                        "type": "frame_received",
+                        "frame_id": frame_id,
+                        "cached": True
+                    }))
+                    return
+            
             # 前端已经处理了ROI裁剪，这里直接处理收到的图像
             # 不再需要服务器端控制OCR处理频率，由前端控制发送频率
-            if not self.frame_queue.full():
-                self.frame_queue.put((frame, frame_id, meta_data))
+            if self.track_mode and connection is not None:
+                tracker = connection["tracker"]
+                if tracker["in_flight"]:
+                    tracker["waiting"] = (frame, frame_id, meta_data)
+                else:
+                    self.submit_tracked(tracker, frame, frame_id, meta_data)
             else:
-                print("Frame queue full, skipping frame")
+                self.submit_frame(frame, frame_id, meta_data)
             
             # 发送确认消息
             await websocket.send(json.dumps({
@@ -289,6 +910,25 @@ class OCRServer:
                 "message": f"Error processing frame: {str(e)}"
             }))
 
+    def submit_frame(self, frame, frame_id, meta_data) -> bool:
+        """将帧交给OCR工作线程/进程，队列已满时丢弃并返回 False"""
+        if self.process_pool is not None:
+            if not self.process_pool.submit(frame, frame_id, meta_data):
+                print("No free frame slot, skipping frame")
+                return False
+            return True
+        try:
+            self.frame_queue.put_nowait((frame, frame_id, meta_data))
+            return True
+        except queue.Full:
+            print("Frame queue full, skipping frame")
+            return False
+
+    def submit_tracked(self, tracker, frame, frame_id, meta_data):
+        """携带该客户端的跟踪状态提交一帧"""
+        meta_data["track"] = tracker["state"] or {}
+        tracker["in_flight"] = self.submit_frame(frame, frame_id, meta_data)
+
     async def handle_config(self, websocket, data):
         """处理配置更新"""
         config = data.get("config", {})
@@ -303,7 +943,8 @@ class OCRServer:
         if ocr_config:
             restart_workers = False
             
-            for key in ["lang", "use_gpu", "det_model_dir", "rec_model_dir"]:
+            for key in ["lang", "use_gpu", "det_model_dir", "rec_model_dir", "rec_batch_num", "batch_size", "batch_wait_ms",
+                        "track_detect_interval", "track_global_ratio", "track_change_threshold"]:
                 if key in ocr_config:
                     old_value = self.ocr_settings.get(key)
                     new_value = ocr_config[key]
@@ -316,10 +957,28 @@ class OCRServer:
                 new_workers = max(1, int(ocr_config["num_workers"]))
                 if new_workers != self.num_workers:
                     self.num_workers = new_workers
+                    self.workers_per_core = None
+                    restart_workers = True
+            
+            # 画面变化检测阈值，无需重启工作线程
+            if "change_threshold" in ocr_config:
+                self.change_threshold = float(ocr_config["change_threshold"])
+            
+            # 切换跟踪模式，无需重启工作线程；关闭时清除各客户端的跟踪状态
+            if "track_mode" in ocr_config:
+                self.track_mode = bool(ocr_config["track_mode"])
+                if not self.track_mode:
+                    for info in self.active_connections.values():
+                        info["tracker"].update(state=None, waiting=None)
+            
+            # 更新执行模式、每核心工作数及CPU绑定
+            for key in ["execution_mode", "workers_per_core", "pin_workers"]:
+                if key in ocr_config and ocr_config[key] != getattr(self, key):
+                    setattr(self, key, ocr_config[key])
                     restart_workers = True
             
             # 如果关键设置变更，重启工作线程
-            if restart_workers and self.ocr_workers:
+            if restart_workers and (self.ocr_workers or self.process_pool):
                 self.stop_ocr_workers()
                 self.start_ocr_workers()
         
@@ -329,39 +988,53 @@ class OCRServer:
                 "roi": self.roi,
                 "ocr_interval": self.ocr_interval,  # 保留这个值，仅作为参考
                 "ocr_settings": self.ocr_settings,
-                "num_workers": self.num_workers
+                "num_workers": self.num_workers,
+                "execution_mode": self.execution_mode,
+                "pin_workers": self.pin_workers,
+                "change_threshold": self.change_threshold,
+                "track_mode": self.track_mode
             }
         }))
 
     async def send_results(self):
         """将OCR结果发送给客户端"""
         while True:
+            # 等待工作线程投递结果，到达即发送
+            result = await self.result_queue.get()
             try:
-                if not self.result_queue.empty():
-                    result = self.result_queue.get_nowait()
-                    
-                    # 转换结果为可JSON序列化的格式
-                    for item in result.get("results", []):
-                        if "box" in item:
-                            item["box"] = item["box"].tolist() if isinstance(item["box"], np.ndarray) else item["box"]
-                    
-                    # 发送给所有连接的客户端
-                    if self.clients:
-                        message = json.dumps({
-                            "type": "ocr_result",
-                            "data": result
-                        })
-                        await asyncio.gather(
-                            *[client.send(message) for client in self.clients],
-                            return_exceptions=True
-                        )
+                connection = self.active_connections.get(result.get("meta_data", {}).get("client_id"))
+                # 跟踪模式：保存返回的跟踪状态，并提交处理期间到达的最新一帧
+                if "track" in result:
+                    state = result.pop("track")
+                    if connection is not None:
+                        tracker = connection["tracker"]
+                        tracker["state"] = state
+                        tracker["in_flight"] = False
+                        waiting, tracker["waiting"] = tracker["waiting"], None
+                        if waiting is not None and self.track_mode:
+                            self.submit_tracked(tracker, *waiting)
+                # 记录为该客户端之后变化检测的基准
+                if not result.get("cached") and connection is not None:
+                    connection["change_detector"].record(result)
+                
+                # 转换结果为可JSON序列化的格式
+                for item in result.get("results", []):
+                    if "box" in item:
+                        item["box"] = item["box"].tolist() if isinstance(item["box"], np.ndarray) else item["box"]
                 
-                # 短暂暂停，避免CPU占用过高
-                await asyncio.sleep(0.01)
+                # 发送给所有连接的客户端
+                if self.clients:
+                    message = json.dumps({
+                        "type": "ocr_result",
+                        "data": result
+                    })
+                    await asyncio.gather(
+                        *[client.send(message) for client in self.clients],
+                        return_exceptions=True
+                    )
                 
             except Exception as e:
                 print(f"Error in send_results: {e}")
-                await asyncio.sleep(0.1)
 
     async def handler(self, websocket):
         """处理WebSocket连接"""
@@ -377,7 +1050,11 @@ class OCRServer:
                     "roi": self.roi,
                     "ocr_interval": self.ocr_interval,  # 仅作为初始参考值
                     "ocr_settings": self.ocr_settings,
-                    "num_workers": self.num_workers
+                    "num_workers": self.num_workers,
+                    "execution_mode": self.execution_mode,
+                    "pin_workers": self.pin_workers,
+                    "change_threshold": self.change_threshold,
+                    "track_mode": self.track_mode
                 }
             }))
             
@@ -422,7 +1099,8 @@ class OCRServer:
 
     async def serve(self, host="0.0.0.0", port=8765):
         """启动WebSocket服务器"""
-        # 启动OCR工作线程
+        # 结果通道绑定到当前事件循环，再启动OCR工作线程
+        self.result_queue.bind(asyncio.get_running_loop())
         self.start_ocr_workers()
         
         # 创建WebSocket服务器
@@ -445,9 +1123,38 @@ class OCRServer:
             self.stop_ocr_workers()
 
 if __name__ == "__main__":
-    server = OCRServer()
+    parser = argparse.ArgumentParser(description="OCR WebSocket服务")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--mode", choices=["thread", "process"], default="thread", help="OCR执行模式")
+    parser.add_argument("--workers", type=int, default=16, help="工作线程/进程数")
+    parser.add_argument("--workers-per-core", type=float, help="按可用核心数计算工作数，覆盖 --workers")
+    parser.add_argument("--pin", choices=["core", "numa"], help="进程模式下将工作进程绑定到单个核心或NUMA节点")
+    parser.add_argument("--batch-size", type=int, default=1, help="微批：每批最多帧数，增大可提高吞吐、增加延迟")
+    parser.add_argument("--batch-wait-ms", type=float, default=20, help="微批：凑批最长等待时间（毫秒）")
+    parser.add_argument("--change-threshold", type=float, default=12, help="画面变化检测阈值（缩略图灰度差），0 表示每帧都做OCR")
+    parser.add_argument("--track", action="store_true", help="流式跟踪模式：间隔检测文本框，只重新识别有变化的文本框")
+    parser.add_argument("--detect-interval", type=int, default=10, help="跟踪模式下每隔多少帧重新检测文本框")
+    parser.add_argument("--frame-slot-mb", type=float, default=0, help="进程模式下每个共享内存槽位的大小（MB），指定后启动时即分配并检查 /dev/shm；默认按首帧大小分配")
+    parser.add_argument("--rec-batch-num", type=int, default=8, help="一次识别调用最多处理的文本行数")
+    args = parser.parse_args()
+    server = OCRServer(
+        execution_mode=args.mode,
+        num_workers=args.workers,
+        workers_per_core=args.workers_per_core,
+        pin_workers=args.pin,
+        change_threshold=args.change_threshold,
+        track_mode=args.track,
+    )
+    server.ocr_settings.update(
+        batch_size=args.batch_size,
+        batch_wait_ms=args.batch_wait_ms,
+        rec_batch_num=args.rec_batch_num,
+        track_detect_interval=args.detect_interval,
+        frame_slot_mb=args.frame_slot_mb,
+    )
     
     try:
-        asyncio.run(server.serve())
+        asyncio.run(server.serve(args.host, args.port))
     except KeyboardInterrupt:
         print("Server stopped by user")
\ No newline at end of file
@@ -0,0 +1,104 @@
+import asyncio
+import time
+from typing import Any, AsyncIterator, Iterable, Optional, Protocol
+
+from .scheduler import priority
+
+
+class BatchCase(Protocol):
+    """批量评估用例：指令与车机响应文本对"""
+
+    id: Any
+    sample: str
+    machineResponse: str
+
+
+class BatchOutcome:
+    """单条用例的评估结果，失败时 result 为空并携带 error；latency 为评估耗时（秒）"""
+
+    __slots__ = ("id", "result", "error", "latency")
+
+    def __init__(
+        self,
+        id: Any,
+        result: Optional[dict] = None,
+        error: Optional[str] = None,
+        latency: Optional[float] = None,
+    ):
+        self.id = id
+        self.result = result
+        self.error = error
+        self.latency = latency
+
+    def to_dict(self) -> dict:
+        if self.error is not None:
+            return {"id": self.id, "error": self.error}
+        return {"id": self.id, "result": self.result}
+
+
+async def iter_evaluations(
+    evaluator,
+    cases: Iterable[BatchCase],
+    concurrency: int = 8,
+    use_cache: bool = True,
+    pack_size: int = 1,
+    priority_class: str = "batch",
+) -> AsyncIterator[BatchOutcome]:
+    """在并发上限内评估一批用例，按完成顺序逐条产出结果
+
+    单条用例失败只记录在对应结果中，不影响其余用例。pack_size 大于1时
+    每 pack_size 条用例打包为一次模型调用，并发上限按打包调用计。
+    模型调用以 priority_class 类别参与提供商并发槽位的排队。
+    """
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+
+    if pack_size > 1:
+        cases = list(cases)
+        packs = [cases[i:i + pack_size] for i in range(0, len(cases), pack_size)]
+
+        async def run_pack(pack: list[BatchCase]) -> list[BatchOutcome]:
+            async with semaphore:
+                start = time.perf_counter()
+                with priority(priority_class):
+                    results = await evaluator.aevaluate_packed(
+                        [(case.sample, case.machineResponse) for case in pack],
+                        use_cache=use_cache,
+                    )
+                latency = time.perf_counter() - start
+            return [
+                BatchOutcome(case.id, error=str(result), latency=latency)
+                if isinstance(result, Exception)
+                else BatchOutcome(case.id, result=result, latency=latency)
+                for case, result in zip(pack, results)
+            ]
+
+        tasks = [asyncio.create_task(run_pack(pack)) for pack in packs]
+        try:
+            for finished in asyncio.as_completed(tasks):
+                for outcome in await finished:
+                    yield outcome
+        finally:
+            for task in tasks:
+                task.cancel()
+        return
+
+    async def run(case: BatchCase) -> BatchOutcome:
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                with priority(priority_class):
+                    result = await evaluator.aevaluate(
+                        case.sample, case.machineResponse, use_cache=use_cache
+                    )
+                return BatchOutcome(case.id, result=result, latency=time.perf_counter() - start)
+            except Exception as e:
+                return BatchOutcome(case.id, error=str(e), latency=time.perf_counter() - start)
+
+    tasks = [asyncio.create_task(run(case)) for case in cases]
+    try:
+        for finished in asyncio.as_completed(tasks):
+            yield await finished
+    finally:
+        # 客户端断开时取消尚未完成的评估
+        for task in tasks:
+            task.cancel()
@@ -0,0 +1,148 @@
+import hashlib
+import json
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from pathlib import Path
+from typing import Optional
+
+
+# 每写入多少条执行一次过期/容量淘汰
+EVICTION_INTERVAL = 256
+
+
+def normalize_text(text: str) -> str:
+    """归一化文本：全角转半角、去除首尾空白并合并连续空白"""
+    text = unicodedata.normalize("NFKC", text or "")
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def prompt_version(template: str) -> str:
+    """提示词模板的版本哈希，模板变更后旧缓存自动失效"""
+    return hashlib.sha256(template.encode("utf-8")).hexdigest()[:16]
+
+
+class EvaluationCache:
+    """基于SQLite的评估结果持久化缓存
+
+    键由归一化后的指令、响应、提供商、模型名及提示词版本共同决定；
+    支持TTL过期和按最近访问时间的容量淘汰。
+    """
+
+    def __init__(
+        self,
+        path: str = "data/eval_cache.sqlite3",
+        ttl_seconds: Optional[float] = 7 * 24 * 3600,
+        max_entries: int = 100_000,
+    ):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._writes = 0
+        self._lock = threading.Lock()
+        if path != ":memory:":
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS evaluations (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )"""
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_evaluations_accessed ON evaluations(accessed_at)"
+        )
+
+    @staticmethod
+    def make_key(
+        instruction: str, response: str, provider: str, model: str, prompt_hash: str
+    ) -> str:
+        """生成缓存键"""
+        payload = json.dumps(
+            [normalize_text(instruction), normalize_text(response), provider, model, prompt_hash],
+            ensure_ascii=False,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[dict]:
+        """读取缓存，过期条目视为未命中并删除"""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, created_at FROM evaluations WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None and self.ttl_seconds is not None and now - row[1] > self.ttl_seconds:
+                self._conn.execute("DELETE FROM evaluations WHERE key = ?", (key,))
+                self.evictions += 1
+                row = None
+            if row is None:
+                self.misses += 1
+                return None
+            self._conn.execute(
+                "UPDATE evaluations SET accessed_at = ? WHERE key = ?", (now, key)
+            )
+            self.hits += 1
+        return json.loads(row[0])
+
+    def set(self, key: str, value: dict):
+        """写入缓存，超出容量时淘汰最久未访问的条目"""
+        now = time.time()
+        data = json.dumps(value, ensure_ascii=False)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO evaluations (key, value, created_at, accessed_at) "
+                "VALUES (?, ?, ?, ?)",
+                (key, data, now, now),
+            )
+            # 淘汰需要全表统计，按写入批次执行以摊薄开销
+            self._writes += 1
+            if self._writes % EVICTION_INTERVAL == 1:
+                self._evict()
+
+    def _evict(self):
+        if self.ttl_seconds is not None:
+            cursor = self._conn.execute(
+                "DELETE FROM evaluations WHERE created_at < ?",
+                (time.time() - self.ttl_seconds,),
+            )
+            self.evictions += max(cursor.rowcount, 0)
+        count = self._conn.execute("SELECT COUNT(*) FROM evaluations").fetchone()[0]
+        overflow = count - self.max_entries
+        if overflow > 0:
+            self._conn.execute(
+                "DELETE FROM evaluations WHERE key IN "
+                "(SELECT key FROM evaluations ORDER BY accessed_at LIMIT ?)",
+                (overflow,),
+            )
+            self.evictions += overflow
+
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            self._conn.execute("DELETE FROM evaluations")
+
+    def stats(self) -> dict:
+        """命中/未命中统计"""
+        with self._lock:
+            size = self._conn.execute("SELECT COUNT(*) FROM evaluations").fetchone()[0]
+        total = self.hits + self.misses
+        return {
+            "size": size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
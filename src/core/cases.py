@@ -0,0 +1,83 @@
+import csv
+import json
+from pathlib import Path
+from typing import Any, Iterable, Optional
+
+# 用例文件中指令与车机响应可用的字段名
+INSTRUCTION_FIELDS = ("text", "sample", "instruction")
+RESPONSE_FIELDS = ("response", "machineResponse", "machine_response")
+
+
+class TestCase:
+    """测试用例：指令、车机响应文本及用例状态，满足 BatchCase 协议"""
+
+    __slots__ = ("id", "sample", "machineResponse", "status")
+    __test__ = False  # 避免被pytest当作测试类收集
+
+    def __init__(self, id: Any, sample: str, machineResponse: Optional[str] = None, status: Optional[str] = None):
+        self.id = str(id)
+        self.sample = sample
+        self.machineResponse = machineResponse
+        self.status = status
+
+    def to_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "sample": self.sample,
+            "machineResponse": self.machineResponse,
+            "status": self.status,
+        }
+
+
+def _first(record: dict, fields: tuple[str, ...]) -> Optional[str]:
+    for field in fields:
+        value = record.get(field)
+        if value not in (None, ""):
+            return str(value)
+    return None
+
+
+def read_records(path: str) -> list[dict]:
+    """读取JSON/YAML/CSV用例文件的原始记录"""
+    file = Path(path)
+    if file.suffix in (".yaml", ".yml"):
+        import yaml
+
+        records = yaml.safe_load(file.read_text(encoding="utf-8")) or []
+    elif file.suffix == ".csv":
+        with open(file, encoding="utf-8-sig", newline="") as f:
+            records = list(csv.DictReader(f))
+    else:
+        records = json.loads(file.read_text(encoding="utf-8"))
+    if isinstance(records, dict):
+        # 兼容 {"cases": [...]} 形式
+        records = records.get("cases", [])
+    return records
+
+
+def load_cases(path: str, responses_path: Optional[str] = None) -> list[TestCase]:
+    """加载用例文件，responses_path 可另行提供按 id 对应的车机响应"""
+    responses = {}
+    if responses_path:
+        for record in read_records(responses_path):
+            response = _first(record, RESPONSE_FIELDS)
+            if response is not None:
+                responses[str(record["id"])] = response
+
+    cases = []
+    for index, record in enumerate(read_records(path)):
+        case_id = record.get("id", index + 1)
+        sample = _first(record, INSTRUCTION_FIELDS)
+        if sample is None:
+            raise ValueError(f"用例 {case_id} 缺少指令文本字段({'/'.join(INSTRUCTION_FIELDS)})")
+        response = responses.get(str(case_id), _first(record, RESPONSE_FIELDS))
+        cases.append(TestCase(case_id, sample, response, record.get("status")))
+    return cases
+
+
+def select_cases(cases: Iterable[TestCase], statuses: Optional[Iterable[str]] = None) -> list[TestCase]:
+    """按用例状态筛选（不区分大小写），statuses 为空时返回全部"""
+    if not statuses:
+        return list(cases)
+    wanted = {status.strip().lower() for status in statuses}
+    return [case for case in cases if (case.status or "").lower() in wanted]
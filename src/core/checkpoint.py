@@ -0,0 +1,60 @@
+import json
+import os
+import time
+from pathlib import Path
+from typing import Optional
+
+
+def read_checkpoint(path: str) -> dict[str, dict]:
+    """读取检查点文件，返回 用例id -> 最后一条记录"""
+    records = {}
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                # 崩溃时写了一半的行
+                continue
+            records[str(record["id"])] = record
+    return records
+
+
+class Checkpoint:
+    """JSONL格式的运行检查点：每完成一条用例追加一行并落盘
+
+    进程崩溃时最多丢失正在写入的最后一行，重新运行同一检查点文件时
+    已成功的用例被跳过，失败的用例重新评估。
+    """
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+        self.records = read_checkpoint(path) if self.path.exists() else {}
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = open(self.path, "a", encoding="utf-8")
+
+    def is_done(self, case_id: str, fingerprint: Optional[str] = None) -> bool:
+        """用例是否已成功评估；给出指纹时还要求指令、响应和评估配置未变"""
+        record = self.records.get(str(case_id))
+        if record is None or "result" not in record:
+            return False
+        return fingerprint is None or record.get("fingerprint") == fingerprint
+
+    def done_count(self) -> int:
+        return sum(1 for record in self.records.values() if "result" in record)
+
+    def write(self, case_id: str, sample: str, response: str, result: Optional[dict] = None, error: Optional[str] = None, **extra):
+        record = {
+            "id": str(case_id),
+            "sample": sample,
+            "machineResponse": response,
+            **({"error": error} if error is not None else {"result": result}),
+            **extra,
+            "finished_at": time.time(),
+        }
+        self.records[record["id"]] = record
+        self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def close(self):
+        self._file.close()
@@ -0,0 +1,234 @@
+import asyncio
+import random
+import time
+from typing import Any, Awaitable, Callable, Hashable, Optional
+
+from .scheduler import FairScheduler
+
+
+class SingleFlight:
+    """合并相同键的并发调用：同一时刻只执行一次，所有等待者共享结果
+
+    共享调用在独立任务中执行，单个等待者被取消不会影响其他等待者；
+    所有等待者都取消后共享调用才被取消。
+    """
+
+    def __init__(self):
+        self._inflight: dict[Hashable, asyncio.Task] = {}
+        self._waiters: dict[Hashable, int] = {}
+        self.calls = 0
+        self.coalesced = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        task = self._inflight.get(key)
+        if task is None:
+            self.calls += 1
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            self._waiters[key] = 0
+            task.add_done_callback(lambda t: self._forget(key, t))
+        else:
+            self.coalesced += 1
+        self._waiters[key] += 1
+        try:
+            return await asyncio.shield(task)
+        except asyncio.CancelledError:
+            if not task.done() and self._inflight.get(key) is task:
+                self._waiters[key] -= 1
+                if self._waiters[key] == 0:
+                    # 先移除再取消，之后加入的调用方发起新的调用，而不是等到已取消的任务
+                    del self._inflight[key]
+                    del self._waiters[key]
+                    task.cancel()
+            raise
+
+    def _forget(self, key: Hashable, task: asyncio.Task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+            self._waiters.pop(key, None)
+        # 所有等待者都已取消时，避免“异常未被获取”的警告
+        if not task.cancelled():
+            task.exception()
+
+    def stats(self) -> dict:
+        return {
+            "calls": self.calls,
+            "coalesced": self.coalesced,
+            "in_flight": len(self._inflight),
+        }
+
+
+class TokenBucket:
+    """令牌桶限流：平均速率 rate 次/秒，允许 burst 次突发"""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.capacity = max(1, burst)
+        self.tokens = float(self.capacity)
+        self.updated_at = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    async def acquire(self):
+        async with self._lock:
+            self._refill()
+            while self.tokens < 1:
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+                self._refill()
+            self.tokens -= 1
+
+
+class AIMDLimiter:
+    """自适应并发上限：健康时加性增加，过载时乘性减小
+
+    首次过载前处于慢启动阶段，每次成功上限加1（每个窗口约翻倍）；之后每次
+    成功且延迟不超过基线的 latency_tolerance 倍时，上限约每个窗口加1。
+    遇到限流、服务端错误或超时时上限减半，同一窗口内的连续过载只减一次。
+    只负责计算上限，槽位的分配与 in_flight 计数由 FairScheduler 完成。
+    """
+
+    def __init__(
+        self,
+        initial_limit: int = 8,
+        min_limit: int = 1,
+        max_limit: int = 64,
+        backoff_ratio: float = 0.5,
+        latency_tolerance: float = 2.0,
+    ):
+        self.limit = float(initial_limit)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.backoff_ratio = backoff_ratio
+        self.latency_tolerance = latency_tolerance
+        self.in_flight = 0
+        self.baseline_latency: Optional[float] = None
+        self.last_backoff = 0.0
+        self.slow_start = True
+
+    def on_success(self, latency: float):
+        if self.baseline_latency is None or latency < self.baseline_latency:
+            self.baseline_latency = latency
+        else:
+            # 基线缓慢上浮，适应提供商整体延迟变化
+            self.baseline_latency += 0.01 * (latency - self.baseline_latency)
+        if latency <= self.baseline_latency * self.latency_tolerance:
+            step = 1 if self.slow_start else 1 / self.limit
+            self.limit = min(self.max_limit, self.limit + step)
+
+    def on_overload(self):
+        now = time.monotonic()
+        window = self.baseline_latency or 1.0
+        if now - self.last_backoff < window:
+            return
+        self.last_backoff = now
+        self.slow_start = False
+        self.limit = max(self.min_limit, self.limit * self.backoff_ratio)
+
+
+def is_overload_error(exc: BaseException) -> bool:
+    """是否为限流(429)、服务端错误(5xx)或超时等可重试的过载错误"""
+    status = getattr(exc, "status_code", None)
+    if status is not None:
+        return status == 429 or status >= 500
+    if isinstance(exc, (asyncio.TimeoutError, TimeoutError)):
+        return True
+    return "Timeout" in type(exc).__name__
+
+
+# 连接中断类异常（openai 与 httpx），按类名匹配以免依赖具体客户端库
+_CONNECTION_ERRORS = ("APIConnectionError", "TransportError", "ConnectionError")
+
+
+def is_transient_error(exc: BaseException) -> bool:
+    """是否为连接中断、请求超时(408)或冲突(409)等可重试、但不表示提供商过载的错误"""
+    status = getattr(exc, "status_code", None)
+    if status is not None:
+        return status in (408, 409)
+    return any(cls.__name__ in _CONNECTION_ERRORS for cls in type(exc).__mro__)
+
+
+def _retry_after(exc: BaseException) -> Optional[float]:
+    response = getattr(exc, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+class ProviderThrottle:
+    """单个提供商的限流器：令牌桶 + AIMD并发控制 + 带抖动的指数退避重试
+
+    模型客户端自身不重试，过载错误和连接中断等临时错误都在这里重试，
+    只有过载错误会缩小并发上限。并发槽位经按优先级类别加权公平排队的调度器分配，先取得槽位再等待令牌，
+    交互式请求不会排在已积压的批量请求之后。
+    """
+
+    def __init__(
+        self,
+        rate: float = 10.0,
+        burst: int = 20,
+        initial_concurrency: int = 8,
+        max_concurrency: int = 64,
+        max_retries: int = 4,
+        base_delay: float = 0.5,
+        max_delay: float = 20.0,
+        weights: Optional[dict[str, float]] = None,
+        name: str = "",
+    ):
+        self.bucket = TokenBucket(rate, burst)
+        self.limiter = AIMDLimiter(initial_concurrency, max_limit=max_concurrency)
+        self.scheduler = FairScheduler(self.limiter, weights, provider=name)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.overloads = 0
+        self.transient_errors = 0
+        self.retries = 0
+
+    async def run(self, fn: Callable[[], Awaitable[Any]]) -> Any:
+        attempt = 0
+        while True:
+            await self.scheduler.acquire()
+            try:
+                await self.bucket.acquire()
+                start = time.monotonic()
+                result = await fn()
+            except Exception as e:
+                if is_overload_error(e):
+                    self.overloads += 1
+                    self.limiter.on_overload()
+                elif is_transient_error(e):
+                    self.transient_errors += 1
+                else:
+                    raise
+                if attempt >= self.max_retries:
+                    raise
+                error = e
+            else:
+                self.limiter.on_success(time.monotonic() - start)
+                return result
+            finally:
+                self.scheduler.release()
+
+            # 全抖动指数退避，优先遵循服务端的 Retry-After
+            delay = _retry_after(error)
+            if delay is None:
+                delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+            attempt += 1
+            self.retries += 1
+            await asyncio.sleep(delay)
+
+    def stats(self) -> dict:
+        return {
+            "concurrency_limit": int(self.limiter.limit),
+            "in_flight": self.limiter.in_flight,
+            "overloads": self.overloads,
+            "transient_errors": self.transient_errors,
+            "retries": self.retries,
+            "scheduler": self.scheduler.stats(),
+        }
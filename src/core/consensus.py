@@ -0,0 +1,173 @@
+import asyncio
+import math
+import statistics
+from typing import Optional, Union
+
+from .metrics import CONSENSUS
+from .parsing import VALID_THRESHOLD
+
+# Wilson区间的z值（单侧95%）
+CONSENSUS_Z = 1.645
+
+
+def wilson_lower_bound(successes: int, total: int, z: float = CONSENSUS_Z) -> float:
+    """比例的Wilson区间下界"""
+    if total == 0:
+        return 0.0
+    p = successes / total
+    denominator = 1 + z * z / total
+    center = p + z * z / (2 * total)
+    margin = z * math.sqrt(p * (1 - p) / total + z * z / (4 * total * total))
+    return (center - margin) / denominator
+
+
+class ConsensusBudget:
+    """一次运行中共识评估可追加的模型调用总数"""
+
+    def __init__(self, max_extra_calls: int):
+        self.max_extra_calls = max_extra_calls
+        self.used = 0
+
+    def take(self) -> bool:
+        if self.used >= self.max_extra_calls:
+            return False
+        self.used += 1
+        return True
+
+    def stats(self) -> dict:
+        return {"max_extra_calls": self.max_extra_calls, "used": self.used}
+
+
+class ConsensusEvaluator:
+    """自适应多次采样共识评估
+
+    先按常规方式评估一次，综合评分远离通过阈值且结论与评分一致时直接返回；
+    否则继续独立采样，直到多数结论的Wilson下界超过0.5、剩余采样已无法
+    改变多数结论，或达到单条用例上限/运行预算。结果取多数结论中综合评分
+    最接近中位数的一次采样，并在 consensus 字段中给出一致率等统计。
+    """
+
+    def __init__(
+        self,
+        evaluator,
+        budget: Optional[ConsensusBudget] = None,
+        max_samples: int = 5,
+        margin: float = 0.15,
+        threshold: float = VALID_THRESHOLD,
+    ):
+        self.evaluator = evaluator
+        self.llm_provider = evaluator.llm_provider
+        self.budget = budget
+        self.max_samples = max(1, max_samples)
+        self.margin = margin
+        self.threshold = threshold
+        self.cases = 0
+        self.sampled_cases = 0
+        self.extra_calls = 0
+
+    @property
+    def judge_version(self) -> str:
+        return f"{self.evaluator.judge_version}+consensus{self.max_samples}"
+
+    def packed_judge_version(self, pack_size: int) -> str:
+        return f"{self.evaluator.packed_judge_version(pack_size)}+consensus{self.max_samples}"
+
+    def _clear_cut(self, result: dict) -> bool:
+        assessment = result["assessment"]
+        overall = assessment["overall_score"]
+        return (
+            abs(overall - self.threshold) >= self.margin
+            and assessment["valid"] == (overall >= self.threshold)
+        )
+
+    def _settled(self, votes: list[bool]) -> bool:
+        passed = sum(votes)
+        majority = max(passed, len(votes) - passed)
+        minority = len(votes) - majority
+        if majority - minority > self.max_samples - len(votes):
+            # 剩余采样全部倒向少数方也无法改变结论
+            return True
+        return len(votes) >= 2 and wilson_lower_bound(majority, len(votes)) > 0.5
+
+    async def _refine(self, instruction: str, response: str, first: dict) -> dict:
+        self.cases += 1
+        # 规则结论是确定的，本地模型只在高置信度时给出结论，都不再追加采样
+        if first.get("source") in ("rules", "local_judge") or self._clear_cut(first):
+            CONSENSUS.labels(self.llm_provider, "clear").inc()
+            return {
+                **first,
+                "consensus": {
+                    "samples": 1,
+                    "passed": int(first["assessment"]["valid"]),
+                    "agreement": 1.0,
+                    "mean_overall": first["assessment"]["overall_score"],
+                    "stop": "clear",
+                },
+            }
+
+        self.sampled_cases += 1
+        samples = [first]
+        votes = [first["assessment"]["valid"]]
+        stop = "cap"
+        while len(samples) < self.max_samples:
+            if self._settled(votes):
+                stop = "settled"
+                break
+            if self.budget is not None and not self.budget.take():
+                stop = "budget"
+                break
+            try:
+                sample = await self.evaluator.asample(instruction, response)
+            except Exception:
+                stop = "error"
+                break
+            self.extra_calls += 1
+            samples.append(sample)
+            votes.append(sample["assessment"]["valid"])
+        CONSENSUS.labels(self.llm_provider, stop).inc()
+
+        passed = sum(votes)
+        scores = [s["assessment"]["overall_score"] for s in samples]
+        if passed * 2 == len(votes):
+            # 平票时按平均综合评分判定
+            verdict = statistics.mean(scores) >= self.threshold
+        else:
+            verdict = passed * 2 > len(votes)
+        agreeing = [s for s in samples if s["assessment"]["valid"] == verdict]
+        median = statistics.median(s["assessment"]["overall_score"] for s in agreeing)
+        chosen = min(agreeing, key=lambda s: abs(s["assessment"]["overall_score"] - median))
+        return {
+            **chosen,
+            "consensus": {
+                "samples": len(samples),
+                "passed": passed,
+                "agreement": round(len(agreeing) / len(samples), 3),
+                "mean_overall": round(statistics.mean(scores), 3),
+                "stop": stop,
+            },
+        }
+
+    async def aevaluate(self, instruction: str, response: str, use_cache: bool = True) -> dict:
+        first = await self.evaluator.aevaluate(instruction, response, use_cache=use_cache)
+        return await self._refine(instruction, response, first)
+
+    async def aevaluate_packed(
+        self, pairs: list[tuple[str, str]], use_cache: bool = True
+    ) -> list[Union[dict, Exception]]:
+        """首轮按打包方式评估，仅对结论不明确的用例追加独立采样"""
+        firsts = await self.evaluator.aevaluate_packed(pairs, use_cache=use_cache)
+
+        async def refine(pair: tuple[str, str], first):
+            if isinstance(first, Exception):
+                return first
+            return await self._refine(pair[0], pair[1], first)
+
+        return list(await asyncio.gather(*[refine(p, f) for p, f in zip(pairs, firsts)]))
+
+    def stats(self) -> dict:
+        return {
+            "cases": self.cases,
+            "sampled_cases": self.sampled_cases,
+            "extra_calls": self.extra_calls,
+            "budget": self.budget.stats() if self.budget else None,
+        }
@@ -0,0 +1,367 @@
+"""
+本地蒸馏评估模型
+
+以历史LLM评估结论为标签，训练基于字符n-gram哈希特征的逻辑回归模型，
+纯CPU推理、无网络依赖。模型对测试是否通过（valid）给出经Platt缩放校准的
+置信度，同时预测三个维度的评分；置信度达到阈值时直接给出结论，否则交给LLM。
+
+用法：
+    python -m src.core.distill train --history data/history.sqlite3 --output data/local_judge.npz
+    python -m src.core.distill report --model data/local_judge.npz --history data/history.sqlite3
+"""
+import argparse
+import hashlib
+import json
+import sqlite3
+import time
+import zlib
+from pathlib import Path
+from typing import Iterable, Optional
+
+import numpy as np
+
+from .cache import normalize_text
+from .checkpoint import read_checkpoint
+
+DIMENSIONS = ("semantic_correctness", "state_change_confirmation", "unambiguous_expression")
+# 输出头：valid 及三个维度评分，均以逻辑回归（维度评分为软标签）拟合
+HEADS = ("valid", *DIMENSIONS)
+
+
+class Example:
+    """一条训练样本：指令、响应及LLM给出的结论与维度评分"""
+
+    __slots__ = ("instruction", "response", "valid", "scores")
+
+    def __init__(self, instruction: str, response: str, valid: bool, scores: list[float]):
+        self.instruction = instruction
+        self.response = response
+        self.valid = valid
+        self.scores = scores
+
+    def split_bucket(self) -> int:
+        """按内容哈希确定的数据集划分桶（0-99），同一用例始终落在同一划分"""
+        digest = hashlib.md5(f"{self.instruction}\x00{self.response}".encode("utf-8")).digest()
+        return digest[0] * 100 // 256
+
+
+def _example(instruction: str, response: str, result: dict) -> Optional[Example]:
+    assessment = (result or {}).get("assessment")
+    if not assessment or not instruction or not response:
+        return None
+    return Example(
+        normalize_text(instruction),
+        normalize_text(response),
+        bool(assessment["valid"]),
+        [float(assessment[field]["score"]) for field in DIMENSIONS],
+    )
+
+
+def load_examples(history_path: Optional[str] = None, checkpoints: Iterable[str] = ()) -> list[Example]:
+    """从运行历史库和检查点文件读取LLM评估结论，相同指令/响应只保留最新一条
+
+    只使用模型给出的结论（source 为 llm），规则和本地模型的结论不参与训练。
+    """
+    latest: dict[tuple[str, str], Example] = {}
+    if history_path:
+        conn = sqlite3.connect(history_path)
+        try:
+            rows = conn.execute(
+                """SELECT r.sample, r.response, r.result FROM results r JOIN runs ON runs.id = r.run_id
+                WHERE r.source = 'llm' AND r.result IS NOT NULL ORDER BY runs.created_at"""
+            )
+            for sample, response, result in rows:
+                example = _example(sample, response, json.loads(result))
+                if example is not None:
+                    latest[(example.instruction, example.response)] = example
+        finally:
+            conn.close()
+    for path in checkpoints:
+        for record in read_checkpoint(path).values():
+            result = record.get("result")
+            if not result or result.get("source") != "llm":
+                continue
+            example = _example(record.get("sample"), record.get("machineResponse"), result)
+            if example is not None:
+                latest[(example.instruction, example.response)] = example
+    return list(latest.values())
+
+
+def _ngrams(prefix: str, text: str, orders: tuple[int, ...]) -> Iterable[str]:
+    padded = f"^{text}$"
+    for n in orders:
+        for i in range(max(len(padded) - n + 1, 1)):
+            yield f"{prefix}{padded[i:i + n]}"
+
+
+def featurize(instruction: str, response: str, dim: int, orders: tuple[int, ...] = (1, 2, 3)) -> np.ndarray:
+    """字符n-gram哈希特征的索引（值均为1，稀疏表示）
+
+    指令与响应分别取n-gram，另取指令词与响应词的交叉特征，
+    使模型能学习“该指令下的该类响应”。
+    """
+    features = set()
+    for token in _ngrams("i:", instruction, orders):
+        features.add(zlib.crc32(token.encode("utf-8")) % dim)
+    response_bigrams = list(_ngrams("", response, (2,)))
+    for token in _ngrams("r:", response, orders):
+        features.add(zlib.crc32(token.encode("utf-8")) % dim)
+    instruction_bigrams = list(_ngrams("", instruction, (2,)))
+    for a in instruction_bigrams:
+        for b in response_bigrams:
+            features.add(zlib.crc32(f"x:{a}|{b}".encode("utf-8")) % dim)
+    features.add(0)  # 偏置项
+    return np.fromiter(features, dtype=np.int64)
+
+
+class _SparseMatrix:
+    """行压缩的0/1稀疏矩阵，仅实现训练所需的矩阵-向量乘法"""
+
+    def __init__(self, rows: list[np.ndarray], dim: int):
+        self.dim = dim
+        self.indices = np.concatenate(rows) if rows else np.zeros(0, dtype=np.int64)
+        self.lengths = np.array([len(row) for row in rows], dtype=np.int64)
+        self.starts = np.concatenate([[0], np.cumsum(self.lengths)[:-1]]).astype(np.int64)
+        self.row_ids = np.repeat(np.arange(len(rows)), self.lengths)
+
+    def dot(self, weights: np.ndarray) -> np.ndarray:
+        """X @ W，weights 形状为 (dim, heads)"""
+        return np.add.reduceat(weights[self.indices], self.starts, axis=0)
+
+    def tdot(self, residual: np.ndarray) -> np.ndarray:
+        """X.T @ R，residual 形状为 (rows, heads)"""
+        return np.stack(
+            [
+                np.bincount(self.indices, weights=residual[self.row_ids, head], minlength=self.dim)
+                for head in range(residual.shape[1])
+            ],
+            axis=1,
+        )
+
+
+def _sigmoid(x: np.ndarray) -> np.ndarray:
+    return 1.0 / (1.0 + np.exp(-np.clip(x, -30, 30)))
+
+
+def _targets(examples: list[Example]) -> np.ndarray:
+    return np.array([[float(e.valid), *e.scores] for e in examples])
+
+
+class LocalJudge:
+    """本地蒸馏评估模型，可作为预评估阶段接入评估器（结论来源为 local_judge）"""
+
+    name = "local_judge"
+    deterministic = False
+
+    def __init__(
+        self,
+        weights: np.ndarray,
+        dim: int,
+        platt: tuple[float, float] = (1.0, 0.0),
+        confidence_threshold: float = 0.95,
+        metadata: Optional[dict] = None,
+    ):
+        self.weights = weights
+        self.dim = dim
+        self.platt = platt
+        self.confidence_threshold = confidence_threshold
+        self.metadata = metadata or {}
+        self.checked = 0
+        self.hits = 0
+
+    @classmethod
+    def train(
+        cls,
+        examples: list[Example],
+        dim: int = 1 << 16,
+        epochs: int = 300,
+        learning_rate: float = 0.05,
+        l2: float = 1e-4,
+        target_accuracy: float = 0.98,
+    ) -> tuple["LocalJudge", dict]:
+        """训练并在留出集上评估，返回 (模型, 准确率报告)
+
+        数据按内容哈希划分为训练(70%)、校准(15%)和测试(15%)集：校准集用于
+        Platt缩放及选择置信度阈值（使被接管用例的准确率不低于 target_accuracy），
+        测试集只用于报告。
+        """
+        train = [e for e in examples if e.split_bucket() < 70]
+        calibration = [e for e in examples if 70 <= e.split_bucket() < 85]
+        test = [e for e in examples if e.split_bucket() >= 85]
+        if not train or not calibration:
+            raise ValueError(f"训练样本不足: 共 {len(examples)} 条")
+
+        matrix = _SparseMatrix([featurize(e.instruction, e.response, dim) for e in train], dim)
+        targets = _targets(train)
+        weights = np.zeros((dim, len(HEADS)))
+        # Adam 全批量梯度下降
+        m = np.zeros_like(weights)
+        v = np.zeros_like(weights)
+        for step in range(1, epochs + 1):
+            residual = _sigmoid(matrix.dot(weights)) - targets
+            gradient = matrix.tdot(residual) / len(train) + l2 * weights
+            m = 0.9 * m + 0.1 * gradient
+            v = 0.999 * v + 0.001 * gradient ** 2
+            weights -= learning_rate * (m / (1 - 0.9 ** step)) / (np.sqrt(v / (1 - 0.999 ** step)) + 1e-8)
+
+        judge = cls(weights, dim, metadata={"trained_at": time.time(), "examples": len(examples)})
+        judge.platt = judge._fit_platt(calibration)
+        judge.confidence_threshold = judge._choose_threshold(calibration, target_accuracy)
+        report = {
+            "train": len(train),
+            "calibration": len(calibration),
+            "test": judge.accuracy_report(test),
+            "confidence_threshold": judge.confidence_threshold,
+        }
+        judge.metadata["report"] = report
+        return judge, report
+
+    def _logit(self, instruction: str, response: str) -> np.ndarray:
+        features = featurize(normalize_text(instruction), normalize_text(response), self.dim)
+        return self.weights[features].sum(axis=0)
+
+    def _fit_platt(self, examples: list[Example]) -> tuple[float, float]:
+        """在校准集上拟合 valid 头的Platt缩放参数"""
+        logits = np.array([self._logit(e.instruction, e.response)[0] for e in examples])
+        labels = np.array([float(e.valid) for e in examples])
+        a, b = 1.0, 0.0
+        for _ in range(500):
+            p = _sigmoid(a * logits + b)
+            a -= 0.1 * float(np.mean((p - labels) * logits))
+            b -= 0.1 * float(np.mean(p - labels))
+        return a, b
+
+    def predict(self, instruction: str, response: str) -> tuple[float, list[float]]:
+        """返回 (通过概率, 三个维度评分)"""
+        logits = self._logit(instruction, response)
+        a, b = self.platt
+        probability = float(_sigmoid(a * logits[0] + b))
+        return probability, [float(score) for score in _sigmoid(logits[1:])]
+
+    def _choose_threshold(self, examples: list[Example], target_accuracy: float) -> float:
+        """选择使高置信度用例准确率不低于目标的最低置信度阈值"""
+        predictions = []
+        for e in examples:
+            probability, _ = self.predict(e.instruction, e.response)
+            predictions.append((max(probability, 1 - probability), (probability >= 0.5) == e.valid))
+        predictions.sort(reverse=True)
+        # 无法达到目标准确率时阈值大于1，即从不接管
+        threshold = 1.01
+        correct = 0
+        for count, (confidence, is_correct) in enumerate(predictions, 1):
+            correct += is_correct
+            if correct / count >= target_accuracy:
+                threshold = confidence
+        return threshold
+
+    def accuracy_report(self, examples: list[Example]) -> dict:
+        """在给定样本上对比LLM标签：整体准确率、接管率及接管部分的准确率"""
+        total = correct = covered = covered_correct = 0
+        score_error = 0.0
+        for e in examples:
+            probability, scores = self.predict(e.instruction, e.response)
+            is_correct = (probability >= 0.5) == e.valid
+            total += 1
+            correct += is_correct
+            score_error += sum(abs(p - t) for p, t in zip(scores, e.scores)) / len(scores)
+            if max(probability, 1 - probability) >= self.confidence_threshold:
+                covered += 1
+                covered_correct += is_correct
+        return {
+            "examples": total,
+            "accuracy": correct / total if total else None,
+            "coverage": covered / total if total else None,
+            "covered_accuracy": covered_correct / covered if covered else None,
+            "score_mae": score_error / total if total else None,
+        }
+
+    def try_evaluate(self, instruction: str, response: str) -> Optional[dict]:
+        self.checked += 1
+        probability, scores = self.predict(instruction, response)
+        confidence = max(probability, 1 - probability)
+        if confidence < self.confidence_threshold:
+            return None
+        self.hits += 1
+        comment = f"本地模型预测（置信度 {confidence:.2f}）"
+        return {
+            "assessment": {
+                **{
+                    field: {"score": round(score, 2), "comment": comment}
+                    for field, score in zip(DIMENSIONS, scores)
+                },
+                "overall_score": round(sum(scores) / len(scores), 2),
+                "valid": probability >= 0.5,
+                "suggestions": [],
+            },
+            "source": self.name,
+        }
+
+    def stats(self) -> dict:
+        return {
+            "checked": self.checked,
+            "hits": self.hits,
+            "hit_rate": self.hits / self.checked if self.checked else 0.0,
+            "confidence_threshold": self.confidence_threshold,
+        }
+
+    def save(self, path: str):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        # 只保存非零权重，哈希空间中大部分行未被使用
+        rows = np.flatnonzero(np.any(self.weights != 0, axis=1))
+        with open(path, "wb") as f:
+            np.savez_compressed(
+                f,
+                rows=rows,
+                values=self.weights[rows],
+                dim=self.dim,
+                platt=np.array(self.platt),
+                confidence_threshold=self.confidence_threshold,
+                metadata=json.dumps(self.metadata, ensure_ascii=False),
+            )
+
+    @classmethod
+    def load(cls, path: str) -> "LocalJudge":
+        data = np.load(path)
+        dim = int(data["dim"])
+        weights = np.zeros((dim, len(HEADS)))
+        weights[data["rows"]] = data["values"]
+        return cls(
+            weights,
+            dim,
+            platt=tuple(float(x) for x in data["platt"]),
+            confidence_threshold=float(data["confidence_threshold"]),
+            metadata=json.loads(str(data["metadata"])),
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="训练/评估本地蒸馏评估模型")
+    parser.add_argument("command", choices=["train", "report"])
+    parser.add_argument("--history", default="data/history.sqlite3", help="运行历史库")
+    parser.add_argument("--checkpoint", action="append", default=[], help="额外的检查点文件，可重复指定")
+    parser.add_argument("--model", default="data/local_judge.npz", help="report 时读取的模型")
+    parser.add_argument("--output", default="data/local_judge.npz", help="train 时保存的模型")
+    parser.add_argument("--target-accuracy", type=float, default=0.98, help="本地接管用例的目标准确率")
+    parser.add_argument("--epochs", type=int, default=300)
+    args = parser.parse_args()
+
+    history = args.history if Path(args.history).exists() else None
+    examples = load_examples(history, args.checkpoint)
+    if args.command == "train":
+        start = time.perf_counter()
+        judge, report = LocalJudge.train(
+            examples, epochs=args.epochs, target_accuracy=args.target_accuracy
+        )
+        judge.save(args.output)
+        report["train_seconds"] = round(time.perf_counter() - start, 2)
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+        print(f"模型已保存到 {args.output}")
+    else:
+        judge = LocalJudge.load(args.model)
+        # 报告在测试集划分上计算，与训练时留出的样本一致
+        test = [e for e in examples if e.split_bucket() >= 85]
+        print(json.dumps(judge.accuracy_report(test), ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,22 @@
-from langchain.prompts import ChatPromptTemplate
-from langchain_core.output_parsers import JsonOutputParser
-from pydantic import BaseModel, Field
-from langchain_openai import ChatOpenAI
-import dashscope
+from pydantic import BaseModel, Field, ValidationError
+from functools import cached_property
+import asyncio
+import httpx
+import json
 import os
+import time
 from dotenv import load_dotenv
-from typing import Literal
+from .cache import EvaluationCache, prompt_version
+from .concurrency import ProviderThrottle, SingleFlight
+from .failover import ProviderGroupEvaluator
+from .metrics import ERRORS, EVALUATION_SECONDS, REPAIRS, RESULTS, STAGE_SECONDS, record_usage, stage_timer
+from .parsing import REASK_PROMPT, OutputRepairError, parse_evaluation, parse_packed, repair_assessment
+from .rules import PreEvaluator, RuleBasedPreEvaluator
+from .scheduler import class_weights
+from typing import TYPE_CHECKING, Any, Literal, Optional, Union
+
+if TYPE_CHECKING:
+    from langchain_openai import ChatOpenAI
 
 load_dotenv()
 
@@ -32,15 +43,13 @@ class Assessment(BaseModel):
 
 class EvaluationResult(BaseModel):
     assessment: Assessment = Field(description="完整评估结果")
+    source: Optional[str] = Field(default=None, description="评估来源：llm/cache/rules/local_judge")
+    provider: Optional[str] = Field(default=None, description="给出结论的提供商，规则和本地模型结论为空")
+    consensus: Optional[dict] = Field(default=None, description="多次采样共识统计，仅共识评估时存在")
 
 
-def create_evaluation_chain(
-    llm_provider: Literal[
-        "openai", "anthropic", "aliyun_bailian", "openrouter"
-    ] = "aliyun_bailian",
-):
-    """创建包含完整评估逻辑的LangChain流水线"""
-    template = """作为车机系统测试专家，请严格评估：
+# 评估提示词模板
+EVALUATION_TEMPLATE = """作为车机系统测试专家，请严格评估：
     指令：{instruction}
     响应：{response}
     
@@ -66,37 +75,792 @@ def create_evaluation_chain(
       }}
     }}"""
 
-    prompt = ChatPromptTemplate.from_template(template)
 
-    if llm_provider == "aliyun_bailian":
-        api_key = os.getenv("DASHSCOPE_API_KEY")
-        llm = ChatOpenAI(
-            base_url="https://dashscope.aliyuncs.com/compatible-mode/v1",
-            api_key=api_key,
-            model="deepseek-v3",
-        )
-    elif llm_provider == "openrouter":
-        api_key = os.getenv("OPENROUTER_API_KEY")
-        llm = ChatOpenAI(
-            base_url="https://openrouter.ai/api/v1",
-            api_key=api_key,
-            model="google/gemini-2.0-flash-001",
-        )
-    else:
+# 打包评估提示词模板：一次调用评估多条用例，按 id 返回
+PACKED_EVALUATION_TEMPLATE = """作为车机系统测试专家，请严格逐条评估以下测试用例（JSON数组，每条包含 id、指令 instruction 和响应 response）：
+    {cases}
+
+    请对每条用例分别按以下维度评估并返回严格JSON格式：
+    1. semantic_correctness: 评分0-1和评估意见
+    2. state_change_confirmation: 评分0-1和评估意见
+    3. unambiguous_expression: 评分0-1和评估意见
+    4. overall_score: 三个维度的平均分
+    5. valid: 测试是否通过
+    6. suggestions: 改进建议列表
+
+    输出必须为中文，用例之间相互独立评估
+
+    输出必须严格符合以下JSON结构，assessments 中每条用例一项并保留原 id：
+    {{
+      "assessments": [
+        {{
+          "id": 0,
+          "assessment": {{
+            "semantic_correctness": {{"score": 0-1, "comment": "..."}},
+            "state_change_confirmation": {{"score": 0-1, "comment": "..."}},
+            "unambiguous_expression": {{"score": 0-1, "comment": "..."}},
+            "overall_score": 0.0-1.0,
+            "valid": true/false,
+            "suggestions": ["...", "..."]
+          }}
+        }}
+      ]
+    }}"""
+
+
+# 提示词前缀缓存友好的布局：评估标准与JSON结构作为固定的系统消息前缀，
+# 用例数据放在最后，所有请求共享同一前缀，可命中提供商侧的提示词缓存
+EVALUATION_SYSTEM_PROMPT = """作为车机系统测试专家，请严格评估用户给出的指令和车机系统响应。
+
+请按以下维度评估并返回严格JSON格式：
+1. semantic_correctness: 评分0-1和评估意见
+2. state_change_confirmation: 评分0-1和评估意见
+3. unambiguous_expression: 评分0-1和评估意见
+4. overall_score: 三个维度的平均分
+5. valid: 测试是否通过
+6. suggestions: 改进建议列表
+
+输出必须为中文
+
+输出必须严格符合以下JSON结构：
+{{
+  "assessment": {{
+    "semantic_correctness": {{"score": 0-1, "comment": "..."}},
+    "state_change_confirmation": {{"score": 0-1, "comment": "..."}},
+    "unambiguous_expression": {{"score": 0-1, "comment": "..."}},
+    "overall_score": 0.0-1.0,
+    "valid": true/false,
+    "suggestions": ["...", "..."]
+  }}
+}}"""
+
+# 精简版评估标准，用于与完整版做质量对比
+COMPACT_SYSTEM_PROMPT = """车机系统测试评估。对指令和响应按三个维度打分(0-1)并给出中文意见：semantic_correctness 响应是否满足指令意图；state_change_confirmation 是否明确告知状态变更；unambiguous_expression 表述是否无歧义。overall_score 为三者平均分，valid 为是否通过，suggestions 为中文改进建议列表。只输出如下JSON：
+{{"assessment": {{"semantic_correctness": {{"score": 0-1, "comment": "..."}}, "state_change_confirmation": {{"score": 0-1, "comment": "..."}}, "unambiguous_expression": {{"score": 0-1, "comment": "..."}}, "overall_score": 0.0-1.0, "valid": true/false, "suggestions": ["..."]}}}}"""
+
+PACKED_SYSTEM_PROMPT = """作为车机系统测试专家，请严格逐条评估用户给出的测试用例（JSON数组，每条包含 id、指令 instruction 和响应 response）。
+
+请对每条用例分别按以下维度评估并返回严格JSON格式：
+1. semantic_correctness: 评分0-1和评估意见
+2. state_change_confirmation: 评分0-1和评估意见
+3. unambiguous_expression: 评分0-1和评估意见
+4. overall_score: 三个维度的平均分
+5. valid: 测试是否通过
+6. suggestions: 改进建议列表
+
+输出必须为中文，用例之间相互独立评估
+
+输出必须严格符合以下JSON结构，assessments 中每条用例一项并保留原 id：
+{{
+  "assessments": [
+    {{
+      "id": 0,
+      "assessment": {{
+        "semantic_correctness": {{"score": 0-1, "comment": "..."}},
+        "state_change_confirmation": {{"score": 0-1, "comment": "..."}},
+        "unambiguous_expression": {{"score": 0-1, "comment": "..."}},
+        "overall_score": 0.0-1.0,
+        "valid": true/false,
+        "suggestions": ["...", "..."]
+      }}
+    }}
+  ]
+}}"""
+
+CASE_TEMPLATE = """指令：{instruction}
+响应：{response}"""
+
+PACKED_CASES_TEMPLATE = """测试用例：
+{cases}
+"""
+
+# 提示词版本：legacy 为原单条消息模板，cached 为前缀缓存友好布局，compact 为精简评估标准
+PROMPT_VARIANTS = {
+    "legacy": {
+        "single": [("human", EVALUATION_TEMPLATE)],
+        "packed": [("human", PACKED_EVALUATION_TEMPLATE)],
+    },
+    "cached": {
+        "single": [("system", EVALUATION_SYSTEM_PROMPT), ("human", CASE_TEMPLATE)],
+        "packed": [("system", PACKED_SYSTEM_PROMPT), ("human", PACKED_CASES_TEMPLATE)],
+    },
+    "compact": {
+        "single": [("system", COMPACT_SYSTEM_PROMPT), ("human", CASE_TEMPLATE)],
+        "packed": [("system", PACKED_SYSTEM_PROMPT), ("human", PACKED_CASES_TEMPLATE)],
+    },
+}
+# 默认沿用原模板：切换版本会改变 judge_version，已有缓存和基线结论全部失效
+DEFAULT_PROMPT_VARIANT = "legacy"
+
+
+def prompt_messages(variant: str, kind: str = "single") -> list[tuple[str, str]]:
+    """指定提示词版本的消息模板，kind 为 single（逐条）或 packed（打包）"""
+    if variant not in PROMPT_VARIANTS:
+        raise ValueError(f"不支持的提示词版本: {variant}")
+    return PROMPT_VARIANTS[variant][kind]
+
+
+def prompt_messages_version(messages: list[tuple[str, str]]) -> str:
+    """消息模板的版本哈希；单条消息时与原模板哈希一致，已有缓存继续有效"""
+    if len(messages) == 1:
+        return prompt_version(messages[0][1])
+    return prompt_version("\n".join(f"{role}:{template}" for role, template in messages))
+
+
+# OpenAI兼容接口的提供商配置
+PROVIDER_CONFIGS = {
+    "aliyun_bailian": {
+        "base_url": "https://dashscope.aliyuncs.com/compatible-mode/v1",
+        "api_key_env": "DASHSCOPE_API_KEY",
+        "model": "deepseek-v3",
+        "rate_limit": 5.0,
+        "burst": 10,
+        # 兼容模式下该模型未验证支持 response_format，默认不开启
+        "json_mode": False,
+    },
+    "openrouter": {
+        "base_url": "https://openrouter.ai/api/v1",
+        "api_key_env": "OPENROUTER_API_KEY",
+        "model": "google/gemini-2.0-flash-001",
+        "rate_limit": 10.0,
+        "burst": 20,
+        "json_mode": True,
+    },
+}
+
+# 连接池配置：保持长连接，避免每次评估重新握手
+HTTP_POOL_LIMITS = httpx.Limits(
+    max_connections=100,
+    max_keepalive_connections=50,
+    keepalive_expiry=60.0,
+)
+HTTP_TIMEOUT = httpx.Timeout(60.0, connect=10.0)
+
+
+def create_llm(
+    llm_provider: str,
+    http_client: Optional[httpx.Client] = None,
+    http_async_client: Optional[httpx.AsyncClient] = None,
+    max_retries: int = 2,
+) -> "ChatOpenAI":
+    """按提供商配置创建OpenAI兼容的对话模型"""
+    # langchain/openai 导入耗时较长，推迟到首次使用提供商时
+    from langchain_openai import ChatOpenAI
+
+    config = PROVIDER_CONFIGS.get(llm_provider)
+    if config is None:
         raise ValueError(f"不支持的LLM提供商: {llm_provider}")
 
-    return prompt | llm | JsonOutputParser(pydantic_object=EvaluationResult)
+    # <PROVIDER>_BASE_URL 可将提供商指向本地模拟服务等兼容端点
+    prefix = llm_provider.upper()
+    base_url = os.getenv(f"{prefix}_BASE_URL", config["base_url"])
+    # 支持JSON模式的提供商约束模型只输出JSON对象，<PROVIDER>_JSON_MODE=0/1 可关闭/开启；
+    # 提供商拒绝 response_format 时评估器会自动去掉该参数重试
+    json_mode = os.getenv(f"{prefix}_JSON_MODE", "1" if config.get("json_mode") else "0") == "1"
+    return ChatOpenAI(
+        base_url=base_url,
+        api_key=os.getenv(config["api_key_env"]),
+        model=config["model"],
+        http_client=http_client,
+        http_async_client=http_async_client,
+        max_retries=max_retries,
+        stream_usage=True,
+        model_kwargs={"response_format": {"type": "json_object"}} if json_mode else {},
+    )
+
+
+def create_evaluation_chain(
+    llm_provider: Literal[
+        "openai", "anthropic", "aliyun_bailian", "openrouter"
+    ] = "aliyun_bailian",
+    http_client: Optional[httpx.Client] = None,
+    http_async_client: Optional[httpx.AsyncClient] = None,
+    max_retries: int = 2,
+    prompt_variant: str = DEFAULT_PROMPT_VARIANT,
+):
+    """创建包含完整评估逻辑的LangChain流水线，输出文本由 parsing 模块解析修复"""
+    from langchain_core.output_parsers import StrOutputParser
+    from langchain_core.prompts import ChatPromptTemplate
+
+    prompt = ChatPromptTemplate.from_messages(prompt_messages(prompt_variant))
+    llm = create_llm(llm_provider, http_client, http_async_client, max_retries)
+    return prompt | llm | StrOutputParser()
+
+
+def create_packed_evaluation_chain(
+    llm_provider: str = "aliyun_bailian",
+    http_client: Optional[httpx.Client] = None,
+    http_async_client: Optional[httpx.AsyncClient] = None,
+    max_retries: int = 2,
+    prompt_variant: str = DEFAULT_PROMPT_VARIANT,
+):
+    """创建一次评估多条用例的打包流水线，输入为JSON序列化的用例列表"""
+    from langchain_core.output_parsers import StrOutputParser
+    from langchain_core.prompts import ChatPromptTemplate
+
+    prompt = ChatPromptTemplate.from_messages(prompt_messages(prompt_variant, "packed"))
+    llm = create_llm(llm_provider, http_client, http_async_client, max_retries)
+    return prompt | llm | StrOutputParser()
+
+
+def _match_packed_assessments(
+    output: Any, count: int, repairs: Optional[list[str]] = None
+) -> list[Optional[dict]]:
+    """将打包输出按 id（缺失时按顺序）匹配回各用例，并逐条修复、校验结构"""
+    items = output.get("assessments") if isinstance(output, dict) else output
+    if not isinstance(items, list):
+        raise ValueError("打包评估输出缺少 assessments 列表")
+
+    matched: list[Optional[dict]] = [None] * count
+    for index, item in enumerate(items):
+        if not isinstance(item, dict):
+            continue
+        case_id = item.get("id", index)
+        if isinstance(case_id, str) and case_id.isdigit():
+            case_id = int(case_id)
+        if not isinstance(case_id, int) or not 0 <= case_id < count:
+            continue
+        try:
+            repaired, item_repairs = repair_assessment(
+                {"assessment": item["assessment"]} if "assessment" in item else item
+            )
+            assessment = Assessment.model_validate(repaired["assessment"])
+        except (OutputRepairError, ValidationError):
+            continue
+        if repairs is not None:
+            repairs.extend(item_repairs)
+        matched[case_id] = {"assessment": assessment.model_dump(), "source": "llm"}
+    return matched
 
 
 class LLMEvaluator:
-    def __init__(self, llm_provider: str = "openrouter"):
-        self.eval_chain = create_evaluation_chain(llm_provider)
+    def __init__(
+        self,
+        llm_provider: str = "openrouter",
+        http_client: Optional[httpx.Client] = None,
+        http_async_client: Optional[httpx.AsyncClient] = None,
+        cache: Optional[EvaluationCache] = None,
+        throttle: Optional[ProviderThrottle] = None,
+        pre_evaluators: Optional[list[PreEvaluator]] = None,
+        prompt_variant: str = DEFAULT_PROMPT_VARIANT,
+    ):
+        if llm_provider not in PROVIDER_CONFIGS:
+            raise ValueError(f"不支持的LLM提供商: {llm_provider}")
+        self.llm_provider = llm_provider
+        self.pre_evaluators = pre_evaluators or []
+        self.http_client = http_client
+        self.http_async_client = http_async_client
+        self.throttle = throttle
+        self.model = PROVIDER_CONFIGS[llm_provider]["model"]
+        self.prompt_variant = prompt_variant
+        self.prompt_hash = prompt_messages_version(prompt_messages(prompt_variant))
+        self.packed_prompt_hash = prompt_messages_version(prompt_messages(prompt_variant, "packed"))
+        self.cache = cache
+        self._inflight = SingleFlight()
+        self.packed_calls = 0
+        self.packed_fallbacks = 0
+        self.repaired = 0
+        self.reasks = 0
+        self.json_mode_rejected = False
+        self.tokens = {"prompt": 0, "prompt_cached": 0, "completion": 0}
+
+    @property
+    def judge_version(self) -> str:
+        """决定评估结论的配置（提供商、模型、提示词版本），任一变化都需重新评估"""
+        return f"{self.llm_provider}:{self.model}:{self.prompt_hash}"
 
-    def evaluate(self, instruction: str, response: str) -> EvaluationResult:
+    def packed_judge_version(self, pack_size: int) -> str:
+        """打包评估时的 judge_version，附加打包提示词版本和每次调用的用例数"""
+        if pack_size <= 1:
+            return self.judge_version
+        return f"{self.judge_version}:packed{pack_size}:{self.packed_prompt_hash}"
+
+    @property
+    def _max_retries(self) -> int:
+        # 由限流器统一负责重试时，关闭客户端自身的重试
+        return 0 if self.throttle else 2
+
+    @cached_property
+    def eval_chain(self):
+        """评估流水线，首次使用时创建"""
+        return create_evaluation_chain(
+            self.llm_provider,
+            http_client=self.http_client,
+            http_async_client=self.http_async_client,
+            max_retries=self._max_retries,
+            prompt_variant=self.prompt_variant,
+        )
+
+    @cached_property
+    def packed_chain(self):
+        """打包评估流水线，首次使用时创建"""
+        return create_packed_evaluation_chain(
+            self.llm_provider,
+            http_client=self.http_client,
+            http_async_client=self.http_async_client,
+            max_retries=self._max_retries,
+            prompt_variant=self.prompt_variant,
+        )
+
+    def prewarm(self):
+        """预先创建评估流水线，避免首个请求承担导入和构建开销"""
+        self.eval_chain
+        self.packed_chain
+
+    async def _achain(self, name: str):
+        """异步调用时获取流水线：首次使用时在线程中创建，导入langchain等重依赖不阻塞事件循环"""
+        if name not in self.__dict__:
+            await asyncio.to_thread(getattr, self, name)
+        return self.__dict__[name]
+
+    def _cache_key(
+        self, instruction: str, response: str, prompt_hash: Optional[str] = None
+    ) -> str:
+        return EvaluationCache.make_key(
+            instruction,
+            response,
+            self.llm_provider,
+            self.model,
+            prompt_hash or self.prompt_hash,
+        )
+
+    def evaluate(
+        self, instruction: str, response: str, use_cache: bool = True
+    ) -> EvaluationResult:
         """执行评估并返回结构化结果"""
+        start = time.perf_counter()
+        key = self._cache_key(instruction, response)
+        result = self._lookup(key, instruction, response, use_cache)
+        if result is None:
+            try:
+                output = self._call_chain(
+                    self.eval_chain, {"instruction": instruction, "response": response}
+                )
+                result = self._validate(output)
+            except Exception as e:
+                ERRORS.labels(self.llm_provider, type(e).__name__).inc()
+                raise RuntimeError(f"评估过程中发生错误: {str(e)}") from e
+            if self.cache:
+                self.cache.set(key, result)
+        self._record(result, start)
+        return result
+
+    async def aevaluate(
+        self, instruction: str, response: str, use_cache: bool = True
+    ) -> EvaluationResult:
+        """异步执行评估，不阻塞事件循环
+
+        相同指令/响应的并发请求会合并为一次模型调用。
+        """
+        start = time.perf_counter()
+        key = self._cache_key(instruction, response)
+        result = self._lookup(key, instruction, response, use_cache)
+        if result is None:
+            result = await self._inflight.do(
+                key, lambda: self._ainvoke(key, instruction, response)
+            )
+        self._record(result, start)
+        return result
+
+    def _record(self, result: dict, start: float):
+        source = result.get("source") or "llm"
+        RESULTS.labels(self.llm_provider, source).inc()
+        EVALUATION_SECONDS.labels(self.llm_provider, source).observe(
+            time.perf_counter() - start
+        )
+
+    def _call_chain(self, chain, inputs: dict, parse=parse_evaluation) -> Any:
+        """同步分阶段执行流水线，记录提示词渲染、首字节、模型调用和解析耗时
+
+        输出无法在本地修复时携带原输出重新请求一次。
+        """
+        prompt, llm, parser = chain.first, chain.middle[0], chain.last
+        with stage_timer("prompt_render", self.llm_provider, self.model):
+            messages = prompt.invoke(inputs).to_messages()
+        text = self._text(parser, self._stream(llm, messages))
         try:
-            return self.eval_chain.invoke(
-                {"instruction": instruction, "response": response}
+            return self._parse(parse, text)
+        except OutputRepairError:
+            self._count_reask()
+            text = self._text(parser, self._stream(llm, messages + self._reask_messages(text)))
+            return self._parse(parse, text)
+
+    async def _acall_chain(self, chain, inputs: dict, parse=parse_evaluation) -> Any:
+        """异步分阶段执行流水线，记录提示词渲染、首字节、模型调用和解析耗时
+
+        输出无法在本地修复时携带原输出重新请求一次。
+        """
+        prompt, llm, parser = chain.first, chain.middle[0], chain.last
+        with stage_timer("prompt_render", self.llm_provider, self.model):
+            messages = prompt.invoke(inputs).to_messages()
+        text = self._text(parser, await self._astream(llm, messages))
+        try:
+            return self._parse(parse, text)
+        except OutputRepairError:
+            self._count_reask()
+            text = self._text(
+                parser, await self._astream(llm, messages + self._reask_messages(text))
             )
+            return self._parse(parse, text)
+
+    def _rejects_json_mode(self, llm, exc: Exception) -> bool:
+        """提供商以400拒绝 response_format 时，此后的请求都不再携带该参数"""
+        if getattr(exc, "status_code", None) != 400 or "response_format" not in str(exc):
+            return False
+        if "response_format" not in llm.model_kwargs:
+            return False
+        print(f"{self.llm_provider} 不支持JSON模式，去掉 response_format 后重试: {exc}")
+        self.json_mode_rejected = True
+        return True
+
+    def _without_rejected_json_mode(self, llm):
+        if self.json_mode_rejected and "response_format" in llm.model_kwargs:
+            llm.model_kwargs = {k: v for k, v in llm.model_kwargs.items() if k != "response_format"}
+        return llm
+
+    def _stream(self, llm, messages: list):
+        llm = self._without_rejected_json_mode(llm)
+        try:
+            return self._stream_once(llm, messages)
+        except Exception as e:
+            if not self._rejects_json_mode(llm, e):
+                raise
+            return self._stream_once(self._without_rejected_json_mode(llm), messages)
+
+    async def _astream(self, llm, messages: list):
+        llm = self._without_rejected_json_mode(llm)
+        try:
+            return await self._astream_once(llm, messages)
         except Exception as e:
+            if not self._rejects_json_mode(llm, e):
+                raise
+            return await self._astream_once(self._without_rejected_json_mode(llm), messages)
+
+    def _stream_once(self, llm, messages: list):
+        message = None
+        with stage_timer("provider", self.llm_provider, self.model):
+            request_start = time.perf_counter()
+            for chunk in llm.stream(messages):
+                if message is None:
+                    STAGE_SECONDS.labels("ttfb", self.llm_provider, self.model).observe(
+                        time.perf_counter() - request_start
+                    )
+                    message = chunk
+                else:
+                    message += chunk
+        return message
+
+    async def _astream_once(self, llm, messages: list):
+        message = None
+        with stage_timer("provider", self.llm_provider, self.model):
+            request_start = time.perf_counter()
+            async for chunk in llm.astream(messages):
+                if message is None:
+                    STAGE_SECONDS.labels("ttfb", self.llm_provider, self.model).observe(
+                        time.perf_counter() - request_start
+                    )
+                    message = chunk
+                else:
+                    message += chunk
+        return message
+
+    def _text(self, parser, message) -> str:
+        if message is None:
+            raise ValueError("模型未返回任何内容")
+        usage = record_usage(self.llm_provider, self.model, message.usage_metadata)
+        for kind, count in usage.items():
+            self.tokens[kind] += count
+        return parser.invoke(message)
+
+    def _parse(self, parse, text: str) -> Any:
+        """解析模型输出，记录本地修复的类型"""
+        with stage_timer("parse", self.llm_provider, self.model):
+            output, repairs = parse(text)
+        self._count_repairs(repairs)
+        return output
+
+    def _count_repairs(self, repairs: list[str]):
+        if repairs:
+            self.repaired += 1
+        for kind in repairs:
+            REPAIRS.labels(self.llm_provider, kind).inc()
+
+    def _count_reask(self):
+        self.reasks += 1
+        REPAIRS.labels(self.llm_provider, "reask").inc()
+
+    @staticmethod
+    def _reask_messages(text: str) -> list:
+        from langchain_core.messages import AIMessage, HumanMessage
+
+        return [AIMessage(content=text), HumanMessage(content=REASK_PROMPT)]
+
+    def _validate(self, output: Any) -> EvaluationResult:
+        """校验模型输出结构并标记来源"""
+        with stage_timer("validate", self.llm_provider, self.model):
+            result = EvaluationResult.model_validate(output).model_dump()
+        result["source"] = "llm"
+        result["provider"] = self.llm_provider
+        return result
+
+    def _lookup(
+        self, key: str, instruction: str, response: str, use_cache: bool
+    ) -> Optional[EvaluationResult]:
+        """依次尝试确定性规则、结果缓存和本地模型等其余预评估，均未命中时返回None"""
+        for pre_evaluator in self.pre_evaluators:
+            if pre_evaluator.deterministic:
+                result = pre_evaluator.try_evaluate(instruction, response)
+                if result is not None:
+                    return result
+        if self.cache and use_cache:
+            cached = self.cache.get(key)
+            if cached is not None:
+                return {**cached, "source": "cache", "provider": self.llm_provider}
+        for pre_evaluator in self.pre_evaluators:
+            if not pre_evaluator.deterministic:
+                result = pre_evaluator.try_evaluate(instruction, response)
+                if result is not None:
+                    return result
+        return None
+
+    async def _throttled(self, fn):
+        """经提供商限流器调用模型（未配置限流器时直接调用）"""
+        if self.throttle is None:
+            return await fn()
+        return await self.throttle.run(fn)
+
+    async def _ainvoke(self, key: str, instruction: str, response: str) -> EvaluationResult:
+        result = await self.asample(instruction, response)
+        if self.cache:
+            self.cache.set(key, result)
+        return result
+
+    async def asample(self, instruction: str, response: str) -> EvaluationResult:
+        """直接调用模型评估一次，不经过预评估、缓存和请求合并
+
+        多次采样共识评估用它获取相互独立的评估结果。
+        """
+        try:
+            chain = await self._achain("eval_chain")
+            output = await self._throttled(
+                lambda: self._acall_chain(
+                    chain, {"instruction": instruction, "response": response}
+                )
+            )
+            return self._validate(output)
+        except Exception as e:
+            ERRORS.labels(self.llm_provider, type(e).__name__).inc()
             raise RuntimeError(f"评估过程中发生错误: {str(e)}") from e
+
+    async def aevaluate_packed(
+        self, pairs: list[tuple[str, str]], use_cache: bool = True
+    ) -> list[Union[EvaluationResult, Exception]]:
+        """在一次模型调用中评估多条指令/响应对
+
+        结果按输入顺序返回，单条失败以异常对象占位；打包结果中缺失或
+        无法解析的用例会回退为逐条评估。
+        """
+        start = time.perf_counter()
+        keys = [
+            self._cache_key(instruction, response, self.packed_prompt_hash)
+            for instruction, response in pairs
+        ]
+        results: list[Optional[Union[EvaluationResult, Exception]]] = [
+            self._lookup(key, instruction, response, use_cache)
+            for key, (instruction, response) in zip(keys, pairs)
+        ]
+        pending = [i for i, result in enumerate(results) if result is None]
+
+        if len(pending) > 1:
+            cases = [
+                {"id": n, "instruction": pairs[i][0], "response": pairs[i][1]}
+                for n, i in enumerate(pending)
+            ]
+            self.packed_calls += 1
+            try:
+                payload = {"cases": json.dumps(cases, ensure_ascii=False)}
+                chain = await self._achain("packed_chain")
+                output = await self._throttled(
+                    lambda: self._acall_chain(chain, payload, parse_packed)
+                )
+                repairs: list[str] = []
+                with stage_timer("validate", self.llm_provider, self.model):
+                    parsed = _match_packed_assessments(output, len(pending), repairs)
+                self._count_repairs(list(dict.fromkeys(repairs)))
+            except Exception as e:
+                ERRORS.labels(self.llm_provider, type(e).__name__).inc()
+                parsed = [None] * len(pending)
+            for n, i in enumerate(pending):
+                if parsed[n] is not None:
+                    results[i] = {**parsed[n], "provider": self.llm_provider}
+                    if self.cache:
+                        self.cache.set(keys[i], results[i])
+                else:
+                    self.packed_fallbacks += 1
+
+        # 回退为逐条评估的用例由 aevaluate 自行记录
+        for result in results:
+            if result is not None:
+                self._record(result, start)
+        fallback = [i for i, result in enumerate(results) if result is None]
+        outcomes = await asyncio.gather(
+            *[self.aevaluate(*pairs[i], use_cache=use_cache) for i in fallback],
+            return_exceptions=True,
+        )
+        for i, outcome in zip(fallback, outcomes):
+            results[i] = outcome
+        return results
+
+    def stats(self) -> dict:
+        """并发合并、打包评估、输出修复及token用量统计"""
+        return {
+            **self._inflight.stats(),
+            "packed_calls": self.packed_calls,
+            "packed_fallbacks": self.packed_fallbacks,
+            "repaired": self.repaired,
+            "reasks": self.reasks,
+            "json_mode_rejected": self.json_mode_rejected,
+            "prompt_variant": self.prompt_variant,
+            "tokens": {
+                **self.tokens,
+                "prompt_cache_ratio": (
+                    round(self.tokens["prompt_cached"] / self.tokens["prompt"], 3)
+                    if self.tokens["prompt"]
+                    else None
+                ),
+            },
+            "throttle": self.throttle.stats() if self.throttle else None,
+        }
+
+
+def create_throttle(
+    llm_provider: str, batch_min_share: float = 0.1, share: float = 1.0
+) -> ProviderThrottle:
+    """按提供商配置创建限流器，可用 <PROVIDER>_RATE_LIMIT 等环境变量覆盖
+
+    例如 OPENROUTER_RATE_LIMIT=20、ALIYUN_BAILIAN_MAX_CONCURRENCY=32。
+    batch_min_share 为并发槽位争用时批量评估至少获得的份额。
+    速率与并发上限均为所有进程合计的值；限流器只在本进程内生效，share 为
+    本进程分得的份额，多个进程（服务进程、任务工作进程）共用同一提供商时按份额拆分。
+    """
+    config = PROVIDER_CONFIGS[llm_provider]
+    prefix = llm_provider.upper()
+    return ProviderThrottle(
+        rate=float(os.getenv(f"{prefix}_RATE_LIMIT", config["rate_limit"])) * share,
+        burst=max(1, round(int(os.getenv(f"{prefix}_BURST", config["burst"])) * share)),
+        initial_concurrency=max(1, round(int(os.getenv(f"{prefix}_INITIAL_CONCURRENCY", "8")) * share)),
+        max_concurrency=max(1, round(int(os.getenv(f"{prefix}_MAX_CONCURRENCY", "64")) * share)),
+        max_retries=int(os.getenv(f"{prefix}_MAX_RETRIES", "4")),
+        weights=class_weights(batch_min_share),
+        name=llm_provider,
+    )
+
+
+class EvaluatorRegistry:
+    """应用生命周期内的评估器注册表，每个提供商一个常驻评估器
+
+    所有评估器共享同一组带连接池的HTTP客户端，保持长连接预热。
+    """
+
+    def __init__(
+        self,
+        cache: Optional[EvaluationCache] = None,
+        throttled: bool = True,
+        pre_evaluators: Optional[list[PreEvaluator]] = None,
+        batch_min_share: float = 0.1,
+        prompt_variant: str = DEFAULT_PROMPT_VARIANT,
+        throttle_share: float = 1.0,
+    ):
+        self.cache = cache
+        self.throttled = throttled
+        self.batch_min_share = batch_min_share
+        self.throttle_share = throttle_share
+        self.prompt_variant = prompt_variant
+        self.pre_evaluators = pre_evaluators or []
+        self.http_client = httpx.Client(limits=HTTP_POOL_LIMITS, timeout=HTTP_TIMEOUT)
+        self.http_async_client = httpx.AsyncClient(
+            limits=HTTP_POOL_LIMITS, timeout=HTTP_TIMEOUT
+        )
+        self._evaluators: dict[str, LLMEvaluator] = {}
+
+    def get(self, llm_provider: str = "openrouter"):
+        """获取（必要时创建）指定提供商的评估器
+
+        以逗号分隔的多个提供商（如 "openrouter,aliyun_bailian"）返回带对冲
+        和故障转移的提供商组评估器，按书写顺序优先使用。
+        """
+        evaluator = self._evaluators.get(llm_provider)
+        if evaluator is None and "," in llm_provider:
+            providers = [p.strip() for p in llm_provider.split(",") if p.strip()]
+            evaluator = ProviderGroupEvaluator([self.get(p) for p in providers])
+            self._evaluators[llm_provider] = evaluator
+        elif evaluator is None:
+            evaluator = LLMEvaluator(
+                llm_provider,
+                http_client=self.http_client,
+                http_async_client=self.http_async_client,
+                cache=self.cache,
+                throttle=(
+                    create_throttle(llm_provider, self.batch_min_share, self.throttle_share)
+                    if self.throttled
+                    else None
+                ),
+                pre_evaluators=self.pre_evaluators,
+                prompt_variant=self.prompt_variant,
+            )
+            self._evaluators[llm_provider] = evaluator
+        return evaluator
+
+    def stats(self) -> dict:
+        """各提供商评估器的运行统计"""
+        return {name: evaluator.stats() for name, evaluator in self._evaluators.items()}
+
+    def warm_up(self, providers: list[str], prewarm: bool = False):
+        """启动时预先创建评估器，prewarm 为真时同时构建评估流水线"""
+        for provider in providers:
+            evaluator = self.get(provider)
+            if prewarm:
+                evaluator.prewarm()
+
+    async def aclose(self):
+        """关闭共享的HTTP连接池"""
+        self._evaluators.clear()
+        self.http_client.close()
+        await self.http_async_client.aclose()
+        if self.cache is not None:
+            self.cache.close()
+
+
+def create_registry(config: dict) -> EvaluatorRegistry:
+    """按评估器配置创建注册表，服务进程与任务工作进程共用同一份配置
+
+    config 字段：provider、cache_path、cache_ttl_seconds、cache_max_entries、
+    rules_enabled、rules_path、local_judge_path、batch_min_share、prompt_variant、prewarm、
+    throttle_share（本进程分得的提供商并发份额）。
+    """
+    cache = None
+    if config.get("cache_path"):
+        cache = EvaluationCache(
+            config["cache_path"],
+            ttl_seconds=config.get("cache_ttl_seconds", 7 * 24 * 3600),
+            max_entries=config.get("cache_max_entries", 100_000),
+        )
+    pre_evaluators = []
+    if config.get("rules_enabled", True):
+        rules_path = config.get("rules_path")
+        rules = RuleBasedPreEvaluator.from_file(rules_path) if rules_path else RuleBasedPreEvaluator()
+        pre_evaluators.append(rules)
+    if config.get("local_judge_path"):
+        # 本地蒸馏模型排在规则之后，置信度不足时交给LLM
+        from .distill import LocalJudge
+
+        pre_evaluators.append(LocalJudge.load(config["local_judge_path"]))
+    registry = EvaluatorRegistry(
+        cache=cache,
+        pre_evaluators=pre_evaluators,
+        batch_min_share=config.get("batch_min_share", 0.1),
+        prompt_variant=config.get("prompt_variant") or DEFAULT_PROMPT_VARIANT,
+        throttle_share=config.get("throttle_share", 1.0),
+    )
+    registry.warm_up([config.get("provider", "openrouter")], prewarm=config.get("prewarm", False))
+    return registry
@@ -0,0 +1,230 @@
+import asyncio
+import time
+from collections import deque
+from typing import Optional, Union
+
+
+class LatencyTracker:
+    """记录最近若干次调用耗时，用于估算分位数延迟"""
+
+    def __init__(self, window: int = 200):
+        self._samples: deque[float] = deque(maxlen=window)
+
+    def record(self, seconds: float):
+        self._samples.append(seconds)
+
+    def percentile(self, q: float) -> Optional[float]:
+        if not self._samples:
+            return None
+        ordered = sorted(self._samples)
+        index = min(len(ordered) - 1, int(q * len(ordered)))
+        return ordered[index]
+
+
+class CircuitBreaker:
+    """熔断器：连续失败达到阈值后熔断，冷却期过后放行一次试探请求"""
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+
+    def allow(self) -> bool:
+        """是否可以向该提供商发送请求（半开状态下已有试探请求时不放行）"""
+        if self.state == self.OPEN:
+            return time.monotonic() - self.opened_at >= self.reset_timeout
+        return self.state == self.CLOSED
+
+    def record_attempt(self):
+        """发送请求前调用：冷却期已过的熔断器进入半开状态"""
+        if self.state == self.OPEN:
+            self.state = self.HALF_OPEN
+
+    def record_cancel(self):
+        """试探请求被取消时恢复熔断状态，等待下一次试探"""
+        if self.state == self.HALF_OPEN:
+            self.state = self.OPEN
+
+    def record_success(self):
+        self.state = self.CLOSED
+        self.failures = 0
+
+    def record_failure(self):
+        self.failures += 1
+        if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
+
+
+class ProviderGroupEvaluator:
+    """多提供商评估器：对冲请求与自动故障转移
+
+    首选提供商的请求超过其p95延迟仍未返回时，向下一个提供商发送对冲请求，
+    采用先返回的结果并取消其余请求；请求失败时立即转移到下一个提供商。
+    持续失败的提供商会被熔断，冷却期内不再使用。
+    """
+
+    def __init__(
+        self,
+        evaluators: list,
+        hedge_quantile: float = 0.95,
+        min_hedge_delay: float = 0.5,
+        default_hedge_delay: float = 3.0,
+        failure_threshold: int = 5,
+        reset_timeout: float = 30.0,
+    ):
+        if not evaluators:
+            raise ValueError("提供商组至少需要一个评估器")
+        self.evaluators = evaluators
+        self.llm_provider = ",".join(e.llm_provider for e in evaluators)
+        self.hedge_quantile = hedge_quantile
+        self.min_hedge_delay = min_hedge_delay
+        self.default_hedge_delay = default_hedge_delay
+        self.latency = {e.llm_provider: LatencyTracker() for e in evaluators}
+        self.breakers = {
+            e.llm_provider: CircuitBreaker(failure_threshold, reset_timeout)
+            for e in evaluators
+        }
+        self.hedges = 0
+        self.failovers = 0
+        self.wins = {e.llm_provider: 0 for e in evaluators}
+
+    @property
+    def judge_version(self) -> str:
+        return "+".join(e.judge_version for e in self.evaluators)
+
+    def packed_judge_version(self, pack_size: int) -> str:
+        return "+".join(e.packed_judge_version(pack_size) for e in self.evaluators)
+
+    def prewarm(self):
+        for evaluator in self.evaluators:
+            evaluator.prewarm()
+
+    def hedge_delay(self, provider: str) -> float:
+        """对冲等待时间：该提供商近期延迟的分位数"""
+        delay = self.latency[provider].percentile(self.hedge_quantile)
+        if delay is None:
+            return self.default_hedge_delay
+        return max(self.min_hedge_delay, delay)
+
+    def _available(self) -> list:
+        available = [e for e in self.evaluators if self.breakers[e.llm_provider].allow()]
+        if not available:
+            raise RuntimeError(f"评估过程中发生错误: 所有提供商均已熔断 ({self.llm_provider})")
+        return available
+
+    async def _timed(self, evaluator, instruction: str, response: str, use_cache: bool):
+        provider = evaluator.llm_provider
+        self.breakers[provider].record_attempt()
+        start = time.perf_counter()
+        try:
+            result = await evaluator.aevaluate(instruction, response, use_cache=use_cache)
+        except asyncio.CancelledError:
+            self.breakers[provider].record_cancel()
+            raise
+        except Exception:
+            self.breakers[provider].record_failure()
+            raise
+        if result.get("source") != "llm":
+            # 规则、缓存等本地结果没有实际调用提供商，不计入熔断状态和延迟分位数
+            self.breakers[provider].record_cancel()
+            return result
+        self.latency[provider].record(time.perf_counter() - start)
+        self.breakers[provider].record_success()
+        return result
+
+    async def aevaluate(self, instruction: str, response: str, use_cache: bool = True):
+        """对冲评估：返回最先成功的提供商结果"""
+        candidates = self._available()
+        running: dict[asyncio.Task, str] = {}
+        last_error: Optional[Exception] = None
+
+        def launch():
+            evaluator = candidates.pop(0)
+            task = asyncio.ensure_future(
+                self._timed(evaluator, instruction, response, use_cache)
+            )
+            running[task] = evaluator.llm_provider
+
+        launch()
+        try:
+            while running:
+                timeout = None
+                if candidates:
+                    timeout = min(self.hedge_delay(p) for p in running.values())
+                done, _ = await asyncio.wait(
+                    running, timeout=timeout, return_when=asyncio.FIRST_COMPLETED
+                )
+                if not done:
+                    # 超过对冲延迟仍未返回，向下一个提供商发送对冲请求
+                    self.hedges += 1
+                    launch()
+                    continue
+                for task in done:
+                    provider = running.pop(task)
+                    if task.exception() is None:
+                        self.wins[provider] += 1
+                        return task.result()
+                    last_error = task.exception()
+                if candidates:
+                    # 请求失败，立即转移到下一个提供商
+                    self.failovers += 1
+                    launch()
+        finally:
+            for task in running:
+                task.cancel()
+        raise RuntimeError(f"评估过程中发生错误: 所有提供商均失败: {last_error}") from last_error
+
+    async def asample(self, instruction: str, response: str):
+        """独立采样一次：按优先顺序使用可用的提供商，失败时转移到下一个"""
+        last_error: Optional[Exception] = None
+        for evaluator in self._available():
+            provider = evaluator.llm_provider
+            self.breakers[provider].record_attempt()
+            try:
+                result = await evaluator.asample(instruction, response)
+            except asyncio.CancelledError:
+                self.breakers[provider].record_cancel()
+                raise
+            except Exception as e:
+                self.breakers[provider].record_failure()
+                last_error = e
+                continue
+            self.breakers[provider].record_success()
+            return result
+        raise RuntimeError(f"评估过程中发生错误: 所有提供商均失败: {last_error}") from last_error
+
+    async def aevaluate_packed(
+        self, pairs: list[tuple[str, str]], use_cache: bool = True
+    ) -> list[Union[dict, Exception]]:
+        """打包评估走首个可用提供商，失败的用例再经对冲路径逐条重试"""
+        primary = self._available()[0]
+        results = await primary.aevaluate_packed(pairs, use_cache=use_cache)
+        retry = [i for i, result in enumerate(results) if isinstance(result, Exception)]
+        outcomes = await asyncio.gather(
+            *[self.aevaluate(*pairs[i], use_cache=use_cache) for i in retry],
+            return_exceptions=True,
+        )
+        for i, outcome in zip(retry, outcomes):
+            results[i] = outcome
+        return results
+
+    def stats(self) -> dict:
+        return {
+            "hedges": self.hedges,
+            "failovers": self.failovers,
+            "providers": {
+                provider: {
+                    "state": self.breakers[provider].state,
+                    "p95_latency": self.latency[provider].percentile(0.95),
+                    "wins": self.wins[provider],
+                }
+                for provider in self.breakers
+            },
+        }
@@ -0,0 +1,239 @@
+import json
+import sqlite3
+import time
+from pathlib import Path
+from typing import Iterable, Optional
+
+# 评估维度：结果表中的列名 -> Assessment 中的字段名
+DIMENSIONS = {
+    "semantic": "semantic_correctness",
+    "state_change": "state_change_confirmation",
+    "unambiguous": "unambiguous_expression",
+}
+
+
+class HistoryStore:
+    """基于SQLite的评估运行历史，只追加不修改
+
+    每次运行记录一行 runs，每条用例结果记录一行 results（含各维度得分、延迟、
+    结论来源和实际给出结论的提供商），按运行、用例和得分建立索引，报表统计均在SQL中聚合完成。
+    """
+
+    def __init__(self, path: str = "data/history.sqlite3"):
+        self.path = path
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(path)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS runs (
+                id TEXT PRIMARY KEY,
+                created_at REAL NOT NULL,
+                case_file TEXT,
+                provider TEXT,
+                judge_version TEXT,
+                total INTEGER NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS results (
+                run_id TEXT NOT NULL,
+                case_id TEXT NOT NULL,
+                provider TEXT,
+                source TEXT,
+                latency REAL,
+                valid INTEGER,
+                overall REAL,
+                semantic REAL,
+                state_change REAL,
+                unambiguous REAL,
+                sample TEXT,
+                response TEXT,
+                result TEXT,
+                error TEXT,
+                carried INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (run_id, case_id)
+            );
+            CREATE INDEX IF NOT EXISTS idx_results_case ON results(case_id, run_id);
+            CREATE INDEX IF NOT EXISTS idx_results_overall ON results(run_id, overall);
+            CREATE INDEX IF NOT EXISTS idx_results_latency ON results(run_id, latency);
+            CREATE INDEX IF NOT EXISTS idx_runs_created ON runs(created_at);
+            """
+        )
+
+    def record_run(
+        self,
+        run_id: str,
+        records: Iterable[dict],
+        case_file: Optional[str] = None,
+        provider: Optional[str] = None,
+        judge_version: Optional[str] = None,
+    ) -> int:
+        """在一个事务中写入一次运行及其全部用例结果（检查点记录格式），返回写入条数"""
+        rows = [self._row(run_id, provider, record) for record in records]
+        with self._conn:
+            self._conn.execute(
+                "INSERT INTO runs (id, created_at, case_file, provider, judge_version, total) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (run_id, time.time(), case_file, provider, judge_version, len(rows)),
+            )
+            self._conn.executemany(
+                "INSERT INTO results (run_id, case_id, provider, source, latency, valid, overall, "
+                "semantic, state_change, unambiguous, sample, response, result, error, carried) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+        return len(rows)
+
+    @staticmethod
+    def _row(run_id: str, provider: Optional[str], record: dict) -> tuple:
+        result = record.get("result")
+        assessment = result["assessment"] if result else {}
+        return (
+            run_id,
+            str(record["id"]),
+            # 提供商组中实际给出结论的提供商，规则等本地结论沿用运行的提供商
+            (result.get("provider") if result else None) or provider,
+            result.get("source") if result else None,
+            record.get("latency"),
+            int(assessment["valid"]) if result else None,
+            assessment.get("overall_score"),
+            *(assessment[field]["score"] if result else None for field in DIMENSIONS.values()),
+            record.get("sample"),
+            record.get("machineResponse"),
+            json.dumps(result, ensure_ascii=False) if result else None,
+            record.get("error"),
+            int("carried_from" in record),
+        )
+
+    def runs(self, limit: int = 20) -> list[dict]:
+        """最近的运行及其通过率"""
+        rows = self._conn.execute(
+            """SELECT r.id, r.created_at, r.provider, r.total,
+                   SUM(s.valid), COUNT(s.valid), SUM(s.error IS NOT NULL)
+            FROM (SELECT * FROM runs ORDER BY created_at DESC LIMIT ?) r
+            LEFT JOIN results s ON s.run_id = r.id
+            GROUP BY r.id ORDER BY r.created_at DESC""",
+            (limit,),
+        ).fetchall()
+        return [
+            {
+                "run_id": row[0],
+                "created_at": row[1],
+                "provider": row[2],
+                "total": row[3],
+                "passed": row[4] or 0,
+                "evaluated": row[5],
+                "errors": row[6] or 0,
+                "pass_rate": (row[4] or 0) / row[5] if row[5] else None,
+            }
+            for row in rows
+        ]
+
+    def latest_run(self, before: Optional[str] = None) -> Optional[str]:
+        """最近一次运行的id；给出 before 时返回该运行之前的一次"""
+        if before is None:
+            row = self._conn.execute("SELECT id FROM runs ORDER BY created_at DESC LIMIT 1").fetchone()
+        else:
+            row = self._conn.execute(
+                "SELECT id FROM runs WHERE created_at < (SELECT created_at FROM runs WHERE id = ?) "
+                "ORDER BY created_at DESC LIMIT 1",
+                (before,),
+            ).fetchone()
+        return row[0] if row else None
+
+    def summary(self, run_id: str) -> dict:
+        """单次运行的汇总：通过率、各维度平均分、结论来源分布和延迟分位数"""
+        row = self._conn.execute(
+            """SELECT COUNT(*), SUM(valid), COUNT(valid), SUM(error IS NOT NULL), SUM(carried),
+                   AVG(overall), AVG(semantic), AVG(state_change), AVG(unambiguous)
+            FROM results WHERE run_id = ?""",
+            (run_id,),
+        ).fetchone()
+        sources = dict(
+            self._conn.execute(
+                "SELECT COALESCE(source, 'error'), COUNT(*) FROM results WHERE run_id = ? GROUP BY 1",
+                (run_id,),
+            ).fetchall()
+        )
+        providers = dict(
+            self._conn.execute(
+                "SELECT COALESCE(provider, '-'), COUNT(*) FROM results "
+                "WHERE run_id = ? AND source IN ('llm', 'cache') GROUP BY 1",
+                (run_id,),
+            ).fetchall()
+        )
+        return {
+            "run_id": run_id,
+            "total": row[0],
+            "passed": row[1] or 0,
+            "pass_rate": (row[1] or 0) / row[2] if row[2] else None,
+            "errors": row[3] or 0,
+            "carried": row[4] or 0,
+            "avg_overall": row[5],
+            "avg_scores": dict(zip(DIMENSIONS.values(), row[6:9])),
+            "sources": sources,
+            "providers": providers,
+            "latency_p50": self.latency_percentile(run_id, 0.50),
+            "latency_p95": self.latency_percentile(run_id, 0.95),
+        }
+
+    def latency_percentile(self, run_id: str, q: float) -> Optional[float]:
+        """借助 (run_id, latency) 索引定位分位数，无需读出全部延迟"""
+        (count,) = self._conn.execute(
+            "SELECT COUNT(latency) FROM results WHERE run_id = ? AND carried = 0", (run_id,)
+        ).fetchone()
+        if not count:
+            return None
+        row = self._conn.execute(
+            "SELECT latency FROM results WHERE run_id = ? AND carried = 0 AND latency IS NOT NULL "
+            "ORDER BY latency LIMIT 1 OFFSET ?",
+            (run_id, min(count - 1, int(q * count))),
+        ).fetchone()
+        return row[0]
+
+    def regressions(self, base_run: str, run_id: str, limit: int = 100) -> list[dict]:
+        """base_run 中通过、run_id 中不通过的用例"""
+        rows = self._conn.execute(
+            """SELECT cur.case_id, cur.sample, cur.response, base.overall, cur.overall, cur.result
+            FROM results cur JOIN results base
+              ON base.case_id = cur.case_id AND base.run_id = ?
+            WHERE cur.run_id = ? AND base.valid = 1 AND cur.valid = 0
+            ORDER BY cur.overall LIMIT ?""",
+            (base_run, run_id, limit),
+        ).fetchall()
+        return [
+            {
+                "case_id": row[0],
+                "sample": row[1],
+                "response": row[2],
+                "base_overall": row[3],
+                "overall": row[4],
+                "suggestions": json.loads(row[5])["assessment"]["suggestions"],
+            }
+            for row in rows
+        ]
+
+    def worst_cases(self, run_id: str, limit: int = 20, dimension: Optional[str] = None) -> list[dict]:
+        """得分最低的用例，dimension 为 semantic/state_change/unambiguous 时按该维度排序"""
+        column = dimension if dimension in DIMENSIONS else "overall"
+        rows = self._conn.execute(
+            f"""SELECT case_id, sample, response, {column}, valid FROM results
+            WHERE run_id = ? AND {column} IS NOT NULL ORDER BY {column} LIMIT ?""",
+            (run_id, limit),
+        ).fetchall()
+        return [
+            {"case_id": row[0], "sample": row[1], "response": row[2], "score": row[3], "valid": bool(row[4])}
+            for row in rows
+        ]
+
+    def close(self):
+        self._conn.close()
+
+
+def record_history(path: str, run_id: str, records: Iterable[dict], **kwargs) -> int:
+    """打开历史库写入一次运行后关闭，供服务进程（线程中）和任务工作进程调用"""
+    store = HistoryStore(path)
+    try:
+        return store.record_run(run_id, records, **kwargs)
+    finally:
+        store.close()
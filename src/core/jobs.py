@@ -0,0 +1,392 @@
+import asyncio
+import json
+import multiprocessing
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Optional
+
+# 用例被领取后的租约时长，超时未完成（如工作进程崩溃、服务重启）的用例重新排队
+LEASE_SECONDS = 600.0
+
+
+class JobStore:
+    """基于SQLite的评估任务持久化存储，可被多个进程同时访问
+
+    每个任务的用例逐条记录状态和结果，服务重启后从最后完成的用例继续执行；
+    中断时执行中的用例在租约到期后重新领取，多个服务实例共用同一存储时互不干扰。
+    """
+
+    def __init__(self, path: str = "data/jobs.sqlite3"):
+        self.path = path
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        # 连接由 asyncio.to_thread 的多个线程共用，事务与查询需串行执行
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                status TEXT NOT NULL,
+                provider TEXT NOT NULL,
+                total INTEGER NOT NULL,
+                options TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS job_cases (
+                job_id TEXT NOT NULL,
+                seq INTEGER NOT NULL,
+                case_id TEXT NOT NULL,
+                sample TEXT NOT NULL,
+                response TEXT NOT NULL,
+                status TEXT NOT NULL,
+                result TEXT,
+                error TEXT,
+                worker TEXT,
+                lease_until REAL,
+                finished_at REAL,
+                done_order INTEGER,
+                latency REAL,
+                PRIMARY KEY (job_id, seq)
+            );
+            CREATE INDEX IF NOT EXISTS idx_job_cases_status ON job_cases(status, job_id, seq);
+            CREATE INDEX IF NOT EXISTS idx_job_cases_done ON job_cases(job_id, done_order);
+            """
+        )
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(job_cases)")}
+        if "latency" not in columns:
+            # 旧版本创建的存储没有评估耗时列
+            self._conn.execute("ALTER TABLE job_cases ADD COLUMN latency REAL")
+
+    @contextmanager
+    def _transaction(self):
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+
+    def create_job(self, items: list[dict], provider: str, options: Optional[dict] = None) -> str:
+        """创建任务，items 为 {id, sample, machineResponse} 列表"""
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with self._transaction():
+            self._conn.execute(
+                "INSERT INTO jobs (id, status, provider, total, options, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (job_id, "pending" if items else "completed", provider, len(items), json.dumps(options or {}), now, now),
+            )
+            self._conn.executemany(
+                "INSERT INTO job_cases (job_id, seq, case_id, sample, response, status) "
+                "VALUES (?, ?, ?, ?, ?, 'pending')",
+                [
+                    (job_id, seq, str(item["id"]), item["sample"], item["machineResponse"])
+                    for seq, item in enumerate(items)
+                ],
+            )
+        return job_id
+
+    def claim(self, worker: str, limit: int) -> list[dict]:
+        """原子地领取最多 limit 条待执行用例（含租约过期的用例），按任务提交顺序"""
+        now = time.time()
+        with self._transaction():
+            rows = self._conn.execute(
+                """SELECT c.job_id, c.seq, c.case_id, c.sample, c.response, j.provider, j.options
+                FROM job_cases c JOIN jobs j ON j.id = c.job_id
+                WHERE j.status IN ('pending', 'running')
+                  AND (c.status = 'pending' OR (c.status = 'running' AND c.lease_until < ?))
+                ORDER BY j.created_at, c.seq
+                LIMIT ?""",
+                (now, limit),
+            ).fetchall()
+            self._conn.executemany(
+                "UPDATE job_cases SET status = 'running', worker = ?, lease_until = ? "
+                "WHERE job_id = ? AND seq = ?",
+                [(worker, now + LEASE_SECONDS, row[0], row[1]) for row in rows],
+            )
+            for job_id in {row[0] for row in rows}:
+                self._conn.execute(
+                    "UPDATE jobs SET status = 'running', updated_at = ? "
+                    "WHERE id = ? AND status = 'pending'",
+                    (now, job_id),
+                )
+        return [
+            {
+                "job_id": row[0],
+                "seq": row[1],
+                "case_id": row[2],
+                "sample": row[3],
+                "response": row[4],
+                "provider": row[5],
+                "options": json.loads(row[6]),
+            }
+            for row in rows
+        ]
+
+    def finish(
+        self,
+        job_id: str,
+        seq: int,
+        result: Optional[dict] = None,
+        error: Optional[str] = None,
+        latency: Optional[float] = None,
+    ) -> bool:
+        """记录单条用例的结果，所有用例完成后任务标记为完成，此时返回 True"""
+        now = time.time()
+        with self._transaction():
+            # done_order 为任务内的完成序号，供增量拉取结果
+            self._conn.execute(
+                """UPDATE job_cases SET status = ?, result = ?, error = ?, finished_at = ?,
+                    lease_until = NULL, latency = ?,
+                    done_order = (SELECT COALESCE(MAX(done_order), 0) + 1 FROM job_cases WHERE job_id = ?)
+                WHERE job_id = ? AND seq = ?""",
+                (
+                    "error" if error is not None else "done",
+                    json.dumps(result, ensure_ascii=False) if result is not None else None,
+                    error,
+                    now,
+                    latency,
+                    job_id,
+                    job_id,
+                    seq,
+                ),
+            )
+            cursor = self._conn.execute(
+                """UPDATE jobs SET status = 'completed', updated_at = ?
+                WHERE id = ? AND status = 'running' AND NOT EXISTS (
+                    SELECT 1 FROM job_cases WHERE job_id = ? AND status IN ('pending', 'running')
+                )""",
+                (now, job_id, job_id),
+            )
+            return cursor.rowcount > 0
+
+    def records(self, job_id: str) -> list[dict]:
+        """任务全部用例的最终结果（检查点记录格式），供写入运行历史库"""
+        with self._lock:
+            rows = self._conn.execute(
+                """SELECT case_id, sample, response, status, result, error, latency FROM job_cases
+                WHERE job_id = ? AND status IN ('done', 'error') ORDER BY seq""",
+                (job_id,),
+            ).fetchall()
+        return [
+            {
+                "id": row[0],
+                "sample": row[1],
+                "machineResponse": row[2],
+                **({"error": row[5]} if row[3] == "error" else {"result": json.loads(row[4])}),
+                "latency": row[6],
+            }
+            for row in rows
+        ]
+
+    def release(self, worker: str) -> int:
+        """归还该工作进程仍在执行的用例（正常停止时调用），无需等待租约到期"""
+        with self._transaction():
+            cursor = self._conn.execute(
+                "UPDATE job_cases SET status = 'pending', worker = NULL, lease_until = NULL "
+                "WHERE worker = ? AND status = 'running'",
+                (worker,),
+            )
+            return cursor.rowcount
+
+    def cancel(self, job_id: str) -> bool:
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE jobs SET status = 'cancelled', updated_at = ? "
+                "WHERE id = ? AND status IN ('pending', 'running')",
+                (time.time(), job_id),
+            )
+            return cursor.rowcount > 0
+
+    def get_job(self, job_id: str) -> Optional[dict]:
+        """任务状态与进度"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT id, status, provider, total, created_at, updated_at FROM jobs WHERE id = ?",
+                (job_id,),
+            ).fetchone()
+            if row is None:
+                return None
+            counts = dict(
+                self._conn.execute(
+                    "SELECT status, COUNT(*) FROM job_cases WHERE job_id = ? GROUP BY status",
+                    (job_id,),
+                ).fetchall()
+            )
+        return {
+            "id": row[0],
+            "status": row[1],
+            "provider": row[2],
+            "total": row[3],
+            "completed": counts.get("done", 0),
+            "failed": counts.get("error", 0),
+            "pending": counts.get("pending", 0),
+            "running": counts.get("running", 0),
+            "created_at": row[4],
+            "updated_at": row[5],
+        }
+
+    def list_jobs(self, limit: int = 50) -> list[dict]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id FROM jobs ORDER BY created_at DESC LIMIT ?", (limit,)
+            ).fetchall()
+        return [self.get_job(row[0]) for row in rows]
+
+    def results(self, job_id: str, after: int = 0, limit: int = 1000) -> list[dict]:
+        """按完成顺序返回完成序号大于 after 的用例结果，便于增量拉取"""
+        with self._lock:
+            rows = self._conn.execute(
+                """SELECT done_order, case_id, status, result, error FROM job_cases
+                WHERE job_id = ? AND done_order > ? ORDER BY done_order LIMIT ?""",
+                (job_id, after, limit),
+            ).fetchall()
+        return [
+            {
+                "order": row[0],
+                "id": row[1],
+                **({"error": row[4]} if row[2] == "error" else {"result": json.loads(row[3])}),
+            }
+            for row in rows
+        ]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+async def _run_worker(store: JobStore, config: dict, worker: str, stop_event):
+    """工作进程主循环：领取用例、并发评估、逐条写回结果"""
+    from .evaluation import create_registry
+    from .history import record_history
+    from .scheduler import priority
+
+    registry = create_registry(config)
+    concurrency = config.get("concurrency", 8)
+    poll_interval = config.get("poll_interval", 0.5)
+    history_path = config.get("history_path")
+    running: set[asyncio.Task] = set()
+
+    async def evaluate(case: dict):
+        start = time.perf_counter()
+        try:
+            evaluator = registry.get(case["provider"])
+            with priority("batch"):
+                result = await evaluator.aevaluate(
+                    case["sample"],
+                    case["response"],
+                    use_cache=not case["options"].get("bypassCache", False),
+                )
+            completed = store.finish(
+                case["job_id"], case["seq"], result=result, latency=time.perf_counter() - start
+            )
+        except Exception as e:
+            completed = store.finish(
+                case["job_id"], case["seq"], error=str(e), latency=time.perf_counter() - start
+            )
+        if completed and history_path:
+            # 完成任务最后一条用例的工作进程将整个任务作为一次运行写入历史库
+            try:
+                await asyncio.to_thread(
+                    record_history,
+                    history_path,
+                    f"job-{case['job_id']}",
+                    store.records(case["job_id"]),
+                    case_file="/api/jobs",
+                    provider=case["provider"],
+                    judge_version=registry.get(case["provider"]).judge_version,
+                )
+            except Exception as e:
+                print(f"任务 {case['job_id']} 写入运行历史失败: {e}")
+
+    try:
+        while not stop_event.is_set():
+            free = concurrency - len(running)
+            cases = store.claim(worker, free) if free > 0 else []
+            for case in cases:
+                task = asyncio.create_task(evaluate(case))
+                running.add(task)
+                task.add_done_callback(running.discard)
+            if running:
+                await asyncio.wait(running, timeout=poll_interval, return_when=asyncio.FIRST_COMPLETED)
+            else:
+                await asyncio.sleep(poll_interval)
+    finally:
+        # 停止时取消未完成的用例并归还租约，其他工作进程可立即重新领取；
+        # 进程崩溃时则由租约到期机制恢复
+        for task in running:
+            task.cancel()
+        if running:
+            await asyncio.gather(*running, return_exceptions=True)
+        store.release(worker)
+        await registry.aclose()
+
+
+def worker_main(db_path: str, config: dict, stop_event):
+    """工作进程入口"""
+    store = JobStore(db_path)
+    worker = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+    try:
+        asyncio.run(_run_worker(store, config, worker, stop_event))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        store.close()
+
+
+class JobManager:
+    """评估任务管理：持久化存储 + 工作进程池
+
+    工作进程共享同一份评估器配置（提供商、缓存、规则等），各自维护常驻
+    评估器并从存储中领取用例，多个任务可在所有CPU核心上并行执行。
+    """
+
+    def __init__(
+        self, db_path: str, evaluator_config: dict, num_workers: int = 2, throttle_share: float = 1.0
+    ):
+        self.db_path = db_path
+        self.evaluator_config = evaluator_config
+        self.num_workers = num_workers
+        # 各工作进程的限流器互不相通，平分任务队列分得的提供商速率与并发份额
+        self.throttle_share = throttle_share
+        self.store = JobStore(db_path)
+        self._context = multiprocessing.get_context("spawn")
+        self._stop_event = self._context.Event()
+        self._processes: list[Any] = []
+
+    def start(self):
+        """启动工作进程（中断的用例由租约到期机制恢复）"""
+        config = {**self.evaluator_config, "throttle_share": self.throttle_share / max(1, self.num_workers)}
+        for _ in range(self.num_workers):
+            process = self._context.Process(
+                target=worker_main,
+                args=(self.db_path, config, self._stop_event),
+                daemon=True,
+            )
+            process.start()
+            self._processes.append(process)
+
+    def stop(self, timeout: float = 10.0):
+        self._stop_event.set()
+        for process in self._processes:
+            process.join(timeout=timeout)
+            if process.is_alive():
+                process.terminate()
+        self._processes = []
+        self.store.close()
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.num_workers,
+            "alive": sum(1 for process in self._processes if process.is_alive()),
+        }
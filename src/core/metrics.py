@@ -0,0 +1,97 @@
+import time
+from contextlib import contextmanager
+
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Histogram, generate_latest
+
+# 覆盖从本地解析(亚毫秒)到模型调用(数十秒)的耗时分桶
+LATENCY_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+    0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0,
+)
+
+STAGE_SECONDS = Histogram(
+    "eval_stage_seconds",
+    "评估各阶段耗时：prompt_render/ttfb/provider/parse/validate",
+    ["stage", "provider", "model"],
+    buckets=LATENCY_BUCKETS,
+)
+
+EVALUATION_SECONDS = Histogram(
+    "eval_evaluation_seconds",
+    "单次评估端到端耗时，按结果来源区分",
+    ["provider", "source"],
+    buckets=LATENCY_BUCKETS,
+)
+
+RESULTS = Counter(
+    "eval_results_total",
+    "评估结果数，按来源(llm/cache/rules/local_judge)区分",
+    ["provider", "source"],
+)
+
+TOKENS = Counter(
+    "eval_tokens_total",
+    "模型调用消耗的token数：prompt/prompt_cached/prompt_uncached/completion",
+    ["provider", "model", "kind"],
+)
+
+ERRORS = Counter(
+    "eval_errors_total",
+    "评估错误数，按异常类型区分",
+    ["provider", "type"],
+)
+
+REPAIRS = Counter(
+    "eval_output_repairs_total",
+    "模型输出的本地修复次数，按修复类型区分（reask 为修复失败后重新请求）",
+    ["provider", "kind"],
+)
+
+CONSENSUS = Counter(
+    "eval_consensus_cases_total",
+    "共识评估用例数，按停止原因区分：clear/settled/cap/budget/error",
+    ["provider", "stop"],
+)
+
+QUEUE_WAIT = Histogram(
+    "eval_queue_wait_seconds",
+    "模型调用等待并发槽位的排队时间，按优先级类别(interactive/batch)区分",
+    ["provider", "priority"],
+    buckets=LATENCY_BUCKETS,
+)
+
+
+@contextmanager
+def stage_timer(stage: str, provider: str, model: str):
+    """记录一个评估阶段的耗时"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_SECONDS.labels(stage, provider, model).observe(time.perf_counter() - start)
+
+
+def record_usage(provider: str, model: str, usage: dict) -> dict:
+    """记录模型返回的token用量（usage_metadata），返回本次调用的各类token数
+
+    prompt 为输入token总数，其中命中提供商提示词缓存的部分计入 prompt_cached，
+    其余计入 prompt_uncached。
+    """
+    if not usage:
+        return {}
+    prompt = usage.get("input_tokens", 0)
+    cached = (usage.get("input_token_details") or {}).get("cache_read") or 0
+    counts = {
+        "prompt": prompt,
+        "prompt_cached": cached,
+        "completion": usage.get("output_tokens", 0),
+    }
+    for kind, count in counts.items():
+        TOKENS.labels(provider, model, kind).inc(count)
+    TOKENS.labels(provider, model, "prompt_uncached").inc(prompt - cached)
+    return counts
+
+
+def render_latest() -> tuple[bytes, str]:
+    """以Prometheus文本格式导出所有指标"""
+    return generate_latest(), CONTENT_TYPE_LATEST
@@ -0,0 +1,286 @@
+import json
+import re
+from typing import Any
+
+# 缺少 valid 字段时，综合评分达到该阈值视为通过
+VALID_THRESHOLD = 0.6
+
+# Assessment 字段的常见别名
+FIELD_ALIASES = {
+    "semantic_correctness": ("semantic", "semantic_accuracy", "语义正确性"),
+    "state_change_confirmation": ("state_change", "state_confirmation", "状态变更确认"),
+    "unambiguous_expression": ("unambiguous", "clarity", "无歧义表述"),
+    "overall_score": ("overall", "total_score", "score", "综合评分"),
+    "valid": ("pass", "passed", "is_valid", "是否通过"),
+    "suggestions": ("suggestion", "improvement_suggestion", "improvement_suggestions", "改进建议"),
+}
+WRAPPER_ALIASES = ("assessment", "evaluation", "result", "评估结果")
+SCORE_ALIASES = ("score", "rating", "评分")
+COMMENT_ALIASES = ("comment", "reason", "explanation", "评估意见")
+DIMENSIONS = ("semantic_correctness", "state_change_confirmation", "unambiguous_expression")
+
+# 重新请求模型时追加的提示
+REASK_PROMPT = "上面的输出无法解析为要求的JSON结构。请只输出严格符合要求结构的JSON，不要包含其他内容。"
+
+_CODE_FENCE = re.compile(r"```(?:json)?\s*(.*?)(?:```|$)", re.S)
+_LITERALS = {"True": "true", "False": "false", "None": "null"}
+_CLOSERS = {"{": "}", "[": "]"}
+
+
+class OutputRepairError(ValueError):
+    """模型输出无法在本地修复为评估结果"""
+
+
+def _normalize_json(text: str, repairs: list[str]) -> str:
+    """将近似JSON的文本规范化：单引号字符串、Python字面量、多余逗号及截断补全
+
+    从第一个 { 或 [ 开始扫描，最外层结构闭合后忽略其余文本。
+    """
+    out: list[str] = []
+    stack: list[str] = []
+    quote = None
+    escaped = False
+    i = 0
+    while i < len(text):
+        char = text[i]
+        if quote is not None:
+            if escaped:
+                escaped = False
+                out.append(char)
+            elif char == "\\":
+                escaped = True
+                out.append(char)
+            elif char == quote:
+                quote = None
+                out.append('"')
+            elif char == '"':
+                # 单引号字符串中的双引号需要转义
+                out.append('\\"')
+            elif char == "\n":
+                out.append("\\n")
+            else:
+                out.append(char)
+        elif char in "\"'":
+            if char == "'" and "python_literal" not in repairs:
+                repairs.append("python_literal")
+            quote = char
+            out.append('"')
+        elif char in _CLOSERS:
+            stack.append(char)
+            out.append(char)
+        elif char in "}]":
+            while out and out[-1] in " \t\r\n,":
+                if out.pop() == "," and "trailing_comma" not in repairs:
+                    repairs.append("trailing_comma")
+            if stack:
+                stack.pop()
+            out.append(char)
+            if not stack:
+                break
+        elif char.isascii() and char.isalpha():
+            # 只处理ASCII裸词（Python字面量等），中文等非ASCII字符原样保留
+            match = re.match(r"[A-Za-z_]+", text[i:])
+            word = match.group(0)
+            if word in _LITERALS and "python_literal" not in repairs:
+                repairs.append("python_literal")
+            out.append(_LITERALS.get(word, word))
+            i += len(word)
+            continue
+        else:
+            out.append(char)
+        i += 1
+
+    if stack:
+        repairs.append("truncated")
+        if quote is not None:
+            # 未闭合的字符串：末尾的括号多半是结构的结束，去掉后重新补全
+            while out and out[-1] in "}] \t\r\n":
+                out.pop()
+            out.append('"')
+        while out and out[-1] in " \t\r\n,":
+            out.pop()
+        if out and out[-1] == ":":
+            out.append("null")
+        elif stack[-1] == "{" and out and out[-1] == '"':
+            # 对象中只有键没有值
+            body = "".join(out)
+            start = body.rfind('"', 0, len(body) - 1)
+            if start > 0 and body[:start].rstrip()[-1:] in ("{", ","):
+                out.append(": null")
+        out.extend(_CLOSERS[opener] for opener in reversed(stack))
+    return "".join(out)
+
+
+def load_json_lenient(text: str) -> tuple[Any, list[str]]:
+    """解析模型输出中的JSON，无法直接解析时在本地修复，返回 (数据, 修复类型列表)"""
+    if not isinstance(text, str):
+        raise OutputRepairError("模型输出不是文本")
+    fenced = _CODE_FENCE.search(text)
+    if fenced:
+        text = fenced.group(1)
+    start = min((i for i in (text.find("{"), text.find("[")) if i >= 0), default=-1)
+    if start < 0:
+        raise OutputRepairError("模型输出中没有JSON")
+    text = text[start:]
+    try:
+        data, _ = json.JSONDecoder().raw_decode(text)
+        return data, []
+    except json.JSONDecodeError:
+        pass
+    repairs: list[str] = []
+    try:
+        return json.loads(_normalize_json(text, repairs)), repairs
+    except (ValueError, IndexError) as e:
+        raise OutputRepairError(f"模型输出无法修复为JSON: {e}") from e
+
+
+def _pop_alias(data: dict, field: str, aliases: tuple[str, ...], repairs: list[str]) -> Any:
+    if field in data:
+        return data.pop(field)
+    for alias in aliases:
+        if alias in data:
+            repairs.append("key_alias")
+            return data.pop(alias)
+    return None
+
+
+def _to_number(value: Any) -> float:
+    if isinstance(value, bool):
+        raise OutputRepairError(f"评分不是数值: {value}")
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, str):
+        # 兼容 "8"、"8/10"、"80%" 等写法
+        match = re.fullmatch(r"\s*(-?\d+(?:\.\d+)?)\s*(?:/\s*(\d+(?:\.\d+)?)|(%))?\s*", value)
+        if match:
+            number = float(match.group(1))
+            if match.group(2):
+                return number / float(match.group(2))
+            if match.group(3):
+                return number / 100
+            return number
+    raise OutputRepairError(f"评分不是数值: {value!r}")
+
+
+def _scale(values: list[float]) -> float:
+    """根据最大值推断评分量纲（0-1、0-10 或 0-100）"""
+    top = max(values)
+    if top <= 1:
+        return 1.0
+    if top <= 10:
+        return 10.0
+    if top <= 100:
+        return 100.0
+    raise OutputRepairError(f"无法识别的评分范围: {top}")
+
+
+def _to_bool(value: Any) -> bool:
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, str) and value.strip().lower() in ("true", "yes", "pass", "是", "通过"):
+        return True
+    if isinstance(value, str) and value.strip().lower() in ("false", "no", "fail", "否", "不通过"):
+        return False
+    raise OutputRepairError(f"valid 不是布尔值: {value!r}")
+
+
+def repair_assessment(data: Any) -> tuple[dict, list[str]]:
+    """将模型输出修复为 {"assessment": {...}} 结构，返回 (结果, 修复类型列表)
+
+    处理键名别名、缺少外层包装、0-10/0-100 评分、字符串形式的评分与布尔值、
+    字符串形式的建议，并按三个维度的平均分校正 overall_score。
+    """
+    repairs: list[str] = []
+    if not isinstance(data, dict):
+        raise OutputRepairError("模型输出不是JSON对象")
+    assessment = None
+    for wrapper in WRAPPER_ALIASES:
+        if isinstance(data.get(wrapper), dict):
+            assessment = dict(data[wrapper])
+            if wrapper != "assessment":
+                repairs.append("key_alias")
+            break
+    if assessment is None:
+        if not any(
+            key in data for field in DIMENSIONS for key in (field, *FIELD_ALIASES[field])
+        ):
+            raise OutputRepairError("模型输出缺少评估结果")
+        repairs.append("unwrapped")
+        assessment = dict(data)
+
+    dimensions = {}
+    for field in DIMENSIONS:
+        value = _pop_alias(assessment, field, FIELD_ALIASES[field], repairs)
+        if value is None:
+            raise OutputRepairError(f"模型输出缺少维度 {field}")
+        if not isinstance(value, dict):
+            # 只给出了分数
+            value = {"score": value}
+        score = _pop_alias(dict(value), "score", SCORE_ALIASES[1:], repairs)
+        if score is None:
+            raise OutputRepairError(f"维度 {field} 缺少评分")
+        comment = _pop_alias(dict(value), "comment", COMMENT_ALIASES[1:], repairs)
+        if comment is None:
+            repairs.append("comment_missing")
+            comment = ""
+        dimensions[field] = {"score": _to_number(score), "comment": str(comment)}
+
+    scores = [dimensions[field]["score"] for field in DIMENSIONS]
+    scale = _scale(scores)
+    if scale != 1.0:
+        repairs.append("rescaled")
+        for field in DIMENSIONS:
+            dimensions[field]["score"] = round(dimensions[field]["score"] / scale, 4)
+    if any(dimensions[field]["score"] < 0 for field in DIMENSIONS):
+        raise OutputRepairError("评分不能为负数")
+
+    computed = round(sum(dimensions[field]["score"] for field in DIMENSIONS) / len(DIMENSIONS), 2)
+    overall = _pop_alias(assessment, "overall_score", FIELD_ALIASES["overall_score"], repairs)
+    if overall is not None:
+        overall = _to_number(overall)
+        if overall > 1:
+            overall /= _scale([overall])
+    if overall is None or abs(overall - computed) > 0.01:
+        repairs.append("overall_recomputed")
+        overall = computed
+
+    valid = _pop_alias(assessment, "valid", FIELD_ALIASES["valid"], repairs)
+    if valid is None:
+        repairs.append("valid_derived")
+        valid = overall >= VALID_THRESHOLD
+    else:
+        valid = _to_bool(valid)
+
+    suggestions = _pop_alias(assessment, "suggestions", FIELD_ALIASES["suggestions"], repairs)
+    if not isinstance(suggestions, list):
+        if suggestions not in (None, ""):
+            repairs.append("suggestions_coerced")
+        suggestions = [str(suggestions)] if suggestions not in (None, "") else []
+    else:
+        suggestions = [str(item) for item in suggestions]
+
+    return {
+        "assessment": {
+            **dimensions,
+            "overall_score": overall,
+            "valid": valid,
+            "suggestions": suggestions,
+        }
+    }, list(dict.fromkeys(repairs))
+
+
+def parse_evaluation(text: str) -> tuple[dict, list[str]]:
+    """解析并修复单条评估输出，任何修复失败都以 OutputRepairError 抛出，以便重新请求"""
+    data, repairs = load_json_lenient(text)
+    try:
+        result, assessment_repairs = repair_assessment(data)
+    except OutputRepairError:
+        raise
+    except Exception as e:
+        raise OutputRepairError(f"模型输出无法修复为评估结果: {e}") from e
+    return result, repairs + assessment_repairs
+
+
+def parse_packed(text: str) -> tuple[Any, list[str]]:
+    """解析打包评估输出，各用例的评估结果在匹配时逐条修复"""
+    return load_json_lenient(text)
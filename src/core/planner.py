@@ -0,0 +1,74 @@
+import hashlib
+import json
+from typing import Iterable
+
+from .cache import normalize_text
+from .cases import TestCase
+
+
+def case_fingerprint(instruction: str, response: str, judge_version: str) -> str:
+    """用例指纹：归一化后的指令、响应及评估配置（提供商、模型、提示词版本）"""
+    payload = json.dumps(
+        [normalize_text(instruction), normalize_text(response), judge_version],
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class RunPlan:
+    """增量运行计划：需要评估的用例，以及可沿用上次结论的用例"""
+
+    def __init__(self):
+        self.to_run: list[TestCase] = []
+        self.carried: list[tuple[TestCase, dict]] = []
+        self.new = 0
+        self.changed = 0
+        self.retried = 0
+
+    def summary(self) -> dict:
+        return {
+            "carried": len(self.carried),
+            "to_run": len(self.to_run),
+            "new": self.new,
+            "changed": self.changed,
+            "retried": self.retried,
+        }
+
+
+def plan_run(
+    cases: Iterable[TestCase],
+    fingerprints: dict[str, str],
+    baseline: dict[str, dict],
+    baseline_name: str,
+) -> RunPlan:
+    """对比上次运行的检查点记录，只安排新增或变更的用例
+
+    指纹相同且上次评估成功的用例沿用结论，并记录结论最初来自哪次运行；
+    用例编号变化但内容相同时按指纹匹配。
+    """
+    by_fingerprint = {
+        record["fingerprint"]: record
+        for record in baseline.values()
+        if "result" in record and record.get("fingerprint")
+    }
+    plan = RunPlan()
+    for case in cases:
+        fingerprint = fingerprints[case.id]
+        record = by_fingerprint.get(fingerprint)
+        if record is not None:
+            provenance = record.get("carried_from") or {
+                "run": baseline_name,
+                "id": record["id"],
+                "finished_at": record.get("finished_at"),
+            }
+            plan.carried.append((case, {"result": record["result"], "carried_from": provenance}))
+            continue
+        previous = baseline.get(case.id)
+        if previous is None:
+            plan.new += 1
+        elif "result" not in previous:
+            plan.retried += 1
+        else:
+            plan.changed += 1
+        plan.to_run.append(case)
+    return plan
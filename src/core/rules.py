@@ -0,0 +1,207 @@
+import json
+import re
+from pathlib import Path
+from typing import Optional, Protocol
+
+from .cache import normalize_text
+
+
+class PreEvaluator(Protocol):
+    """LLM评估前的预评估阶段：有把握时返回完整评估结果，否则返回None交给LLM"""
+
+    name: str
+    # 确定性规则先于结果缓存执行，模型预测类的预评估在缓存未命中后才执行
+    deterministic: bool
+
+    def try_evaluate(self, instruction: str, response: str) -> Optional[dict]:
+        ...
+
+    def stats(self) -> dict:
+        ...
+
+
+# 开关类设备指令：动作 -> 响应中表示该动作已完成的动词
+SWITCH_ACTIONS = {
+    "打开": "打开|开启|启动",
+    "开启": "打开|开启|启动",
+    "关闭": "关闭|关掉|关上",
+    "关掉": "关闭|关掉|关上",
+}
+
+# 意图表：指令关键词 -> 确认响应的正则
+DEFAULT_INTENTS = {
+    "回到主界面": [r"已(?:经)?(?:为您)?(?:返回|回到)(?:主界面|主页|桌面)"],
+    "返回主界面": [r"已(?:经)?(?:为您)?(?:返回|回到)(?:主界面|主页|桌面)"],
+    "回到桌面": [r"已(?:经)?(?:为您)?(?:返回|回到)(?:主界面|主页|桌面)"],
+}
+
+# 已知的语音识别/执行失败话术模板（正则），须与去掉句末标点的整条响应完全匹配
+DEFAULT_FAILURE_TEMPLATES = [
+    r"(?:抱歉|对不起)?[,，]?我?(?:没有?听清楚?|没听懂|不太明白)(?:您的意思|你说的话?)?(?:[,，。]?(?:请|麻烦)?您?再说一(?:遍|次))?",
+    r"(?:抱歉|对不起)?[,，]?(?:请|麻烦)?您?再说一(?:遍|次)",
+    r"(?:抱歉|对不起)?[,，]?(?:当前)?网络(?:异常|不给力)(?:[,，。]?请稍后(?:再)?(?:试|重试))?",
+    r"(?:抱歉|对不起)?[,，]?(?:暂不支持|暂时不支持)(?:该|此|这个)?(?:功能|操作)?",
+]
+
+# 通用确认话术，需与开关类指令的对象一起出现才视为确认；对象须位于分句末尾，
+# 避免“已为您打开蓝牙设置页面”这类打开了其他对象的响应被判定为确认
+_CLAUSE_END = r"(?=$|[,，。！!；;~])"
+DEFAULT_CONFIRMATION_PATTERNS = [
+    r"{target}(?:功能)?已(?:经)?(?:为您|帮您)?(?:{verbs})了?" + _CLAUSE_END,
+    r"已(?:经)?(?:为您|帮您)?(?:{verbs})了?{target}(?:功能)?" + _CLAUSE_END,
+]
+
+# 匹配失败话术模板前去掉的句末标点
+_TRAILING_PUNCTUATION = "。！!.~ "
+
+# 响应中出现否定表述时不做确认判定
+_NEGATION = re.compile(r"未|没有|无法|失败|不能|不支持")
+
+_SWITCH_COMMAND = re.compile(
+    r"^(?:请|帮我|请帮我)?(" + "|".join(SWITCH_ACTIONS) + r")(?:一下)?(\S{1,10}?)(?:吧)?[。！!]?$"
+)
+
+
+def _assessment(
+    semantic: float,
+    state_change: float,
+    unambiguous: float,
+    comments: tuple[str, str, str],
+    valid: bool,
+    suggestions: list[str],
+    source: str,
+) -> dict:
+    return {
+        "assessment": {
+            "semantic_correctness": {"score": semantic, "comment": comments[0]},
+            "state_change_confirmation": {"score": state_change, "comment": comments[1]},
+            "unambiguous_expression": {"score": unambiguous, "comment": comments[2]},
+            "overall_score": round((semantic + state_change + unambiguous) / 3, 2),
+            "valid": valid,
+            "suggestions": suggestions,
+        },
+        "source": source,
+    }
+
+
+class RuleBasedPreEvaluator:
+    """基于规则的快速评估：简单设备指令的明确确认或已知失败话术无需调用LLM
+
+    规则由三部分组成：意图关键词表、已知失败话术模板和通用确认模式。
+    只对可判定的设备指令给出结论：整条响应匹配失败话术模板时判定不通过，
+    响应明确确认操作对象时判定通过，其余交给LLM。
+    """
+
+    name = "rules"
+    deterministic = True
+
+    def __init__(
+        self,
+        intents: Optional[dict[str, list[str]]] = None,
+        failure_templates: Optional[list[str]] = None,
+        confirmation_patterns: Optional[list[str]] = None,
+    ):
+        self.intents = {
+            normalize_text(keyword): [re.compile(p) for p in patterns]
+            for keyword, patterns in (intents if intents is not None else DEFAULT_INTENTS).items()
+        }
+        self.failure_templates = [
+            re.compile(p)
+            for p in (failure_templates if failure_templates is not None else DEFAULT_FAILURE_TEMPLATES)
+        ]
+        self.confirmation_patterns = (
+            confirmation_patterns
+            if confirmation_patterns is not None
+            else DEFAULT_CONFIRMATION_PATTERNS
+        )
+        self.checked = 0
+        self.hits = {"confirmation": 0, "failure": 0}
+
+    @classmethod
+    def from_file(cls, path: str) -> "RuleBasedPreEvaluator":
+        """从JSON/YAML规则文件加载，字段为 intents、failure_templates、confirmation_patterns
+
+        兼容旧字段 failure_phrases，同样按整句模板匹配。
+        """
+        text = Path(path).read_text(encoding="utf-8")
+        if path.endswith((".yaml", ".yml")):
+            import yaml
+
+            rules = yaml.safe_load(text) or {}
+        else:
+            rules = json.loads(text)
+        return cls(
+            intents=rules.get("intents"),
+            failure_templates=rules.get("failure_templates", rules.get("failure_phrases")),
+            confirmation_patterns=rules.get("confirmation_patterns"),
+        )
+
+    def _confirmation_patterns(self, instruction: str) -> Optional[list[re.Pattern]]:
+        """返回该指令对应的确认模式，指令不属于可判定的设备指令时返回None"""
+        if instruction in self.intents:
+            return self.intents[instruction]
+        match = _SWITCH_COMMAND.match(instruction)
+        if not match:
+            return None
+        action, target = match.groups()
+        verbs = SWITCH_ACTIONS[action]
+        return [
+            re.compile(p.format(target=re.escape(target), verbs=verbs))
+            for p in self.confirmation_patterns
+        ]
+
+    def try_evaluate(self, instruction: str, response: str) -> Optional[dict]:
+        self.checked += 1
+        instruction = normalize_text(instruction)
+        response = normalize_text(response)
+        if not response:
+            return None
+
+        patterns = self._confirmation_patterns(instruction)
+        if patterns is None:
+            return None
+
+        # 整条响应是已知失败话术时判定为不通过
+        sentence = response.rstrip(_TRAILING_PUNCTUATION)
+        if any(template.fullmatch(sentence) for template in self.failure_templates):
+            self.hits["failure"] += 1
+            return _assessment(
+                0.0,
+                0.0,
+                1.0,
+                (
+                    "响应未执行指令，仅反馈识别或执行失败。",
+                    "未执行操作，未提供状态变更信息。",
+                    "响应文本本身无歧义，但未解决原始指令意图。",
+                ),
+                False,
+                ["应正确识别并执行该设备控制指令"],
+                self.name,
+            )
+
+        if not _NEGATION.search(response) and any(
+            pattern.search(response) for pattern in patterns
+        ):
+            self.hits["confirmation"] += 1
+            return _assessment(
+                1.0,
+                1.0,
+                1.0,
+                (
+                    "响应准确匹配指令意图。",
+                    "响应明确告知操作已完成。",
+                    "响应简洁无歧义。",
+                ),
+                True,
+                [],
+                self.name,
+            )
+        return None
+
+    def stats(self) -> dict:
+        hits = sum(self.hits.values())
+        return {
+            "checked": self.checked,
+            "hits": dict(self.hits),
+            "hit_rate": hits / self.checked if self.checked else 0.0,
+        }
@@ -0,0 +1,138 @@
+import asyncio
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+
+from .metrics import QUEUE_WAIT
+
+# 优先级类别：交互式请求（/api/analyze）与批量评估（批量接口、任务队列、命令行运行）
+PRIORITY_CLASSES = ("interactive", "batch")
+# 未显式标记的调用按批量处理，避免未知的大批量调用挤占交互式请求
+DEFAULT_PRIORITY = "batch"
+
+_priority: ContextVar[str] = ContextVar("eval_priority", default=DEFAULT_PRIORITY)
+
+
+@contextmanager
+def priority(name: str):
+    """在当前上下文（及其中创建的任务）中以指定优先级类别调用模型"""
+    if name not in PRIORITY_CLASSES:
+        raise ValueError(f"不支持的优先级类别: {name}")
+    token = _priority.set(name)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+def current_priority() -> str:
+    return _priority.get()
+
+
+def class_weights(batch_min_share: float) -> dict[str, float]:
+    """按批量评估的最低份额计算各类别权重"""
+    share = min(max(batch_min_share, 0.01), 0.99)
+    return {"interactive": 1 - share, "batch": share}
+
+
+class _ClassQueue:
+    __slots__ = ("weight", "waiters", "finish", "granted", "wait_total", "wait_max")
+
+    def __init__(self, weight: float):
+        self.weight = weight
+        self.waiters: deque[tuple[asyncio.Future, float]] = deque()
+        self.finish = 0.0
+        self.granted = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+
+class FairScheduler:
+    """按优先级类别加权公平排队，分配提供商的并发槽位
+
+    并发上限由 AIMD 限流器给出。有空闲槽位且无人排队时直接放行；否则各类别
+    分别排队（类别内先进先出），每释放一个槽位就按加权公平排队（虚拟完成
+    时间最小者优先）选出下一个请求。交互式请求权重高，会越过排队中的批量
+    请求；两类都积压时批量评估仍至少获得 batch 权重对应的槽位份额。
+    空闲类别重新排队时从当前虚拟时间起算，不会积攒额度。
+    """
+
+    def __init__(self, limiter, weights: Optional[dict[str, float]] = None, provider: str = ""):
+        self.limiter = limiter
+        self.provider = provider
+        self._classes = {
+            name: _ClassQueue(weight)
+            for name, weight in (weights or class_weights(0.1)).items()
+        }
+        self._vtime = 0.0
+
+    def _queued(self) -> bool:
+        return any(queue.waiters for queue in self._classes.values())
+
+    def _has_slot(self) -> bool:
+        return self.limiter.in_flight < int(self.limiter.limit)
+
+    async def acquire(self, name: Optional[str] = None):
+        name = name or current_priority()
+        queue = self._classes[name]
+        enqueued_at = time.monotonic()
+        if not self._queued() and self._has_slot():
+            self._grant(name, queue, enqueued_at)
+            return
+        if not queue.waiters:
+            queue.finish = max(queue.finish, self._vtime)
+        future = asyncio.get_running_loop().create_future()
+        queue.waiters.append((future, enqueued_at))
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # 已分配到槽位后才被取消，归还槽位
+                self.release()
+            else:
+                try:
+                    queue.waiters.remove((future, enqueued_at))
+                except ValueError:
+                    pass
+            raise
+
+    def release(self):
+        self.limiter.in_flight -= 1
+        self._dispatch()
+
+    def _dispatch(self):
+        while self._has_slot():
+            candidates = [(q.finish + 1 / q.weight, n, q) for n, q in self._classes.items() if q.waiters]
+            if not candidates:
+                return
+            finish, name, queue = min(candidates, key=lambda c: c[0])
+            future, enqueued_at = queue.waiters.popleft()
+            if future.done():
+                continue
+            queue.finish = finish
+            self._vtime = finish - 1 / queue.weight
+            self._grant(name, queue, enqueued_at)
+            future.set_result(None)
+
+    def _grant(self, name: str, queue: _ClassQueue, enqueued_at: float):
+        self.limiter.in_flight += 1
+        wait = time.monotonic() - enqueued_at
+        queue.granted += 1
+        queue.wait_total += wait
+        queue.wait_max = max(queue.wait_max, wait)
+        QUEUE_WAIT.labels(self.provider, name).observe(wait)
+
+    def stats(self) -> dict:
+        """各类别的排队数、已放行数及排队等待时间"""
+        return {
+            name: {
+                "weight": round(queue.weight, 3),
+                "queued": len(queue.waiters),
+                "granted": queue.granted,
+                "avg_wait": round(queue.wait_total / queue.granted, 4) if queue.granted else None,
+                "max_wait": round(queue.wait_max, 4),
+            }
+            for name, queue in self._classes.items()
+        }
@@ -0,0 +1,87 @@
+"""
+服务启动耗时统计
+
+记录启动各阶段（模块导入、评估器创建、流水线预热）的耗时，并可通过
+python -X importtime 统计各依赖包的导入开销：
+
+    python -m src.core.startup               # src.main 的导入开销
+    python -m src.core.startup langchain_openai --top 10
+"""
+import argparse
+import subprocess
+import sys
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+
+class StartupReport:
+    """按顺序记录启动阶段耗时"""
+
+    def __init__(self):
+        self.phases: list[tuple[str, float]] = []
+
+    def add(self, name: str, seconds: float):
+        self.phases.append((name, seconds))
+
+    @contextmanager
+    def phase(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start)
+
+    def to_dict(self) -> dict:
+        return {
+            "phases": {name: round(seconds * 1000, 1) for name, seconds in self.phases},
+            "total_ms": round(sum(seconds for _, seconds in self.phases) * 1000, 1),
+        }
+
+    def format(self) -> str:
+        lines = ["启动耗时:"]
+        for name, seconds in self.phases:
+            lines.append(f"  {name:<24}{seconds * 1000:>10.1f} ms")
+        total = sum(seconds for _, seconds in self.phases)
+        lines.append(f"  {'total':<24}{total * 1000:>10.1f} ms")
+        return "\n".join(lines)
+
+
+def import_cost_report(target: str = "src.main", top: int = 15) -> list[dict]:
+    """在子进程中以 -X importtime 导入目标模块，返回导入耗时最高的顶层包"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {target}"],
+        cwd=Path(__file__).parent.parent.parent,
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"导入 {target} 失败: {result.stderr.strip().splitlines()[-1:]}")
+
+    # 按顶层包汇总各模块自身(self)耗时，避免嵌套导入重复计入
+    packages: dict[str, int] = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        own, _, name = line[len("import time:"):].split("|")
+        package = name.strip().split(".")[0]
+        packages[package] = packages.get(package, 0) + int(own)
+
+    ranked = sorted(packages.items(), key=lambda item: item[1], reverse=True)
+    return [{"package": name, "ms": round(us / 1000, 1)} for name, us in ranked[:top]]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="统计模块导入耗时")
+    parser.add_argument("target", nargs="?", default="src.main")
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+
+    report = import_cost_report(args.target, args.top)
+    print(f"{args.target} 导入耗时（按顶层包汇总）:")
+    for item in report:
+        print(f"  {item['package']:<32}{item['ms']:>10.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,113 @@
+import time
+
+# 记录模块导入开始时间，用于启动耗时统计
+_IMPORT_STARTED = time.perf_counter()
+
 from fastapi import FastAPI, HTTPException, WebSocket, WebSocketDisconnect
+from fastapi.encoders import jsonable_encoder
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
-from .core.evaluation import LLMEvaluator, EvaluationResult
-from typing import Optional
+from fastapi.responses import Response, StreamingResponse
+from pydantic import BaseModel, Field
+from .core.batch import iter_evaluations
+from .core.consensus import ConsensusBudget, ConsensusEvaluator
+from .core.evaluation import DEFAULT_PROMPT_VARIANT, PROVIDER_CONFIGS, EvaluationResult, create_registry
+from .core.history import record_history
+from .core.jobs import JobManager
+from .core.metrics import render_latest
+from .core.scheduler import priority
+from .core.startup import StartupReport
+from contextlib import asynccontextmanager
+from typing import Optional, Union
+import json
+import os
 import sys
 from pathlib import Path
 import asyncio
+import uuid
+
+# 默认评估提供商，可通过环境变量配置
+DEFAULT_PROVIDER = os.getenv("EVAL_PROVIDER", "openrouter")
+# 批量评估默认并发数及上限
+BATCH_CONCURRENCY = int(os.getenv("EVAL_BATCH_CONCURRENCY", "8"))
+MAX_BATCH_CONCURRENCY = int(os.getenv("EVAL_MAX_BATCH_CONCURRENCY", "64"))
+# 打包评估：每次模型调用评估的用例数，1 表示逐条评估
+PACK_SIZE = int(os.getenv("EVAL_PACK_SIZE", "1"))
+MAX_PACK_SIZE = int(os.getenv("EVAL_MAX_PACK_SIZE", "20"))
+# 评估结果缓存，EVAL_CACHE_PATH 置空可关闭
+CACHE_PATH = os.getenv("EVAL_CACHE_PATH", "data/eval_cache.sqlite3")
+CACHE_TTL_SECONDS = float(os.getenv("EVAL_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+CACHE_MAX_ENTRIES = int(os.getenv("EVAL_CACHE_MAX_ENTRIES", "100000"))
+# 规则快速评估，EVAL_RULES_PATH 可指定自定义规则文件(JSON/YAML)
+RULES_ENABLED = os.getenv("EVAL_RULES_ENABLED", "1") == "1"
+RULES_PATH = os.getenv("EVAL_RULES_PATH")
+# 本地蒸馏评估模型路径（python -m src.core.distill train 生成），置空不启用
+LOCAL_JUDGE_PATH = os.getenv("EVAL_LOCAL_JUDGE_PATH", "")
+# 模型调用排队时批量评估（批量接口、任务队列）至少获得的并发份额，其余优先交互式请求
+BATCH_MIN_SHARE = float(os.getenv("EVAL_BATCH_MIN_SHARE", "0.1"))
+# 评估提示词版本：legacy（默认，原模板）/cached（固定前缀可命中提供商提示词缓存）/compact
+PROMPT_VARIANT = os.getenv("EVAL_PROMPT_VARIANT", DEFAULT_PROMPT_VARIANT)
+# 启动时预先构建评估流水线（导入langchain等重依赖），完成后服务才就绪
+PREWARM = os.getenv("EVAL_PREWARM", "0") == "1"
+# 共识评估：单条用例最多采样次数，批量请求追加调用预算 = 用例数 × 比例
+CONSENSUS_MAX_SAMPLES = int(os.getenv("EVAL_CONSENSUS_MAX_SAMPLES", "5"))
+CONSENSUS_BUDGET_RATIO = float(os.getenv("EVAL_CONSENSUS_BUDGET_RATIO", "1.0"))
+# 运行历史库：批量接口的每次请求和每个完成的任务各记录为一次运行，置空不记录
+HISTORY_PATH = os.getenv("EVAL_HISTORY_PATH", "data/history.sqlite3")
+# 评估任务队列：持久化存储路径、工作进程数及每个进程的并发数
+JOBS_PATH = os.getenv("EVAL_JOBS_PATH", "data/jobs.sqlite3")
+JOB_WORKERS = int(os.getenv("EVAL_JOB_WORKERS", "2"))
+JOB_WORKER_CONCURRENCY = int(os.getenv("EVAL_JOB_WORKER_CONCURRENCY", "8"))
+# 任务工作进程共占每个提供商速率与并发上限的份额（各进程平分），服务进程使用其余部分；
+# 各进程分别排队，交互式请求只优先于本进程内的批量评估
+JOB_SHARE = float(os.getenv("EVAL_JOB_SHARE", "0.5")) if JOB_WORKERS > 0 else 0.0
+
+# 服务进程与任务工作进程共用的评估器配置
+EVALUATOR_CONFIG = {
+    "provider": DEFAULT_PROVIDER,
+    "cache_path": CACHE_PATH,
+    "cache_ttl_seconds": CACHE_TTL_SECONDS,
+    "cache_max_entries": CACHE_MAX_ENTRIES,
+    "rules_enabled": RULES_ENABLED,
+    "rules_path": RULES_PATH,
+    "local_judge_path": LOCAL_JUDGE_PATH,
+    "batch_min_share": BATCH_MIN_SHARE,
+    "prompt_variant": PROMPT_VARIANT,
+    "prewarm": PREWARM,
+    "concurrency": JOB_WORKER_CONCURRENCY,
+    "history_path": HISTORY_PATH,
+}
 
-app = FastAPI()
+_IMPORTS_FINISHED = time.perf_counter()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """应用启动时创建常驻评估器，关闭时释放连接池"""
+    startup = StartupReport()
+    startup.add("imports", _IMPORTS_FINISHED - _IMPORT_STARTED)
+    with startup.phase("registry"):
+        registry = create_registry(
+            {**EVALUATOR_CONFIG, "prewarm": False, "throttle_share": 1 - JOB_SHARE}
+        )
+    if PREWARM:
+        with startup.phase("prewarm"):
+            # 在线程中构建，导入期间事件循环仍可响应
+            await asyncio.to_thread(registry.warm_up, [DEFAULT_PROVIDER], True)
+    with startup.phase("job_workers"):
+        jobs = JobManager(JOBS_PATH, EVALUATOR_CONFIG, num_workers=JOB_WORKERS, throttle_share=JOB_SHARE)
+        jobs.start()
+    print(startup.format())
+    app.state.evaluators = registry
+    app.state.jobs = jobs
+    app.state.startup = startup
+    try:
+        yield
+    finally:
+        jobs.stop()
+        await registry.aclose()
+
+
+app = FastAPI(lifespan=lifespan)
 
 # 配置CORS
 app.add_middleware(
@@ -21,20 +121,173 @@ app.add_middleware(
 class AnalyzeRequest(BaseModel):
     sample: str
     machineResponse: str
+    bypassCache: bool = False
+    consensus: bool = False
+
+class BatchAnalyzeItem(BaseModel):
+    id: Union[int, str]
+    sample: str
+    machineResponse: str
+
+class JobRequest(BaseModel):
+    items: list[BatchAnalyzeItem]
+    provider: Optional[str] = None
+    bypassCache: bool = False
+
+class BatchAnalyzeRequest(BaseModel):
+    items: list[BatchAnalyzeItem]
+    concurrency: Optional[int] = Field(default=None, ge=1)
+    packSize: Optional[int] = Field(default=None, ge=1)
+    bypassCache: bool = False
+    consensus: bool = False
+
 @app.post("/api/analyze")
 async def analyze(request: AnalyzeRequest) -> EvaluationResult:
     """评估车机系统响应"""
     try:
-        evaluator = LLMEvaluator("openrouter")
-        result = evaluator.evaluate(request.sample, request.machineResponse)
-        print(result)
-        return result
+        evaluator = app.state.evaluators.get(DEFAULT_PROVIDER)
+        if request.consensus:
+            evaluator = ConsensusEvaluator(evaluator, max_samples=CONSENSUS_MAX_SAMPLES)
+        with priority("interactive"):
+            return await evaluator.aevaluate(
+                request.sample, request.machineResponse, use_cache=not request.bypassCache
+            )
     except Exception as e:
         raise HTTPException(
             status_code=500,
             detail=f"评估过程中发生错误: {str(e)}"
         )
 
+@app.post("/api/analyze/batch")
+async def analyze_batch(request: BatchAnalyzeRequest) -> StreamingResponse:
+    """批量评估，按完成顺序以NDJSON流式返回每条结果"""
+    evaluator = app.state.evaluators.get(DEFAULT_PROVIDER)
+    concurrency = min(request.concurrency or BATCH_CONCURRENCY, MAX_BATCH_CONCURRENCY)
+    pack_size = min(request.packSize or PACK_SIZE, MAX_PACK_SIZE)
+    if request.consensus:
+        budget = ConsensusBudget(int(len(request.items) * CONSENSUS_BUDGET_RATIO))
+        evaluator = ConsensusEvaluator(evaluator, budget, max_samples=CONSENSUS_MAX_SAMPLES)
+
+    async def stream():
+        outcomes = iter_evaluations(
+            evaluator,
+            request.items,
+            concurrency,
+            use_cache=not request.bypassCache,
+            pack_size=pack_size,
+        )
+        items = {item.id: item for item in request.items}
+        records = []
+        async for outcome in outcomes:
+            record = outcome.to_dict()
+            item = items[outcome.id]
+            records.append(
+                {**record, "sample": item.sample, "machineResponse": item.machineResponse, "latency": outcome.latency}
+            )
+            line = json.dumps(jsonable_encoder(record), ensure_ascii=False)
+            yield line + "\n"
+        if HISTORY_PATH:
+            # 整批完成后作为一次运行写入历史库，客户端中途断开时不记录
+            try:
+                await asyncio.to_thread(
+                    record_history,
+                    HISTORY_PATH,
+                    f"batch-{uuid.uuid4().hex[:12]}@{time.strftime('%Y%m%d-%H%M%S')}",
+                    jsonable_encoder(records),
+                    case_file="/api/analyze/batch",
+                    provider=DEFAULT_PROVIDER,
+                    judge_version=evaluator.packed_judge_version(pack_size),
+                )
+            except Exception as e:
+                print(f"批量评估写入运行历史失败: {e}")
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+@app.post("/api/jobs")
+async def submit_job(request: JobRequest) -> dict:
+    """提交评估任务，立即返回任务ID，由后台工作进程执行"""
+    provider = request.provider or DEFAULT_PROVIDER
+    unknown = [p for p in provider.split(",") if p.strip() not in PROVIDER_CONFIGS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"不支持的LLM提供商: {', '.join(unknown)}")
+    items = [item.model_dump() for item in request.items]
+    job_id = await asyncio.to_thread(
+        app.state.jobs.store.create_job,
+        items,
+        provider,
+        {"bypassCache": request.bypassCache},
+    )
+    return {"jobId": job_id, "total": len(items)}
+
+@app.get("/api/jobs")
+async def list_jobs(limit: int = 50) -> list[dict]:
+    """最近提交的任务"""
+    return await asyncio.to_thread(app.state.jobs.store.list_jobs, limit)
+
+@app.get("/api/jobs/{job_id}")
+async def get_job(job_id: str) -> dict:
+    """任务状态与进度"""
+    job = await asyncio.to_thread(app.state.jobs.store.get_job, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="任务不存在")
+    return job
+
+@app.get("/api/jobs/{job_id}/results")
+async def get_job_results(job_id: str, after: int = 0, limit: int = 1000) -> dict:
+    """增量拉取任务结果：返回完成序号大于 after 的用例"""
+    job = await asyncio.to_thread(app.state.jobs.store.get_job, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="任务不存在")
+    results = await asyncio.to_thread(app.state.jobs.store.results, job_id, after, limit)
+    return {"job": job, "results": results}
+
+@app.get("/api/jobs/{job_id}/events")
+async def job_events(job_id: str, after: int = 0) -> StreamingResponse:
+    """订阅任务进度：以NDJSON流推送新完成的用例结果和进度，任务结束后关闭"""
+    store = app.state.jobs.store
+    if await asyncio.to_thread(store.get_job, job_id) is None:
+        raise HTTPException(status_code=404, detail="任务不存在")
+
+    async def stream():
+        cursor = after
+        while True:
+            results = await asyncio.to_thread(store.results, job_id, cursor)
+            for item in results:
+                cursor = item["order"]
+                yield json.dumps({"type": "result", **item}, ensure_ascii=False) + "\n"
+            job = await asyncio.to_thread(store.get_job, job_id)
+            yield json.dumps({"type": "progress", "job": job}, ensure_ascii=False) + "\n"
+            if job["status"] in ("completed", "cancelled") and not results:
+                break
+            await asyncio.sleep(1.0)
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+@app.delete("/api/jobs/{job_id}")
+async def cancel_job(job_id: str) -> dict:
+    """取消任务，未开始的用例不再执行"""
+    if not await asyncio.to_thread(app.state.jobs.store.cancel, job_id):
+        raise HTTPException(status_code=404, detail="任务不存在或已结束")
+    return {"jobId": job_id, "status": "cancelled"}
+
+@app.get("/api/stats")
+async def stats() -> dict:
+    """评估服务运行统计"""
+    registry = app.state.evaluators
+    return {
+        "cache": registry.cache.stats() if registry.cache else None,
+        "pre_evaluators": {p.name: p.stats() for p in registry.pre_evaluators},
+        "evaluators": registry.stats(),
+        "jobs": app.state.jobs.stats(),
+        "startup": app.state.startup.to_dict(),
+    }
+
+@app.get("/metrics")
+async def metrics() -> Response:
+    """Prometheus指标"""
+    content, content_type = render_latest()
+    return Response(content=content, media_type=content_type)
+
 if __name__ == "__main__":
     # 添加项目根目录到Python路径
     sys.path.append(str(Path(__file__).parent.parent))
@@ -0,0 +1,116 @@
+"""
+评估运行报表
+
+基于运行历史库生成报表：最近运行的通过率趋势、指定运行的汇总（各维度平均分、
+结论来源、延迟分位数）、相对上次运行的回归用例以及得分最低的用例。
+统计均在SQLite中聚合，十万级结果也无需全部读入内存。
+
+用法：
+    python -m src.report                              # 最近一次运行，对比其上一次
+    python -m src.report --run <运行id> --baseline <运行id> --worst 50
+    python -m src.report --import data/runs/cases.openrouter.jsonl
+"""
+import argparse
+import json
+import os
+import time
+from pathlib import Path
+from typing import Optional
+
+from .core.checkpoint import read_checkpoint
+from .core.history import DIMENSIONS, HistoryStore
+
+
+def build_report(
+    store: HistoryStore,
+    run_id: str,
+    baseline: Optional[str] = None,
+    worst: int = 20,
+    dimension: Optional[str] = None,
+) -> dict:
+    return {
+        "runs": store.runs(),
+        "summary": store.summary(run_id),
+        "baseline": baseline,
+        "regressions": store.regressions(baseline, run_id) if baseline else [],
+        "worst_cases": store.worst_cases(run_id, worst, dimension),
+    }
+
+
+def _percent(value) -> str:
+    return "-" if value is None else f"{value * 100:.1f}%"
+
+
+def _ms(value) -> str:
+    return "-" if value is None else f"{value * 1000:.0f}ms"
+
+
+def format_report(report: dict) -> str:
+    summary = report["summary"]
+    lines = ["最近运行:"]
+    for run in report["runs"]:
+        lines.append(
+            f"  {run['run_id']:<40} 用例 {run['total']:>6}  通过率 {_percent(run['pass_rate']):>6}  失败 {run['errors']}"
+        )
+    lines += [
+        "",
+        f"运行 {summary['run_id']}:",
+        f"  用例 {summary['total']}，通过 {summary['passed']}（{_percent(summary['pass_rate'])}），"
+        f"评估失败 {summary['errors']}，沿用上次结论 {summary['carried']}",
+        f"  平均总分 {summary['avg_overall'] or 0:.3f}  "
+        + "  ".join(f"{name} {score or 0:.3f}" for name, score in summary["avg_scores"].items()),
+        f"  结论来源 {json.dumps(summary['sources'], ensure_ascii=False)}",
+        f"  模型结论提供商 {json.dumps(summary['providers'], ensure_ascii=False)}",
+        f"  延迟 p50 {_ms(summary['latency_p50'])}  p95 {_ms(summary['latency_p95'])}",
+    ]
+    if report["baseline"]:
+        lines += ["", f"相对 {report['baseline']} 的回归用例（{len(report['regressions'])}）:"]
+        for item in report["regressions"]:
+            lines.append(
+                f"  [{item['case_id']}] {item['sample']} -> {item['response']}  "
+                f"{item['base_overall']:.2f} -> {item['overall']:.2f}"
+            )
+    lines += ["", "得分最低的用例:"]
+    for item in report["worst_cases"]:
+        lines.append(f"  [{item['case_id']}] {item['score']:.2f}  {item['sample']} -> {item['response']}")
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="评估运行报表")
+    parser.add_argument("--db", default=os.getenv("EVAL_HISTORY_PATH", "data/history.sqlite3"))
+    parser.add_argument("--run", help="运行id，默认最近一次")
+    parser.add_argument("--baseline", help="对比的运行id，默认上一次运行")
+    parser.add_argument("--worst", type=int, default=20, help="列出得分最低的用例数")
+    parser.add_argument("--dimension", choices=list(DIMENSIONS), help="按指定维度列出最低分用例")
+    parser.add_argument("--json", action="store_true", help="以JSON格式输出")
+    parser.add_argument("--import", dest="import_path", help="将检查点文件导入历史库")
+    parser.add_argument("--provider", help="导入检查点时记录的提供商")
+    args = parser.parse_args()
+
+    store = HistoryStore(args.db)
+    try:
+        if args.import_path:
+            run_id = f"{Path(args.import_path).stem}@{time.strftime('%Y%m%d-%H%M%S')}"
+            count = store.record_run(
+                run_id, read_checkpoint(args.import_path).values(), provider=args.provider
+            )
+            print(f"已导入 {count} 条结果，运行id {run_id}")
+            return
+
+        run_id = args.run or store.latest_run()
+        if run_id is None:
+            print("历史库中没有运行记录")
+            return
+        baseline = args.baseline or store.latest_run(before=run_id)
+        report = build_report(store, run_id, baseline, args.worst, args.dimension)
+        if args.json:
+            print(json.dumps(report, ensure_ascii=False, indent=2))
+        else:
+            print(format_report(report))
+    finally:
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,198 @@
+"""
+测试用例批量运行工具
+
+加载JSON/YAML/CSV用例文件，按状态筛选后并发评估，每完成一条用例写入检查点；
+中断后以相同参数重新运行即从检查点继续，已完成的用例不会重复评估。
+指定 --baseline 时与上次运行对比，只评估指令、响应或评估配置有变化的用例。
+
+用法：
+    python -m src.runner data/cases.json --status Ready --responses responses.json
+    python -m src.runner cases.csv --provider openrouter,aliyun_bailian --concurrency 16
+    python -m src.runner data/cases.json --checkpoint data/runs/nightly-0602.jsonl \\
+        --baseline data/runs/nightly-0601.jsonl
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+from pathlib import Path
+
+from tqdm import tqdm
+
+from .core.batch import iter_evaluations
+from .core.cases import load_cases, select_cases
+from .core.checkpoint import Checkpoint, read_checkpoint
+from .core.consensus import ConsensusBudget, ConsensusEvaluator
+from .core.evaluation import DEFAULT_PROMPT_VARIANT, PROMPT_VARIANTS, create_registry
+from .core.history import HistoryStore
+from .core.planner import case_fingerprint, plan_run
+
+
+def default_checkpoint_path(case_file: str, provider: str) -> str:
+    """同一用例文件和提供商默认使用同一检查点，便于直接续跑"""
+    name = provider.replace(",", "+")
+    return str(Path("data/runs") / f"{Path(case_file).stem}.{name}.jsonl")
+
+
+async def run(args) -> int:
+    cases = select_cases(load_cases(args.cases, args.responses), args.status)
+    runnable = [case for case in cases if case.machineResponse]
+    missing = [case for case in cases if not case.machineResponse]
+    if missing:
+        print(f"跳过 {len(missing)} 条缺少车机响应的用例: {', '.join(case.id for case in missing[:20])}")
+
+    registry = create_registry(
+        {
+            "provider": args.provider,
+            "cache_path": "" if args.no_cache else os.getenv("EVAL_CACHE_PATH", "data/eval_cache.sqlite3"),
+            "rules_enabled": os.getenv("EVAL_RULES_ENABLED", "1") == "1",
+            "rules_path": os.getenv("EVAL_RULES_PATH"),
+            "local_judge_path": os.getenv("EVAL_LOCAL_JUDGE_PATH", ""),
+            "prompt_variant": args.prompt_variant,
+            "throttle_share": args.throttle_share,
+        }
+    )
+    evaluator = registry.get(args.provider)
+    if args.consensus:
+        budget = ConsensusBudget(
+            args.consensus_budget if args.consensus_budget is not None else len(runnable)
+        )
+        evaluator = ConsensusEvaluator(evaluator, budget, max_samples=args.max_samples)
+    # 打包评估使用不同的提示词，指纹随打包方式变化，不与逐条评估的结论混用
+    judge_version = evaluator.packed_judge_version(args.pack_size)
+    fingerprints = {
+        case.id: case_fingerprint(case.sample, case.machineResponse, judge_version)
+        for case in runnable
+    }
+
+    checkpoint_path = args.checkpoint or default_checkpoint_path(args.cases, args.provider)
+    if args.restart and Path(checkpoint_path).exists():
+        Path(checkpoint_path).unlink()
+    checkpoint = Checkpoint(checkpoint_path)
+    todo = [case for case in runnable if not checkpoint.is_done(case.id, fingerprints[case.id])]
+    print(
+        f"用例 {len(cases)} 条，可评估 {len(runnable)} 条，"
+        f"已完成 {len(runnable) - len(todo)} 条，待评估 {len(todo)} 条；检查点 {checkpoint_path}"
+    )
+
+    if args.baseline:
+        # 与上次运行对比，未变化的用例沿用结论
+        plan = plan_run(todo, fingerprints, read_checkpoint(args.baseline), args.baseline)
+        for case, carried in plan.carried:
+            checkpoint.write(
+                case.id,
+                case.sample,
+                case.machineResponse,
+                result=carried["result"],
+                fingerprint=fingerprints[case.id],
+                carried_from=carried["carried_from"],
+            )
+        todo = plan.to_run
+        summary = plan.summary()
+        print(
+            f"增量计划：沿用 {summary['carried']} 条，评估 {summary['to_run']} 条"
+            f"（新增 {summary['new']}，变更 {summary['changed']}，上次失败 {summary['retried']}）"
+        )
+
+    by_id = {case.id: case for case in todo}
+    failed = 0
+    try:
+        with tqdm(total=len(todo), unit="case", dynamic_ncols=True) as progress:
+            async for outcome in iter_evaluations(
+                evaluator,
+                todo,
+                concurrency=args.concurrency,
+                use_cache=not args.bypass_cache,
+                pack_size=args.pack_size,
+            ):
+                case = by_id[outcome.id]
+                checkpoint.write(
+                    case.id,
+                    case.sample,
+                    case.machineResponse,
+                    result=outcome.result,
+                    error=outcome.error,
+                    fingerprint=fingerprints[case.id],
+                    latency=outcome.latency,
+                )
+                if outcome.error is not None:
+                    failed += 1
+                    progress.set_postfix(failed=failed)
+                progress.update(1)
+    finally:
+        checkpoint.close()
+        await registry.aclose()
+
+    results = [
+        checkpoint.records[case.id]["result"]
+        for case in runnable
+        if checkpoint.is_done(case.id, fingerprints[case.id])
+    ]
+    passed = sum(1 for result in results if result["assessment"]["valid"])
+    print(f"完成 {len(results)}/{len(runnable)} 条：通过 {passed}，不通过 {len(results) - passed}，评估失败 {failed}")
+    if args.consensus:
+        stats = evaluator.stats()
+        print(
+            f"共识评估：{stats['sampled_cases']}/{stats['cases']} 条追加采样，"
+            f"追加调用 {stats['extra_calls']} 次（预算 {stats['budget']['max_extra_calls']}）"
+        )
+    if args.history:
+        # 以检查点中本次用例的最终记录作为一次运行写入历史库
+        run_id = f"{Path(checkpoint_path).stem}@{time.strftime('%Y%m%d-%H%M%S')}"
+        history = HistoryStore(args.history)
+        try:
+            history.record_run(
+                run_id,
+                [checkpoint.records[case.id] for case in runnable if case.id in checkpoint.records],
+                case_file=args.cases,
+                provider=args.provider,
+                judge_version=judge_version,
+            )
+        finally:
+            history.close()
+        print(f"运行记录 {run_id} 已写入 {args.history}")
+    return 1 if failed else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="批量运行测试用例评估")
+    parser.add_argument("cases", nargs="?", default="data/cases.json", help="用例文件(JSON/YAML/CSV)")
+    parser.add_argument("--responses", help="按 id 提供车机响应的文件，用例文件自带响应时可省略")
+    parser.add_argument("--status", action="append", help="只运行指定状态的用例，可重复指定，如 --status Ready")
+    parser.add_argument("--provider", default=os.getenv("EVAL_PROVIDER", "openrouter"))
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument(
+        "--prompt-variant",
+        choices=list(PROMPT_VARIANTS),
+        default=os.getenv("EVAL_PROMPT_VARIANT", DEFAULT_PROMPT_VARIANT),
+        help="评估提示词版本，可分别运行后用 src.report 对比",
+    )
+    parser.add_argument(
+        "--throttle-share",
+        type=float,
+        default=1.0,
+        help="占用的提供商速率与并发上限份额；限流器按进程独立，与服务同时运行时应相应调小",
+    )
+    parser.add_argument("--pack-size", type=int, default=1, help="每次模型调用评估的用例数")
+    parser.add_argument("--consensus", action="store_true", help="结论不明确的用例追加采样，按多数结论判定")
+    parser.add_argument("--max-samples", type=int, default=5, help="共识评估时单条用例最多采样次数")
+    parser.add_argument("--consensus-budget", type=int, help="共识评估追加调用总数上限，默认等于用例数")
+    parser.add_argument("--checkpoint", help="检查点文件路径，默认 data/runs/<用例文件>.<提供商>.jsonl")
+    parser.add_argument("--baseline", help="上次运行的检查点，未变化的用例沿用其结论，只评估新增或变更的用例")
+    parser.add_argument(
+        "--history",
+        default=os.getenv("EVAL_HISTORY_PATH", "data/history.sqlite3"),
+        help="运行历史库路径，置空不记录",
+    )
+    parser.add_argument("--restart", action="store_true", help="丢弃已有检查点，重新运行全部用例")
+    parser.add_argument("--bypass-cache", action="store_true", help="不读取评估缓存")
+    parser.add_argument("--no-cache", action="store_true", help="关闭评估缓存")
+    args = parser.parse_args()
+    if args.status:
+        args.status = [s for value in args.status for s in value.split(",")]
+    sys.exit(asyncio.run(run(args)))
+
+
+if __name__ == "__main__":
+    main()
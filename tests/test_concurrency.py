@@ -0,0 +1,197 @@
+import asyncio
+
+import pytest
+
+from src.core.concurrency import (
+    AIMDLimiter,
+    ProviderThrottle,
+    SingleFlight,
+    is_overload_error,
+    is_transient_error,
+)
+
+
+def test_single_flight_coalesces_concurrent_calls():
+    async def main():
+        flight = SingleFlight()
+        calls = 0
+
+        async def fn():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.01)
+            return "结果"
+
+        results = await asyncio.gather(*(flight.do("k", fn) for _ in range(5)))
+        return flight, calls, results
+
+    flight, calls, results = asyncio.run(main())
+    assert calls == 1
+    assert results == ["结果"] * 5
+    assert flight.stats() == {"calls": 1, "coalesced": 4, "in_flight": 0}
+
+
+def test_single_flight_waiter_cancel_does_not_affect_others():
+    async def main():
+        flight = SingleFlight()
+        release = asyncio.Event()
+
+        async def fn():
+            await release.wait()
+            return "结果"
+
+        first = asyncio.ensure_future(flight.do("k", fn))
+        second = asyncio.ensure_future(flight.do("k", fn))
+        await asyncio.sleep(0)
+        first.cancel()
+        await asyncio.sleep(0)
+        release.set()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return await second
+
+    assert asyncio.run(main()) == "结果"
+
+
+def test_single_flight_join_after_all_waiters_cancelled():
+    """所有等待者取消后加入的调用方应发起新的调用，而不是得到 CancelledError"""
+
+    async def main():
+        flight = SingleFlight()
+        calls = 0
+
+        async def fn():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.01)
+            return calls
+
+        first = asyncio.ensure_future(flight.do("k", fn))
+        await asyncio.sleep(0)
+        first.cancel()
+        # 等待者处理完取消后，共享任务已被取消但尚未结束
+        await asyncio.sleep(0)
+        assert first.done()
+        second = await flight.do("k", fn)
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return second, calls, flight.stats()
+
+    second, calls, stats = asyncio.run(main())
+    assert second == 2
+    assert calls == 2
+    assert stats["in_flight"] == 0
+
+
+def test_single_flight_exception_is_shared_and_forgotten():
+    async def main():
+        flight = SingleFlight()
+
+        async def fail():
+            await asyncio.sleep(0)
+            raise ValueError("失败")
+
+        results = await asyncio.gather(
+            flight.do("k", fail), flight.do("k", fail), return_exceptions=True
+        )
+        retry = await flight.do("k", lambda: asyncio.sleep(0, result="重试"))
+        return results, retry
+
+    results, retry = asyncio.run(main())
+    assert all(isinstance(r, ValueError) for r in results)
+    assert retry == "重试"
+
+
+class _StatusError(Exception):
+    def __init__(self, status_code: int):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+
+
+class APIConnectionError(Exception):
+    """与 openai 客户端同名的连接错误"""
+
+
+def _flaky(error: Exception, failures: int = 1):
+    calls = 0
+
+    async def fn():
+        nonlocal calls
+        calls += 1
+        if calls <= failures:
+            raise error
+        return calls
+
+    return fn
+
+
+def test_aimd_backs_off_once_per_window():
+    limiter = AIMDLimiter(initial_limit=16)
+    limiter.on_overload()
+    limiter.on_overload()
+    assert limiter.limit == 8
+    assert limiter.slow_start is False
+
+
+def test_aimd_grows_on_healthy_latency():
+    limiter = AIMDLimiter(initial_limit=4, max_limit=6)
+    for _ in range(5):
+        limiter.on_success(0.1)
+    assert limiter.limit == 6
+    # 延迟远超基线时不增加
+    limiter = AIMDLimiter(initial_limit=4)
+    limiter.on_success(0.1)
+    limiter.on_success(1.0)
+    assert limiter.limit == 5
+
+
+def test_error_classification():
+    assert is_overload_error(_StatusError(429))
+    assert is_overload_error(_StatusError(503))
+    assert is_overload_error(asyncio.TimeoutError())
+    assert not is_overload_error(_StatusError(408))
+    assert is_transient_error(_StatusError(408))
+    assert is_transient_error(_StatusError(409))
+    assert is_transient_error(ConnectionResetError())
+    assert is_transient_error(APIConnectionError())
+    assert not is_transient_error(_StatusError(400))
+    assert not is_transient_error(ValueError())
+
+
+def test_throttle_retries_transient_error_without_backoff():
+    throttle = ProviderThrottle(rate=1000, burst=10, initial_concurrency=8, base_delay=0.01)
+    result = asyncio.run(throttle.run(_flaky(ConnectionResetError("连接被重置"), failures=2)))
+
+    assert result == 3
+    assert throttle.limiter.limit >= 8
+    assert throttle.stats()["transient_errors"] == 2
+    assert throttle.stats()["overloads"] == 0
+    assert throttle.retries == 2
+
+
+def test_throttle_shrinks_limit_on_overload():
+    throttle = ProviderThrottle(rate=1000, burst=10, initial_concurrency=8, base_delay=0.01)
+    result = asyncio.run(throttle.run(_flaky(_StatusError(429))))
+
+    assert result == 2
+    assert throttle.limiter.limit < 8
+    assert throttle.overloads == 1
+
+
+def test_throttle_raises_non_retryable_error_immediately():
+    throttle = ProviderThrottle(rate=1000, burst=10, base_delay=0.01)
+    fn = _flaky(ValueError("参数错误"), failures=10)
+    with pytest.raises(ValueError):
+        asyncio.run(throttle.run(fn))
+
+    assert throttle.retries == 0
+    assert throttle.limiter.in_flight == 0
+
+
+def test_throttle_gives_up_after_max_retries():
+    throttle = ProviderThrottle(rate=1000, burst=10, max_retries=2, base_delay=0.01)
+    with pytest.raises(ConnectionResetError):
+        asyncio.run(throttle.run(_flaky(ConnectionResetError(), failures=10)))
+
+    assert throttle.retries == 2
+    assert throttle.limiter.in_flight == 0
@@ -0,0 +1,95 @@
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from src.core.jobs import JobStore
+
+
+def _items(n: int) -> list[dict]:
+    return [{"id": i, "sample": f"样本{i}", "machineResponse": f"回复{i}"} for i in range(n)]
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = JobStore(str(tmp_path / "jobs.sqlite3"))
+    yield store
+    store.close()
+
+
+def test_concurrent_create_job(store):
+    """多个线程共用连接并发创建任务，不应出现嵌套事务等错误"""
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        job_ids = list(pool.map(lambda _: store.create_job(_items(5), "openai"), range(32)))
+
+    assert len(set(job_ids)) == 32
+    jobs = store.list_jobs(limit=100)
+    assert len(jobs) == 32
+    assert all(job["total"] == 5 and job["pending"] == 5 for job in jobs)
+
+
+def test_claim_is_exclusive(store):
+    store.create_job(_items(4), "openai")
+    first = store.claim("w1", 3)
+    second = store.claim("w2", 3)
+
+    assert [case["seq"] for case in first] == [0, 1, 2]
+    assert [case["seq"] for case in second] == [3]
+    assert store.claim("w3", 3) == []
+
+
+def test_expired_lease_is_reclaimed(store):
+    job_id = store.create_job(_items(2), "openai")
+    assert len(store.claim("w1", 2)) == 2
+    assert store.claim("w2", 2) == []
+
+    # 模拟工作进程崩溃：租约过期后由其他工作进程重新领取
+    conn = sqlite3.connect(store.path)
+    conn.execute("UPDATE job_cases SET lease_until = ? WHERE job_id = ?", (time.time() - 1, job_id))
+    conn.commit()
+    conn.close()
+
+    reclaimed = store.claim("w2", 2)
+    assert [case["seq"] for case in reclaimed] == [0, 1]
+    assert store.get_job(job_id)["running"] == 2
+
+
+def test_release_requeues_running_cases(store):
+    job_id = store.create_job(_items(3), "openai")
+    store.claim("w1", 2)
+    store.claim("w2", 1)
+
+    assert store.release("w1") == 2
+    job = store.get_job(job_id)
+    assert job["pending"] == 2 and job["running"] == 1
+    assert [case["seq"] for case in store.claim("w3", 3)] == [0, 1]
+
+
+def test_finish_completes_job_and_records(store):
+    job_id = store.create_job(_items(2), "openai")
+    store.claim("w1", 2)
+    result = {"assessment": {"overall_score": 0.8}}
+
+    assert store.finish(job_id, 0, result=result, latency=0.5) is False
+    assert store.finish(job_id, 1, error="超时") is True
+    assert store.get_job(job_id)["status"] == "completed"
+
+    records = store.records(job_id)
+    assert records[0] == {
+        "id": "0",
+        "sample": "样本0",
+        "machineResponse": "回复0",
+        "result": result,
+        "latency": 0.5,
+    }
+    assert records[1]["error"] == "超时"
+    assert [row["order"] for row in store.results(job_id)] == [1, 2]
+    assert [row["id"] for row in store.results(job_id, after=1)] == ["1"]
+
+
+def test_cancelled_job_is_not_claimed(store):
+    job_id = store.create_job(_items(2), "openai")
+    assert store.cancel(job_id) is True
+    assert store.claim("w1", 2) == []
+    assert store.cancel(job_id) is False
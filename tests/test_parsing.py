@@ -0,0 +1,98 @@
+import json
+
+import pytest
+
+from src.core.parsing import OutputRepairError, load_json_lenient, parse_evaluation
+
+EXPECTED = {
+    "assessment": {
+        "semantic_correctness": {"score": 0.8, "comment": "a"},
+        "state_change_confirmation": {"score": 0.6, "comment": "b"},
+        "unambiguous_expression": {"score": 1.0, "comment": "c"},
+        "overall_score": 0.8,
+        "valid": True,
+        "suggestions": [],
+    }
+}
+VALID_OUTPUT = json.dumps(EXPECTED, ensure_ascii=False)
+
+
+def test_valid_output_needs_no_repair():
+    assert parse_evaluation(VALID_OUTPUT) == (EXPECTED, [])
+
+
+def test_code_fence_and_surrounding_text():
+    assert parse_evaluation(f"评估如下：\n```json\n{VALID_OUTPUT}\n```\n以上。") == (EXPECTED, [])
+
+
+def test_python_literals_and_trailing_comma():
+    text = (
+        "{'assessment': {'semantic_correctness': {'score': 0.8, 'comment': 'a'}, "
+        "'state_change_confirmation': {'score': 0.6, 'comment': 'b'}, "
+        "'unambiguous_expression': {'score': 1.0, 'comment': 'c'}, "
+        "'overall_score': 0.8, 'valid': True, 'suggestions': [],}}"
+    )
+    result, repairs = parse_evaluation(text)
+    assert result == EXPECTED
+    assert repairs == ["python_literal", "trailing_comma"]
+
+
+def test_truncated_output_is_closed():
+    text = VALID_OUTPUT[: VALID_OUTPUT.index('"overall_score"')].rstrip(", ")
+    result, repairs = parse_evaluation(text)
+    assert result == EXPECTED
+    assert "truncated" in repairs
+
+
+def test_truncated_inside_string():
+    data, repairs = load_json_lenient('{"comment": "未写完')
+    assert data == {"comment": "未写完"}
+    assert repairs == ["truncated"]
+
+
+def test_key_aliases_and_ten_point_scale():
+    text = json.dumps(
+        {
+            "evaluation": {
+                "semantic": {"rating": 8, "reason": "a"},
+                "state_change": {"rating": 6, "reason": "b"},
+                "clarity": {"rating": 10, "reason": "c"},
+                "是否通过": "是",
+                "suggestion": "改进",
+            }
+        },
+        ensure_ascii=False,
+    )
+    result, repairs = parse_evaluation(text)
+    assert result == {"assessment": {**EXPECTED["assessment"], "suggestions": ["改进"]}}
+    assert {"key_alias", "rescaled", "suggestions_coerced"} <= set(repairs)
+
+
+def test_unwrapped_scores_and_overall_recomputed():
+    text = (
+        '{"semantic_correctness": 0.9, "state_change_confirmation": 0.6, '
+        '"unambiguous_expression": 0.3, "overall_score": 0.95}'
+    )
+    result, repairs = parse_evaluation(text)
+    assessment = result["assessment"]
+    assert assessment["overall_score"] == 0.6
+    assert assessment["valid"] is True
+    assert assessment["semantic_correctness"] == {"score": 0.9, "comment": ""}
+    assert {"unwrapped", "comment_missing", "overall_recomputed", "valid_derived"} <= set(repairs)
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        "无法评估",
+        "评估：{语义正确性: 好}",
+        "[1, 2, 3]",
+        '{"comment": "缺少评分"}',
+        '{"semantic_correctness": {"comment": "a"}, "state_change_confirmation": 0.6, '
+        '"unambiguous_expression": 0.3}',
+        '{"semantic_correctness": -1, "state_change_confirmation": 0.6, "unambiguous_expression": 0.3}',
+    ],
+)
+def test_unrepairable_output_raises(text):
+    with pytest.raises(OutputRepairError):
+        parse_evaluation(text)
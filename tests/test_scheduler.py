@@ -0,0 +1,66 @@
+import asyncio
+
+import pytest
+
+from src.core.concurrency import AIMDLimiter
+from src.core.scheduler import FairScheduler, class_weights, priority
+
+
+def _order(*names: str) -> list[str]:
+    """并发上限为1时依次排队，返回各请求取得槽位的顺序"""
+
+    async def main():
+        scheduler = FairScheduler(AIMDLimiter(initial_limit=1), class_weights(0.1))
+        await scheduler.acquire("batch")
+        granted = []
+
+        async def request(name, index):
+            await scheduler.acquire(name)
+            granted.append(f"{name}{index}")
+
+        tasks = []
+        for index, name in enumerate(names):
+            tasks.append(asyncio.ensure_future(request(name, index)))
+            await asyncio.sleep(0)
+        for _ in names:
+            scheduler.release()
+            await asyncio.sleep(0)
+        await asyncio.gather(*tasks)
+        return granted
+
+    return asyncio.run(main())
+
+
+def test_interactive_request_overtakes_queued_batch():
+    assert _order("batch", "batch", "batch", "interactive") == [
+        "interactive3",
+        "batch0",
+        "batch1",
+        "batch2",
+    ]
+
+
+def test_batch_keeps_minimum_share_under_interactive_backlog():
+    granted = _order(*["interactive"] * 20, "batch")
+    assert "batch20" in granted[:12]
+
+
+def test_cancelled_waiter_leaves_queue():
+    async def main():
+        limiter = AIMDLimiter(initial_limit=1)
+        scheduler = FairScheduler(limiter)
+        await scheduler.acquire("batch")
+        waiter = asyncio.ensure_future(scheduler.acquire("batch"))
+        await asyncio.sleep(0)
+        waiter.cancel()
+        await asyncio.gather(waiter, return_exceptions=True)
+        scheduler.release()
+        return limiter.in_flight, scheduler.stats()["batch"]["queued"]
+
+    assert asyncio.run(main()) == (0, 0)
+
+
+def test_priority_context():
+    with pytest.raises(ValueError):
+        with priority("unknown"):
+            pass
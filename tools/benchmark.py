@@ -0,0 +1,243 @@
+"""
+评估API压测工具
+
+以固定并发驱动 /api/analyze（或 /api/analyze/batch），统计 p50/p95/p99 延迟、
+吞吐量和事件循环延迟。默认在进程内运行 src.main:app 并启动本地模拟LLM服务，
+无需API密钥即可离线/在CI中运行；也可用 --url 压测已部署的服务。
+
+用法：
+    python -m tools.benchmark --requests 500 --concurrency 50
+    python -m tools.benchmark --mode batch --batch-size 50 --concurrency 4
+    python -m tools.benchmark --url http://localhost:8000 --no-mock
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import Optional
+
+import httpx
+
+PROJECT_ROOT = Path(__file__).parent.parent
+
+
+def percentile(values: list[float], q: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class LoopLagMonitor:
+    """事件循环延迟监控：周期性休眠并记录实际唤醒的滞后时间"""
+
+    def __init__(self, interval: float = 0.01):
+        self.interval = interval
+        self.samples: list[float] = []
+        self._task: Optional[asyncio.Task] = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            start = loop.time()
+            await asyncio.sleep(self.interval)
+            self.samples.append(max(0.0, loop.time() - start - self.interval))
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+
+def load_instructions(path: Path) -> list[str]:
+    with open(path, encoding="utf-8") as f:
+        return [case["text"] for case in json.load(f)]
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_mock_server(args) -> tuple[subprocess.Popen, str]:
+    """以子进程启动模拟LLM服务，返回进程和 base_url"""
+    port = _free_port()
+    process = subprocess.Popen(
+        [
+            sys.executable, "-m", "tools.mock_llm_server",
+            "--port", str(port),
+            "--latency", args.mock_latency,
+            "--latency-mean", str(args.mock_latency_mean),
+            "--error-rate", str(args.mock_error_rate),
+            "--rate-limit-rate", str(args.mock_rate_limit_rate),
+            "--malformed-rate", str(args.mock_malformed_rate),
+        ],
+        cwd=PROJECT_ROOT,
+    )
+    deadline = time.time() + 15
+    while time.time() < deadline:
+        try:
+            httpx.get(f"http://127.0.0.1:{port}/stats", timeout=0.5)
+            break
+        except httpx.HTTPError:
+            time.sleep(0.1)
+    else:
+        process.terminate()
+        raise RuntimeError("模拟LLM服务启动超时")
+    return process, f"http://127.0.0.1:{port}/v1"
+
+
+@asynccontextmanager
+async def open_client(args):
+    """创建压测客户端：--url 时连接外部服务，否则在进程内运行应用"""
+    if args.url:
+        async with httpx.AsyncClient(base_url=args.url, timeout=args.timeout) as client:
+            yield client
+        return
+
+    sys.path.insert(0, str(PROJECT_ROOT))
+    from src.main import app
+
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://benchmark", timeout=args.timeout
+        ) as client:
+            yield client
+
+
+async def run_benchmark(args) -> dict:
+    instructions = load_instructions(Path(args.cases))
+    rng = random.Random(args.seed)
+
+    def make_item(i: int) -> dict:
+        # 响应文本按 unique_ratio 生成，控制缓存与请求合并的命中比例
+        variant = i if rng.random() < args.unique_ratio else rng.randrange(10)
+        return {
+            "id": i,
+            "sample": rng.choice(instructions),
+            "machineResponse": f"好的，这是第{variant}条模拟响应",
+            "bypassCache": args.bypass_cache,
+        }
+
+    latencies: list[float] = []
+    errors = 0
+    items_done = 0
+    counter = iter(range(args.requests))
+
+    async with open_client(args) as client:
+        monitor = LoopLagMonitor()
+        monitor.start()
+
+        async def worker():
+            nonlocal errors, items_done
+            for i in counter:
+                start = time.perf_counter()
+                try:
+                    if args.mode == "batch":
+                        items = [make_item(i * args.batch_size + j) for j in range(args.batch_size)]
+                        payload = {"items": items, "bypassCache": args.bypass_cache}
+                        if args.pack_size:
+                            payload["packSize"] = args.pack_size
+                        response = await client.post("/api/analyze/batch", json=payload)
+                        response.raise_for_status()
+                        lines = [json.loads(line) for line in response.text.splitlines() if line]
+                        errors += sum(1 for line in lines if "error" in line)
+                        items_done += len(lines)
+                    else:
+                        response = await client.post("/api/analyze", json=make_item(i))
+                        response.raise_for_status()
+                        items_done += 1
+                except httpx.HTTPError:
+                    errors += 1
+                latencies.append(time.perf_counter() - start)
+
+        wall_start = time.perf_counter()
+        await asyncio.gather(*[worker() for _ in range(args.concurrency)])
+        wall = time.perf_counter() - wall_start
+        await monitor.stop()
+
+    return {
+        "mode": args.mode,
+        "requests": len(latencies),
+        "items": items_done,
+        "errors": errors,
+        "concurrency": args.concurrency,
+        "wall_seconds": round(wall, 3),
+        "requests_per_second": round(len(latencies) / wall, 2) if wall else None,
+        "items_per_second": round(items_done / wall, 2) if wall else None,
+        "latency_p50_ms": _ms(percentile(latencies, 0.50)),
+        "latency_p95_ms": _ms(percentile(latencies, 0.95)),
+        "latency_p99_ms": _ms(percentile(latencies, 0.99)),
+        "loop_lag_p99_ms": _ms(percentile(monitor.samples, 0.99)),
+        "loop_lag_max_ms": _ms(max(monitor.samples, default=None)),
+        # 进程内模式下事件循环即服务端事件循环；--url 模式下仅反映压测客户端
+        "loop_lag_scope": "client" if args.url else "server",
+    }
+
+
+def _ms(seconds: Optional[float]) -> Optional[float]:
+    return None if seconds is None else round(seconds * 1000, 2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="评估API压测")
+    parser.add_argument("--url", help="压测外部服务地址；不指定时在进程内运行 src.main:app")
+    parser.add_argument("--mode", choices=["analyze", "batch"], default="analyze")
+    parser.add_argument("--requests", type=int, default=200, help="请求总数")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--batch-size", type=int, default=20, help="batch模式下每个请求的用例数")
+    parser.add_argument("--pack-size", type=int, default=None, help="batch模式下的打包评估条数")
+    parser.add_argument("--unique-ratio", type=float, default=1.0, help="唯一响应文本的比例")
+    parser.add_argument("--bypass-cache", action="store_true")
+    parser.add_argument("--cases", default=str(PROJECT_ROOT / "data" / "cases.json"))
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--no-mock", action="store_true", help="不启动模拟LLM服务，使用真实提供商")
+    parser.add_argument("--mock-latency", choices=["fixed", "uniform", "lognormal"], default="lognormal")
+    parser.add_argument("--mock-latency-mean", type=float, default=0.5)
+    parser.add_argument("--mock-error-rate", type=float, default=0.0)
+    parser.add_argument("--mock-rate-limit-rate", type=float, default=0.0)
+    parser.add_argument("--mock-malformed-rate", type=float, default=0.0, help="模拟服务返回格式偏差输出的比例")
+    parser.add_argument("--output", help="将结果写入JSON文件（供CI比对）")
+    args = parser.parse_args()
+
+    mock = None
+    if not args.no_mock and not args.url:
+        mock, base_url = start_mock_server(args)
+        # 所有提供商都指向模拟服务；默认关闭结果缓存并放开限流，测量服务自身开销
+        for prefix in ("OPENROUTER", "ALIYUN_BAILIAN"):
+            os.environ[f"{prefix}_BASE_URL"] = base_url
+            os.environ.setdefault(f"{prefix}_RATE_LIMIT", "10000")
+            os.environ.setdefault(f"{prefix}_BURST", "10000")
+        os.environ.setdefault("OPENROUTER_API_KEY", "mock")
+        os.environ.setdefault("DASHSCOPE_API_KEY", "mock")
+        os.environ.setdefault("EVAL_CACHE_PATH", "")
+    try:
+        report = asyncio.run(run_benchmark(args))
+    finally:
+        if mock is not None:
+            mock.terminate()
+            mock.wait(timeout=5)
+
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,270 @@
+"""
+本地模拟的OpenAI兼容LLM服务
+
+实现 ChatOpenAI 使用的 /v1/chat/completions 接口（含流式输出），返回预设的
+Assessment JSON，可配置延迟分布、错误率和限流比例，用于离线压测和CI。
+系统消息前缀重复出现时在用量中报告缓存命中的token数。
+
+用法：
+    python -m tools.mock_llm_server --port 9100 --latency lognormal --latency-mean 1.5
+    OPENROUTER_BASE_URL=http://127.0.0.1:9100/v1 uvicorn src.main:app
+"""
+import argparse
+import asyncio
+import json
+import math
+import random
+import re
+import time
+import uuid
+from typing import Optional
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+PASS_ASSESSMENT = {
+    "semantic_correctness": {"score": 1.0, "comment": "响应准确匹配指令意图。"},
+    "state_change_confirmation": {"score": 0.9, "comment": "响应明确告知操作结果。"},
+    "unambiguous_expression": {"score": 1.0, "comment": "响应简洁无歧义。"},
+    "overall_score": 0.97,
+    "valid": True,
+    "suggestions": [],
+}
+
+FAIL_ASSESSMENT = {
+    "semantic_correctness": {"score": 0.0, "comment": "响应未匹配指令的核心功能需求。"},
+    "state_change_confirmation": {"score": 0.0, "comment": "未提供状态变更信息。"},
+    "unambiguous_expression": {"score": 1.0, "comment": "响应文本本身无歧义。"},
+    "overall_score": 0.33,
+    "valid": False,
+    "suggestions": ["应优先执行用户指令"],
+}
+
+
+class MockSettings:
+    """模拟服务的行为配置"""
+
+    def __init__(
+        self,
+        latency: str = "lognormal",
+        latency_mean: float = 1.0,
+        latency_sigma: float = 0.5,
+        error_rate: float = 0.0,
+        rate_limit_rate: float = 0.0,
+        fail_ratio: float = 0.3,
+        malformed_rate: float = 0.0,
+        seed: Optional[int] = None,
+    ):
+        self.latency = latency
+        self.latency_mean = latency_mean
+        self.latency_sigma = latency_sigma
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.fail_ratio = fail_ratio
+        self.malformed_rate = malformed_rate
+        self.random = random.Random(seed)
+
+    def sample_latency(self) -> float:
+        """按配置的分布采样一次响应延迟（秒）"""
+        if self.latency == "fixed":
+            return self.latency_mean
+        if self.latency == "uniform":
+            return self.random.uniform(0, 2 * self.latency_mean)
+        # 对数正态分布：均值为 latency_mean，长尾由 sigma 控制
+        mean = max(self.latency_mean, 1e-6)
+        return self.random.lognormvariate(
+            _lognormal_mu(mean, self.latency_sigma), self.latency_sigma
+        )
+
+
+def _lognormal_mu(mean: float, sigma: float) -> float:
+    return math.log(mean) - sigma ** 2 / 2
+
+
+def _assessment_for(settings: MockSettings, text: str) -> dict:
+    # 同一用例文本总是得到相同结论，便于结果比对
+    rng = random.Random(text)
+    return FAIL_ASSESSMENT if rng.random() < settings.fail_ratio else PASS_ASSESSMENT
+
+
+def _completion_content(settings: MockSettings, prompt: str) -> str:
+    """根据提示词生成预设回复，打包提示词按用例 id 返回列表"""
+    if '"assessments"' in prompt:
+        match = re.search(r"(\[\{.*?\}\])\s*(?:\n|$)", prompt, re.S)
+        cases = json.loads(match.group(1)) if match else []
+        return json.dumps(
+            {
+                "assessments": [
+                    {"id": case.get("id"), "assessment": _assessment_for(settings, json.dumps(case))}
+                    for case in cases
+                ]
+            },
+            ensure_ascii=False,
+        )
+    return json.dumps({"assessment": _assessment_for(settings, prompt)}, ensure_ascii=False)
+
+
+def _malformed(content: str) -> str:
+    """模拟常见的格式偏差：0-10评分、键名别名、单引号且末尾截断"""
+    data = json.loads(content)
+    assessment = data.get("assessment")
+    if assessment is None:
+        return content[: len(content) * 2 // 3]
+    deviated = {
+        "evaluation": {
+            **{
+                key: {"score": round(assessment[key]["score"] * 10), "comment": assessment[key]["comment"]}
+                for key in ("semantic_correctness", "state_change_confirmation", "unambiguous_expression")
+            },
+            "improvement_suggestion": "；".join(assessment["suggestions"]) or "无",
+        }
+    }
+    text = str(deviated)
+    return text[: text.rindex("'")] + "。}}"
+
+
+def _cached_tokens(prefixes: set, body: dict) -> int:
+    """模拟提供商的前缀缓存：系统消息与此前请求相同时按128 token为单位计为缓存命中"""
+    messages = body.get("messages") or []
+    if not messages or messages[0].get("role") != "system":
+        return 0
+    prefix = str(messages[0].get("content", ""))
+    if prefix not in prefixes:
+        prefixes.add(prefix)
+        return 0
+    return len(prefix) // 128 * 128
+
+
+def create_app(settings: MockSettings) -> FastAPI:
+    app = FastAPI()
+    app.state.settings = settings
+    app.state.calls = 0
+    app.state.prefixes = set()
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        app.state.calls += 1
+        await asyncio.sleep(settings.sample_latency())
+
+        roll = settings.random.random()
+        if roll < settings.rate_limit_rate:
+            return JSONResponse(
+                {"error": {"message": "Rate limit exceeded", "type": "rate_limit"}},
+                status_code=429,
+                headers={"retry-after": "0.5"},
+            )
+        if roll < settings.rate_limit_rate + settings.error_rate:
+            return JSONResponse(
+                {"error": {"message": "Upstream error", "type": "server_error"}},
+                status_code=503,
+            )
+
+        prompt = "\n".join(str(m.get("content", "")) for m in body.get("messages", []))
+        content = _completion_content(settings, prompt)
+        if settings.random.random() < settings.malformed_rate:
+            content = _malformed(content)
+        prompt_tokens = len(prompt)
+        completion_tokens = len(content)
+        usage = {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+            "prompt_tokens_details": {"cached_tokens": _cached_tokens(app.state.prefixes, body)},
+        }
+        completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+        created = int(time.time())
+        model = body.get("model", "mock")
+
+        if body.get("stream"):
+            include_usage = (body.get("stream_options") or {}).get("include_usage", False)
+
+            async def stream():
+                for i in range(0, len(content), 16):
+                    # 与OpenAI一致，首个增量携带 role
+                    delta = {"role": "assistant"} if i == 0 else {}
+                    chunk = {
+                        "id": completion_id,
+                        "object": "chat.completion.chunk",
+                        "created": created,
+                        "model": model,
+                        "choices": [
+                            {"index": 0, "delta": {**delta, "content": content[i:i + 16]}, "finish_reason": None}
+                        ],
+                    }
+                    yield f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n"
+                final = {
+                    "id": completion_id,
+                    "object": "chat.completion.chunk",
+                    "created": created,
+                    "model": model,
+                    "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}],
+                }
+                yield f"data: {json.dumps(final)}\n\n"
+                if include_usage:
+                    usage_chunk = {
+                        "id": completion_id,
+                        "object": "chat.completion.chunk",
+                        "created": created,
+                        "model": model,
+                        "choices": [],
+                        "usage": usage,
+                    }
+                    yield f"data: {json.dumps(usage_chunk)}\n\n"
+                yield "data: [DONE]\n\n"
+
+            return StreamingResponse(stream(), media_type="text/event-stream")
+
+        return {
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": created,
+            "model": model,
+            "choices": [
+                {
+                    "index": 0,
+                    "message": {"role": "assistant", "content": content},
+                    "finish_reason": "stop",
+                }
+            ],
+            "usage": usage,
+        }
+
+    @app.get("/stats")
+    async def stats():
+        return {"calls": app.state.calls}
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="OpenAI兼容的本地模拟LLM服务")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--latency", choices=["fixed", "uniform", "lognormal"], default="lognormal")
+    parser.add_argument("--latency-mean", type=float, default=1.0, help="平均延迟（秒）")
+    parser.add_argument("--latency-sigma", type=float, default=0.5, help="对数正态分布的sigma")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="返回503的比例")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="返回429的比例")
+    parser.add_argument("--fail-ratio", type=float, default=0.3, help="判定为不通过的用例比例")
+    parser.add_argument("--malformed-rate", type=float, default=0.0, help="返回格式偏差输出的比例")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    import uvicorn
+
+    settings = MockSettings(
+        latency=args.latency,
+        latency_mean=args.latency_mean,
+        latency_sigma=args.latency_sigma,
+        error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate,
+        fail_ratio=args.fail_ratio,
+        malformed_rate=args.malformed_rate,
+        seed=args.seed,
+    )
+    uvicorn.run(create_app(settings), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()